@@ -0,0 +1,73 @@
+"""
+Compares the table-driven Base64 codec with Encrypt.base64 / Decrypt.base64 and the standard library
+
+Run from the project directory: python -m benchmarks.base64_codec [--reference-limit BYTES]
+The reference loop is very slow, so by default it is timed only on inputs up to 1 MB
+"""
+from src.b64 import Base64, Base64Decoder, Base64Encoder
+from src.decode import Decrypt
+from src.encode import Encrypt
+
+import argparse
+import base64
+import os
+import time
+
+
+sizes = (1 << 10, 1 << 20, 100 << 20)
+chunk_sz = 1 << 20
+
+
+def measure(func, *args):
+    """
+    :return: wall time in seconds and the result of the call
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def incremental(codec, data):
+    """
+    :param codec: Base64Encoder or Base64Decoder object
+    :param data: input bytes
+    :return: output of feeding the input in chunks
+    """
+    view = memoryview(data)
+    parts = [codec.update(view[i:i + chunk_sz]) for i in range(0, len(view), chunk_sz)]
+    parts.append(codec.finalize())
+    return b''.join(parts)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reference-limit', type=int, default=1 << 20,
+                        help='largest input size to time Encrypt.base64 / Decrypt.base64 on')
+    args = parser.parse_args()
+    Base64.decode(Base64.encode(b'warm up'))  # builds lookup tables outside of measurements
+
+    print('{:>10} {:>7} {:>14} {:>14} {:>14} {:>14}'.format(
+        'size', 'op', 'reference MB/s', 'codec MB/s', 'chunked MB/s', 'stdlib MB/s'))
+    for size in sizes:
+        data = os.urandom(size)
+        encoded = base64.b64encode(data)
+        mb = size / (1 << 20)
+
+        for op, whole, codec, stdlib, reference, source, expected in (
+                ('encode', Base64.encode, Base64Encoder, base64.b64encode, Encrypt.base64, data, encoded),
+                ('decode', Base64.decode, Base64Decoder, base64.b64decode, Decrypt.base64, encoded, data)):
+            codec_time, result = measure(whole, source)
+            assert result == expected, 'codec output differs from the standard library'
+            chunked_time, result = measure(incremental, codec(), source)
+            assert result == expected, 'incremental output differs from the standard library'
+            stdlib_time = measure(stdlib, source)[0]
+
+            reference_speed = '-'
+            if size <= args.reference_limit:
+                text = source.decode('latin-1')
+                reference_time, result = measure(reference, text)
+                assert result == expected.decode('latin-1'), 'codec output differs from the reference'
+                reference_speed = '{:.1f}'.format(mb / reference_time)
+
+            print('{:>10} {:>7} {:>14} {:>14.1f} {:>14.1f} {:>14.1f}'.format(
+                size, op, reference_speed, mb / codec_time, mb / chunked_time, mb / stdlib_time))
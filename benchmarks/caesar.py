@@ -0,0 +1,69 @@
+"""
+Compares Caesar translation tables with the reference character loop of Encrypt.caesar
+and rotation detection of Crack with Decrypt.__get_caesar_rot__
+
+Run from the project directory: python -m benchmarks.caesar
+"""
+from src.crack import Crack
+from src.decode import Decrypt
+from src.encode import Encrypt
+from src.tables import Tables
+
+import random
+import time
+
+
+sizes = (1 << 10, 1 << 16, 1 << 20, 4 << 20)
+sample = 'The quick brown fox jumps over the lazy dog, 1234567890! '
+
+
+def make_text(size, unicode=False):
+    """
+    :param size: length of the text
+    :param unicode: whether to mix non-ASCII letters into the text
+    :return: pseudo-random text of given length
+    """
+    rnd = random.Random(size)
+    alphabet = sample + ('Привет, мир! Ärger ß ' if unicode else '')
+    return ''.join(rnd.choices(alphabet, k=size))
+
+
+def measure(func, *args):
+    """
+    :return: best of three wall times in seconds and the result of the last call
+    """
+    best, result = float('inf'), None
+    for _ in range(3):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    print('{:>10} {:>8} {:>12} {:>12} {:>9}'.format('size', 'charset', 'loop, MB/s', 'table, MB/s', 'speedup'))
+    for size in sizes:
+        for unicode in (False, True):
+            text = make_text(size, unicode)
+            loop_time, expected = measure(Encrypt.caesar, text, 3)
+            table_time, actual = measure(Tables.caesar, text, 3)
+            assert actual == expected, 'translation tables differ from Encrypt.caesar'
+
+            mb = size / (1 << 20)
+            print('{:>10} {:>8} {:>12.1f} {:>12.1f} {:>8.1f}x'.format(
+                size, 'unicode' if unicode else 'ascii', mb / loop_time, mb / table_time, loop_time / table_time))
+
+    print()
+    print('{:>10} {:>8} {:>12} {:>12} {:>12} {:>9}'.format('size', 'charset', 'loop, MB/s', 'crack, MB/s',
+                                                            'sampled, ms', 'margin'))
+    for size in sizes:
+        for unicode in (False, True):
+            text = Tables.caesar(make_text(size, unicode), 3)
+            loop_time, expected = measure(Decrypt.__get_caesar_rot__, text)
+            crack_time, (actual, margin) = measure(Crack.caesar_rot, text)
+            sample_time, _ = measure(Crack.caesar_rot, text, True)
+            assert actual == expected, 'rotation differs from Decrypt.__get_caesar_rot__'
+
+            mb = size / (1 << 20)
+            print('{:>10} {:>8} {:>12.1f} {:>12.1f} {:>12.3f} {:>9.1f}'.format(
+                size, 'unicode' if unicode else 'ascii', mb / loop_time, mb / crack_time, sample_time * 1000, margin))
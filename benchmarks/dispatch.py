@@ -0,0 +1,73 @@
+"""
+Benchmark of the engines Dispatch chooses between: the pure-Python one, the vector one and the automatic choice,
+from texts of a few characters to large ones, with the calibrated thresholds of this machine
+
+Run from the project directory:
+    python -m benchmarks.dispatch [--sizes 10 100 1K 1M 100M] [--python-limit 1M] [--calibrate]
+"""
+from benchmarks.suite import english_corpus, parse_size
+from src.dispatch import Dispatch
+from src.registry import Registry
+
+import argparse
+import time
+
+
+ciphers = {'caesar': '3', 'vigenere': 'LEMON', 'vernam': 'LEMON', 'base64': None}
+
+
+def measure(func, budget=0.2):
+    """
+    :param func: function to time
+    :param budget: seconds after which no more runs start
+    :return: fastest run in seconds
+    """
+    best, spent = float('inf'), 0.0
+    while spent < budget:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best, spent = min(best, elapsed), spent + elapsed
+    return best
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Pure-Python and vector engines against the automatic choice')
+    parser.add_argument('--sizes', nargs='*', type=parse_size, default=[10, 100, 1 << 10, 1 << 20, 100 << 20],
+                        help='text sizes, e.g. 10 1K 1M')
+    parser.add_argument('--python-limit', type=parse_size, default=1 << 20,
+                        help='largest text to time the pure-Python engine on')
+    parser.add_argument('--calibrate', action='store_true', help='calibrate again instead of using the cache')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    if arguments.calibrate:
+        for cipher in ciphers:
+            for mode in ('encrypt', 'decrypt'):
+                Dispatch.calibrate(Registry.get(cipher), mode)
+    else:
+        Dispatch.prepare([Registry.get(cipher) for cipher in ciphers])
+    print('thresholds of {}: {}'.format(Dispatch.cache_path, Dispatch.stats()['thresholds']))
+
+    print('{:>9} {:>8} {:>11} {:>12} {:>12} {:>12} {:>8}'.format('cipher', 'mode', 'size', 'python, us',
+                                                                 'vector, us', 'auto, us', 'auto'))
+    corpus = english_corpus(max(arguments.sizes))
+    for cipher, key in ciphers.items():
+        registered = Registry.get(cipher)
+        for mode in ('encrypt', 'decrypt'):
+            for size in arguments.sizes:
+                text = corpus[:size]
+                if mode == 'decrypt':
+                    text = registered.encrypt_text(text, key)
+                run = getattr(registered, mode + '_text')
+                times = [measure(lambda: run(text, key, engine)) * 1e6 if engine != 'python' or
+                         size <= arguments.python_limit else None for engine in ('python', 'vector', None)]
+                print('{:>9} {:>8} {:>11} {:>12} {:>12.1f} {:>12.1f} {:>8}'.format(
+                    cipher, mode, size, '-' if times[0] is None else '{:.1f}'.format(times[0]), times[1], times[2],
+                    Dispatch.last()))
@@ -0,0 +1,68 @@
+"""
+Benchmark of per-message overhead for many short messages under a handful of keys, with KeyCache on and off.
+Every message is checked and ciphered the way the service and batch jobs do it
+
+Run from the project directory:
+    python -m benchmarks.keycache [--messages 20000] [--size 256] [--keys 4] [--maxsize 256]
+"""
+from benchmarks.suite import english_corpus
+from src.keycache import KeyCache
+from src.registry import Registry
+
+import argparse
+import time
+
+
+ciphers = {'caesar': ('3', '7', '11', '20'), 'vigenere': ('LEMON', 'KEY', 'SECRET', 'ABC'),
+           'vernam': ('LEMON', 'KEY', 'SECRET', 'ABC'),
+           'pipeline': ('vigenere:LEMON, caesar:3, base64', 'caesar:5, vigenere:KEY', 'vernam:ABC, base64',
+                        'vigenere:AB, vigenere:ABC')}
+
+
+def run(cipher, messages, keys):
+    """
+    :param cipher: name of cipher
+    :param messages: list of texts
+    :param keys: keys taken in turn
+    :return: microseconds per message
+    """
+    registered = Registry.get(cipher)
+    start = time.perf_counter()
+    for idx, text in enumerate(messages):
+        key = keys[idx % len(keys)]
+        if registered.check_key(key, True) is None:
+            registered.encrypt_text(text, key)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Per-message overhead with and without KeyCache')
+    parser.add_argument('--messages', type=int, default=20000, help='messages per cipher')
+    parser.add_argument('--size', type=int, default=256, help='characters in every message')
+    parser.add_argument('--keys', type=int, default=4, help='distinct keys, at most 4')
+    parser.add_argument('--maxsize', type=int, default=KeyCache.maxsize, help='entries of KeyCache')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    corpus = english_corpus(arguments.size * 64)
+    messages = [corpus[(idx % 63) * arguments.size:(idx % 63 + 1) * arguments.size]
+                for idx in range(arguments.messages)]
+
+    print('{:>10} {:>14} {:>14} {:>9} {:>10}'.format('cipher', 'no cache, us', 'cached, us', 'speedup', 'hit rate'))
+    for cipher, keys in ciphers.items():
+        Registry.get(cipher).load()
+        keys = keys[:arguments.keys]
+        KeyCache.resize(0)
+        run(cipher, messages[:100], keys)  # warm up lookup tables
+        uncached = run(cipher, messages, keys)
+        KeyCache.clear()
+        KeyCache.resize(arguments.maxsize)
+        cached = run(cipher, messages, keys)
+        print('{:>10} {:>14.1f} {:>14.1f} {:>8.2f}x {:>9.1%}'.format(cipher, uncached, cached, uncached / cached,
+                                                                    KeyCache.stats()['hit_rate']))
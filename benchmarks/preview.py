@@ -0,0 +1,103 @@
+"""
+Benchmark of live preview: time of one keystroke at random places of a long text against computing the whole
+output again, checking that the incremental output always equals the full one. Edit sequences which broke
+the preview before, e.g. deleting the first character, are checked first
+
+Run from the project directory:
+    python -m benchmarks.preview [--size 100K] [--edits 200] [--seed 0]
+Exits with code 1 if a check fails
+"""
+from benchmarks.suite import english_corpus, parse_size
+from src.preview import Preview
+
+import argparse
+import random
+import sys
+import time
+
+
+ciphers = [('Caesar', True, '3'), ('Caesar', False, ''), ('Vigenere', True, 'LEMON'), ('Vigenere', False, 'LEMON'),
+           ('Vernam', True, 'LEMON'), ('Base64', True, '')]
+known = [('Caesar', True, '3', ['hello world', 'ello world', 'ello world!']),
+         ('Base64', True, '', ['abcdef', 'def', 'deff']),
+         ('Vigenere', True, 'LEMON', ['attack at dawn', 'ttack at dawn', 'xttack at dawn'])]
+
+
+def full(cipher, encrypt, key, text):
+    """
+    :return: output of a new preview of the whole text
+    """
+    preview = Preview(cipher, encrypt, key)
+    preview.update(text)
+    while preview.pending():
+        preview.advance()
+    return preview.output
+
+
+def replay(cipher, encrypt, key, texts):
+    """
+    :param texts: versions of the text one after another
+    :return: seconds taken by every update, None if the output differs from the full one
+    """
+    preview, output, times = Preview(cipher, encrypt, key), '', []
+    for text in texts:
+        start = time.perf_counter()
+        begin, end, piece = preview.update(text)
+        times.append(time.perf_counter() - start)
+        output = output[:begin] + piece + output[end:]
+        while preview.pending():
+            begin, end, piece = preview.advance()
+            output = output[:begin] + piece + output[end:]
+        if output != full(cipher, encrypt, key, text):
+            return None
+    return times
+
+
+def keystrokes(text, edits, rng):
+    """
+    :return: versions of the text after every random insertion, deletion or replacement of a few characters
+    """
+    versions = [text]
+    for _ in range(edits):
+        start = rng.choice((0, len(text), rng.randint(0, len(text))))
+        end = min(len(text), start + rng.randint(0, 2))
+        text = text[:start] + ''.join(rng.choice('etaoin ') for _ in range(rng.randint(0, 2))) + text[end:]
+        versions.append(text)
+    return versions
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Incremental live preview against full recomputation')
+    parser.add_argument('--size', type=parse_size, default=100 << 10, help='length of text, e.g. 100K')
+    parser.add_argument('--edits', type=int, default=200, help='keystrokes replayed for every cipher')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the keystrokes')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    failed = ['{} {}'.format(cipher, 'encrypt' if encrypt else 'decrypt') for cipher, encrypt, key, texts in known
+              if replay(cipher, encrypt, key, texts) is None]
+
+    print('{:>9} {:>8} {:>16} {:>14}'.format('cipher', 'mode', 'keystroke, ms', 'full, ms'))
+    corpus = english_corpus(arguments.size)
+    for cipher, encrypt, key in ciphers:
+        text = corpus if encrypt else full(cipher, True, key or '3', corpus)
+        times = replay(cipher, encrypt, key, keystrokes(text, arguments.edits, random.Random(arguments.seed)))
+        mode = 'encrypt' if encrypt else 'decrypt'
+        if times is None:
+            failed.append('{} {}'.format(cipher, mode))
+            continue
+        start = time.perf_counter()
+        full(cipher, encrypt, key, text)
+        print('{:>9} {:>8} {:>16.3f} {:>14.3f}'.format(cipher, mode, sorted(times)[len(times) // 2] * 1000,
+                                                      (time.perf_counter() - start) * 1000))
+
+    for name in failed:
+        print('check failed: {}'.format(name))
+    if failed:
+        sys.exit(1)
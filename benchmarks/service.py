@@ -0,0 +1,116 @@
+"""
+Load test of the cipher service: requests per second and latency percentiles at growing concurrency,
+with batching of small requests off and on. Every client keeps one connection and sends requests one by one
+
+Run from the project directory:
+    python -m benchmarks.service [--concurrency 1 4 16 64 256] [--requests 4000] [--size 256]
+                                 [--batch-sizes 1 64] [--cipher vigenere] [--key LEMON]
+"""
+from benchmarks.suite import english_corpus, percentile
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+def free_port():
+    """
+    :return: TCP port nobody listens on at the moment
+    """
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def start_service(port, batch_size, jobs):
+    """
+    :param port: TCP port for the service
+    :param batch_size: small requests processed together at most
+    :param jobs: number of worker processes or None
+    :return: process of the service, once it accepts connections
+    """
+    command = [sys.executable, 'serve.py', '--port', str(port), '--batch-size', str(batch_size)]
+    if jobs:
+        command += ['--jobs', str(jobs)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    if not process.stdout.readline().startswith('Listening'):
+        process.kill()
+        raise RuntimeError('Service did not start')
+    return process
+
+
+async def client(port, request, count, latencies):
+    """
+    :param port: TCP port of the service
+    :param request: bytes of one whole HTTP request
+    :param count: number of requests to send
+    :param latencies: list to append latency of every request to, in seconds
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for _ in range(count):
+        start = time.perf_counter()
+        writer.write(request)
+        head = await reader.readuntil(b'\r\n\r\n')
+        if not head.startswith(b'HTTP/1.1 200'):
+            raise RuntimeError(head.decode('latin-1'))
+        length = int(head.lower().split(b'content-length:')[1].split(b'\r\n')[0])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def load(port, request, concurrency, requests):
+    """
+    :return: wall time in seconds and sorted latencies of all requests
+    """
+    latencies = []
+    per_client = max(10, requests // concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, request, per_client, latencies) for _ in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Load test of the cipher service')
+    parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 4, 16, 64, 256],
+                        help='numbers of simultaneous clients')
+    parser.add_argument('--requests', type=int, default=4000,
+                        help='requests sent at every concurrency level, at least 10 per client')
+    parser.add_argument('--size', type=int, default=256, help='characters in every request body')
+    parser.add_argument('--batch-sizes', nargs='*', type=int, default=[1, 64],
+                        help='batch sizes of the service, 1 turns batching off')
+    parser.add_argument('--cipher', default='vigenere', help='cipher to call')
+    parser.add_argument('--key', default='LEMON', help='key of the cipher')
+    parser.add_argument('-j', '--jobs', type=int, help='worker processes of the service, CPU cores by default')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    body = english_corpus(arguments.size).encode('utf-8')
+    request = 'POST /{}/encrypt?key={} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n'.format(
+        arguments.cipher, arguments.key, len(body)).encode('latin-1') + body
+
+    print('{:>6} {:>12} {:>10} {:>9} {:>9} {:>9}'.format('batch', 'concurrency', 'req/s', 'p50, ms', 'p99, ms',
+                                                         'max, ms'))
+    for batch_size in arguments.batch_sizes:
+        port = free_port()
+        service = start_service(port, batch_size, arguments.jobs)
+        try:
+            asyncio.run(load(port, request, 1, 20))  # warm up the workers
+            for concurrency in arguments.concurrency:
+                wall, latencies = asyncio.run(load(port, request, concurrency, arguments.requests))
+                print('{:>6} {:>12} {:>10.0f} {:>9.2f} {:>9.2f} {:>9.2f}'.format(
+                    batch_size, concurrency, len(latencies) / wall, percentile(latencies, 0.5) * 1000,
+                    percentile(latencies, 0.99) * 1000, max(latencies) * 1000))
+        finally:
+            service.terminate()
+            service.wait()
@@ -0,0 +1,52 @@
+"""
+Benchmark of one large text file processed by one worker and split into shards between all workers,
+with a check that both outputs are the same
+
+Run from the project directory:
+    python -m benchmarks.shard [--size 1G] [--jobs 2 4 8] [--cipher vigenere] [--mode encrypt] [--key LEMON]
+"""
+from benchmarks.suite import english_corpus, parse_size
+from src.batch import Batch
+
+import argparse
+import filecmp
+import os
+import tempfile
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='One large file on one worker and split between all workers')
+    parser.add_argument('--size', type=parse_size, default=parse_size('1G'), help='size of the file, e.g. 256M')
+    parser.add_argument('--jobs', nargs='*', type=int, default=[os.cpu_count()], help='numbers of worker processes')
+    parser.add_argument('--cipher', default='vigenere', help='cipher to run')
+    parser.add_argument('--mode', default='encrypt', choices=Batch.modes)
+    parser.add_argument('--key', default='LEMON', help='key of the cipher, none to crack it on decryption')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    key = arguments.key or None
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'large.txt')
+        block = english_corpus(1 << 20)
+        with open(path, 'w', encoding=Batch.encoding, newline='') as file:
+            for _ in range(arguments.size // len(block)):
+                file.write(block)
+            file.write(block[:arguments.size % len(block)])
+
+        print('{:>5} {:>14} {:>14} {:>9}'.format('jobs', 'one worker, s', 'split, s', 'speedup'))
+        for jobs in arguments.jobs:
+            walls = []
+            for split_sz, name in ((0, 'whole'), (1, 'split')):
+                _, wall, _ = Batch.run([path], arguments.cipher, arguments.mode, key, os.path.join(folder, name), jobs,
+                                    report=lambda line: None, split_sz=split_sz)
+                walls.append(wall)
+            output = os.path.basename(Batch.output_path(path, arguments.mode))
+            same = filecmp.cmp(os.path.join(folder, 'whole', output), os.path.join(folder, 'split', output), False)
+            print('{:>5} {:>14.2f} {:>14.2f} {:>8.2f}x{}'.format(jobs, walls[0], walls[1], walls[0] / walls[1],
+                                                                 '' if same else '  OUTPUTS DIFFER'))
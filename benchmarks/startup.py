@@ -0,0 +1,49 @@
+"""
+Measures cold start of the command line and of the GUI module: wall time of a fresh interpreter
+importing them and the heavy libraries they pull in before any cipher is used
+
+Run from the project directory: python -m benchmarks.startup
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+
+heavy = ('numpy', 'PIL', 'tkinter')
+targets = {
+    'bare interpreter': 'pass',
+    'cli.py --help': 'import runpy, sys; sys.argv = ["cli.py", "--help"]\n'
+                     'try:\n    runpy.run_path("cli.py", run_name="__main__")\nexcept SystemExit:\n    pass',
+    'import src.gui': 'import src.gui',
+}
+runs = 10
+
+
+def loaded(code):
+    """
+    :param code: python code to run
+    :return: heavy libraries imported by the code
+    """
+    probe = '{}\nimport sys\nprint("loaded:" + ",".join(m for m in {!r} if m in sys.modules))'.format(code, heavy)
+    output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True).stdout
+    return output.rsplit('loaded:', 1)[1].strip()
+
+
+def cold_start(code):
+    """
+    :param code: python code to run
+    :return: median wall time of a fresh interpreter running the code, in milliseconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+if __name__ == '__main__':
+    print('{:>18} {:>10}  {}'.format('target', 'median ms', 'heavy modules loaded'))
+    for name, code in targets.items():
+        print('{:>18} {:>10.1f}  {}'.format(name, cold_start(code), loaded(code) or '-'))
@@ -0,0 +1,92 @@
+"""
+Benchmark of time and size of steganography output for every image format, PNG zlib level and strategy,
+written to a file or to memory, against the copy of an uncompressed cover patched in place
+
+Run from the project directory:
+    python -m benchmarks.stega_output [--megapixels 1 10] [--chars 10000] [--repeats 3]
+"""
+from benchmarks.suite import english_corpus
+from src.stega import Stega
+
+from PIL import Image
+
+import argparse
+import io
+import math
+import numpy as np
+import os
+import tempfile
+import time
+
+
+settings = [('PNG', None, None), ('PNG', 0, None), ('PNG', 1, None), ('PNG', 3, None), ('PNG', 9, None),
+            ('PNG', 1, 'rle'), ('PNG', 1, 'huffman'), ('PNG', 6, 'filtered'), ('PNG', 6, 'fixed'),
+            ('BMP', None, None), ('TIFF', None, None)]
+
+
+def photo_cover(path, megapixels, seed=0):
+    """
+    :param path: path to save an uncompressed cover image to
+    :param megapixels: number of pixels in millions
+    :param seed: seed of the generator
+
+    Smooth gradients with slight noise compress like a photo does, unlike random pixels
+    """
+    side = max(2, int(math.sqrt(megapixels * 1e6)))
+    ys, xs = np.mgrid[0:side, 0:side] / side
+    channels = [np.sin(xs * 6 + ys * 2), np.cos(ys * 5 - xs), np.sin((xs + ys) * 3)]
+    pixels = np.stack(channels, axis=2) * 100 + 128
+    pixels += np.random.default_rng(seed).normal(0, 3, pixels.shape)
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB').save(path, 'BMP')
+
+
+def measure(func, repeats):
+    """
+    :param func: function to time
+    :param repeats: number of runs
+    :return: median time of a run in seconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Time and size of steganography output for every setting')
+    parser.add_argument('--megapixels', nargs='*', type=float, default=[1, 10], help='cover image sizes')
+    parser.add_argument('--chars', type=int, default=10000, help='characters hidden in every cover')
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs of every setting')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        cover, keys = os.path.join(folder, 'cover.bmp'), os.path.join(folder, 'coords.keys')
+        print('{:>6} {:>6} {:>6} {:>9} {:>10} {:>12} {:>9}'.format('MP', 'format', 'level', 'strategy', 'file, s',
+                                                                 'memory, s', 'size, MB'))
+        for megapixels in arguments.megapixels:
+            photo_cover(cover, megapixels)
+            message = english_corpus(arguments.chars, seed=1)
+            for image_format, level, strategy in settings:
+                output = os.path.join(folder, 'encoded' + Stega.formats[image_format])
+                options = {'image_format': image_format, 'compress_level': level, 'strategy': strategy}
+                to_file = measure(lambda: Stega.embed(message, cover, keys, output, True, **options),
+                                  arguments.repeats)
+                to_memory = measure(lambda: Stega.embed(message, cover, keys, io.BytesIO(), True, **options),
+                                    arguments.repeats)
+                print('{:>6} {:>6} {:>6} {:>9} {:>10.3f} {:>12.3f} {:>9.2f}'.format(
+                    megapixels, image_format, '-' if level is None else level, strategy or '-', to_file, to_memory,
+                    os.path.getsize(output) / (1 << 20)))
+
+            output = os.path.join(folder, 'tiled.bmp')
+            tiled = measure(lambda: Stega.embed(message, cover, keys, output, True, tiled=True), arguments.repeats)
+            print('{:>6} {:>6} {:>6} {:>9} {:>10.3f} {:>12} {:>9.2f}'.format(megapixels, 'BMP', 'tiled', '-', tiled,
+                                                                          '-', os.path.getsize(output) / (1 << 20)))
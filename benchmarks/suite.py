@@ -0,0 +1,314 @@
+"""
+Benchmark suite for every cipher and steganography: reference implementations of Encrypt / Decrypt
+against the fast engines, with correctness and round-trip checks
+
+Run from the project directory:
+    python -m benchmarks.suite [--sizes 1K 1M 100M] [--megapixels 1 10 100] [--repeats 5]
+                               [--json results.json] [--baseline old.json] [--tolerance 0.2]
+Every case runs in a fresh process, so its peak RSS is not affected by the other cases.
+Reference loops are very slow, by default they are timed only up to 1 MB of text and 10 megapixels.
+With --baseline, exits with code 1 if a check fails or throughput dropped by more than the tolerance
+"""
+from src.b64 import Base64
+from src.crack import Crack
+from src.decode import Decrypt
+from src.encode import Encrypt
+from src.registry import Registry
+from src.stega import Stega
+from src.tables import Tables
+from src.vector import Vector
+
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+import argparse
+import json
+import math
+import multiprocessing
+import numpy as np
+import os
+import random
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows, peak RSS is not reported there
+    resource = None
+
+
+key = 'LEMON'
+rot = 3
+chain = 'vigenere:{}, caesar:{}, base64'.format(key, rot)  # pipeline benchmarked against the stages run in turn
+corpus_block = 1 << 20  # bigger corpora repeat a block of this size
+units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def parse_size(value):
+    """
+    :param value: number of bytes, optionally with K, M or G suffix
+    :return: number of bytes
+    """
+    value = value.upper()
+    return int(float(value[:-1]) * units[value[-1]]) if value[-1] in units else int(value)
+
+
+def english_corpus(size, seed=0):
+    """
+    :param size: length of the text
+    :param seed: seed of the generator
+    :return: English-like text, letters follow Decrypt.frequency_in_english, words form capitalized sentences
+    """
+    rnd = random.Random(seed)
+    letters = [chr(ord('a') + i) for i in range(len(Decrypt.frequency_in_english))]
+    words = [''.join(rnd.choices(letters, Decrypt.frequency_in_english, k=rnd.randint(1, 9))) for _ in range(5000)]
+
+    sentences, length = [], 0
+    while length < min(size, corpus_block):
+        sentence = ' '.join(rnd.choices(words, k=rnd.randint(4, 16))).capitalize() + rnd.choice('..,!?')
+        sentences.append(sentence + ('\n' if rnd.random() < 0.1 else ' '))
+        length += len(sentences[-1])
+    block = ''.join(sentences)[:corpus_block]
+    return (block * (size // len(block) + 1))[:size]
+
+
+def cover_image(path, megapixels, seed=0):
+    """
+    :param path: path to save an uncompressed cover image to
+    :param megapixels: number of pixels in millions
+    :param seed: seed of the generator
+    """
+    side = max(2, int(math.sqrt(megapixels * 1e6)))
+    pixels = np.random.default_rng(seed).integers(0, 1 << 8, (side, side, 3), dtype=np.uint8)
+    Image.fromarray(pixels, 'RGB').save(path, 'BMP')
+
+
+def text_ops():
+    """
+    :return: dict of operation name -> (prepare input from corpus, reference function, fast function,
+             check of fast output against the corpus or None)
+    """
+    return {
+        'caesar.encrypt': (lambda text: text, lambda text: Encrypt.caesar(text, rot),
+                           lambda text: Tables.caesar(text, rot),
+                           lambda out, text: Tables.caesar(out, -rot) == text),
+        'caesar.decrypt': (lambda text: Tables.caesar(text, rot), Decrypt.caesar,
+                           lambda text: Tables.caesar(text, -Crack.caesar_rot(text)[0]),
+                           lambda out, text: out == text),
+        'caesar.rot': (lambda text: Tables.caesar(text, rot), Decrypt.__get_caesar_rot__,
+                       lambda text: Crack.caesar_rot(text)[0], lambda out, text: out == rot),
+        'vigenere.encrypt': (lambda text: text, lambda text: Encrypt.vigenere(text, key),
+                             lambda text: Vector.vigenere(text, key),
+                             lambda out, text: Vector.vigenere(out, key, decrypt=True) == text),
+        'vigenere.decrypt': (lambda text: Vector.vigenere(text, key), lambda text: Decrypt.vigenere(text, key),
+                             lambda text: Vector.vigenere(text, key, decrypt=True), lambda out, text: out == text),
+        'vernam.encrypt': (lambda text: text, lambda text: Encrypt.vernam(text, key),
+                           lambda text: Vector.vernam(text, key), None),
+        'vernam.decrypt': (lambda text: Vector.vernam(text, key), lambda text: Decrypt.vernam(text, key),
+                           lambda text: Vector.vernam(text, key, decrypt=True), None),
+        # decrypting plain text, where every few letters do not consume a key letter
+        'vernam.decrypt_plain': (str.lower, lambda text: Decrypt.vernam(text, key),
+                                 lambda text: Vector.vernam(text, key, decrypt=True), None),
+        'base64.encrypt': (lambda text: text, Encrypt.base64, Base64.encrypt,
+                           lambda out, text: Base64.decrypt(out) == text),
+        'base64.decrypt': (lambda text: Base64.encrypt(text), Decrypt.base64, Base64.decrypt,
+                           lambda out, text: out == text),
+        'pipeline.encrypt': (lambda text: text,
+                             lambda text: Encrypt.base64(Encrypt.caesar(Encrypt.vigenere(text, key), rot)),
+                             lambda text: Registry.get('pipeline').encrypt_text(text, chain),
+                             lambda out, text: Registry.get('pipeline').decrypt_text(out, chain) == text),
+        'pipeline.decrypt': (lambda text: Registry.get('pipeline').encrypt_text(text, chain),
+                             lambda text: Decrypt.vigenere(Encrypt.caesar(Decrypt.base64(text), -rot), key),
+                             lambda text: Registry.get('pipeline').decrypt_text(text, chain),
+                             lambda out, text: out == text),
+    }
+
+
+def percentile(times, share):
+    """
+    :param times: sorted list of durations
+    :param share: share of durations which should not exceed the result, 0-1
+    :return: nearest-rank percentile
+    """
+    return times[min(len(times) - 1, max(0, math.ceil(share * len(times)) - 1))]
+
+
+def peak_rss_mb():
+    """
+    :return: peak resident set size of this process in megabytes or None if it is unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)  # bytes on macOS, KB elsewhere
+
+
+def timed(func, repeats, budget):
+    """
+    :param func: function without arguments
+    :param repeats: maximal number of runs
+    :param budget: seconds after which no more runs are started
+    :return: sorted list of durations and the result of the last run
+    """
+    times, result, spent = [], None, 0.0
+    while len(times) < repeats and (not times or spent < budget):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+        spent += times[-1]
+    return sorted(times), result
+
+
+def run_case(case, repeats, budget):
+    """
+    :param case: dict with 'op', 'engine' ('reference' or 'fast'), 'size' and 'check_reference'
+    :param repeats: maximal number of timed runs
+    :param budget: seconds after which no more runs are started
+    :return: record of the benchmark, run in a separate process
+    """
+    op, engine = case['op'], case['engine']
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # Encrypt.stega writes its outputs into the working directory
+        if op.startswith('stega'):
+            func, volume, check = stega_case(case)
+        else:
+            prepare, reference, fast, roundtrip = text_ops()[op]
+            text = english_corpus(case['size'])
+            source = prepare(text)
+            volume = len(source)
+            func = (lambda: reference(source)) if engine == 'reference' else (lambda: fast(source))
+
+            def check(out):
+                if case['check_reference'] and engine == 'fast' and out != reference(source):
+                    return False
+                return roundtrip is None or engine == 'reference' or roundtrip(out, text)
+
+        rss_before = peak_rss_mb()
+        times, result = timed(func, repeats, budget)
+        rss_peak = peak_rss_mb()
+        ok = check(result)
+        os.chdir(cwd)
+
+    median = percentile(times, 0.5)
+    return dict(case, runs=len(times), p50=median, p90=percentile(times, 0.9), p99=percentile(times, 0.99),
+                throughput=volume / (1e6 if op.startswith('stega') else 1 << 20) / median if median else float('inf'),
+                unit='MP/s' if op.startswith('stega') else 'MB/s', rss_before_mb=rss_before, peak_rss_mb=rss_peak,
+                ok=ok)
+
+
+def stega_case(case):
+    """
+    :param case: dict with 'op', 'engine', 'size' in pixels and 'chars' to hide
+    :return: function to time, number of pixels and check of its result
+    """
+    cover_image('cover.bmp', case['size'] / 1e6)
+    message = english_corpus(case['chars'], seed=1)
+
+    if case['op'] == 'stega.encrypt':
+        if case['engine'] == 'reference':
+            return lambda: Encrypt.stega(message, 'cover.bmp'), case['size'], lambda out: True
+        return lambda: Stega.embed(message, 'cover.bmp', 'fast.keys', 'fast.png'), case['size'], \
+            lambda out: Stega.extract('fast.keys', 'fast.png') == message
+
+    Stega.embed(message, 'cover.bmp', 'coords.keys', 'encoded.png')
+    if case['engine'] == 'reference':
+        return lambda: Decrypt.stega('coords.keys', 'encoded.png'), case['size'], lambda out: out == message
+    return lambda: Stega.extract('coords.keys', 'encoded.png'), case['size'], \
+        lambda out: out == message and (not case['check_reference'] or
+                                        out == Decrypt.stega('coords.keys', 'encoded.png'))
+
+
+def cases(args):
+    """
+    :param args: parsed command line arguments
+    :return: list of cases to run
+    """
+    result = []
+    for size in args.sizes:
+        for op in text_ops():
+            with_reference = size <= args.reference_limit
+            if with_reference:
+                result.append({'op': op, 'engine': 'reference', 'size': size, 'check_reference': False})
+            result.append({'op': op, 'engine': 'fast', 'size': size, 'check_reference': with_reference})
+
+    for megapixels in args.megapixels:
+        size = int(megapixels * 1e6)
+        for op in ('stega.encrypt', 'stega.decrypt'):
+            with_reference = megapixels <= args.reference_megapixels
+            for engine in ('reference', 'fast') if with_reference else ('fast',):
+                result.append({'op': op, 'engine': engine, 'size': size, 'chars': min(args.stega_chars, size // 2),
+                               'check_reference': with_reference and engine == 'fast'})
+    return result
+
+
+def regressions(records, baseline_path, tolerance):
+    """
+    :param records: records of this run
+    :param baseline_path: path to JSON written by an earlier run
+    :param tolerance: allowed relative drop of throughput
+    :return: list of messages about cases which got slower
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = {(old['op'], old['engine'], old['size']): old for old in json.load(baseline_file)['records']}
+
+    messages = []
+    for record in records:
+        old = baseline.get((record['op'], record['engine'], record['size']))
+        if old is not None and record['throughput'] < old['throughput'] * (1 - tolerance):
+            messages.append('{} {} {}: {:.2f} -> {:.2f} {}'.format(record['op'], record['engine'], record['size'],
+                                                                old['throughput'], record['throughput'],
+                                                                record['unit']))
+    return messages
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Benchmark every cipher and steganography')
+    parser.add_argument('--sizes', nargs='*', type=parse_size, default=[1 << 10, 1 << 20, 100 << 20],
+                        help='text sizes, e.g. 1K 1M 100M')
+    parser.add_argument('--megapixels', nargs='*', type=float, default=[1, 10, 100], help='cover image sizes')
+    parser.add_argument('--stega-chars', type=int, default=10000, help='characters hidden in every cover')
+    parser.add_argument('--reference-limit', type=parse_size, default=1 << 20,
+                        help='largest text to time reference implementations on')
+    parser.add_argument('--reference-megapixels', type=float, default=10,
+                        help='largest cover to time reference steganography on')
+    parser.add_argument('--repeats', type=int, default=5, help='timed runs of every case')
+    parser.add_argument('--budget', type=float, default=10, help='seconds after which no more runs of a case start')
+    parser.add_argument('--json', help='path to write the results to')
+    parser.add_argument('--baseline', help='JSON of an earlier run to compare throughput with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative drop of throughput')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    context = multiprocessing.get_context('spawn')
+    records = []
+
+    print('{:>16} {:>9} {:>11} {:>5} {:>10} {:>10} {:>10} {:>12} {:>9} {:>4}'.format(
+        'op', 'engine', 'size', 'runs', 'p50, ms', 'p90, ms', 'p99, ms', 'throughput', 'peak, MB', 'ok'))
+    for current in cases(arguments):
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            record = pool.submit(run_case, current, arguments.repeats, arguments.budget).result()
+        records.append(record)
+        print('{:>16} {:>9} {:>11} {:>5} {:>10.2f} {:>10.2f} {:>10.2f} {:>7.1f} {:>4} {:>9} {:>4}'.format(
+            record['op'], record['engine'], record['size'], record['runs'], record['p50'] * 1000,
+            record['p90'] * 1000, record['p99'] * 1000, record['throughput'], record['unit'],
+            '-' if record['peak_rss_mb'] is None else '{:.0f}'.format(record['peak_rss_mb']),
+            'yes' if record['ok'] else 'NO'))
+
+    if arguments.json:
+        with open(arguments.json, 'w') as json_file:
+            json.dump({'python': sys.version, 'platform': sys.platform, 'records': records}, json_file, indent=2)
+
+    failed = [record for record in records if not record['ok']]
+    slower = regressions(records, arguments.baseline, arguments.tolerance) if arguments.baseline else []
+    for message in ['check failed: {} {} {}'.format(r['op'], r['engine'], r['size']) for r in failed] + slower:
+        print(message)
+    if failed or slower:
+        sys.exit(1)
@@ -0,0 +1,61 @@
+from src.batch import Batch
+from src.metrics import Metrics
+
+import argparse
+import sys
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Encrypt or decrypt many text files without GUI')
+    parser.add_argument('cipher', choices=Batch.ciphers())
+    parser.add_argument('mode', choices=Batch.modes)
+    parser.add_argument('inputs', nargs='+', help='files, directories or glob patterns')
+    parser.add_argument('-k', '--key', help='key of cipher, Caesar and Vigenere are cracked without it on decryption')
+    parser.add_argument('-o', '--output-dir', help='directory for output files, next to inputs by default')
+    parser.add_argument('-j', '--jobs', type=int, help='number of worker processes, number of CPU cores by default')
+    parser.add_argument('-b', '--binary', action='store_true',
+                        help='process files as bytes: Vernam XORs every byte with the key, Base64 is the standard one')
+    parser.add_argument('--split-mb', type=int, default=Batch.split_mb,
+                        help='text files of at least this size are split between all workers, 0 turns it off')
+    parser.add_argument('--sample-mb', type=int,
+                        help='megabytes at the start of a file to find an unknown Vigenere key from, 4 by default')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='collect timings of read, transform and write and save them as JSON, - prints a table')
+    parser.add_argument('--allocations', action='store_true', help='add memory allocations to metrics, slower')
+    parser.add_argument('--log-metrics', action='store_true', help='print every measured operation as a JSON line')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='save cProfile and tracemalloc report, files are processed in this process then')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+
+    error = Batch.check_key(arguments.cipher, arguments.mode, arguments.key, arguments.binary)
+    files = Batch.collect(arguments.inputs, arguments.mode, arguments.output_dir)
+    if error or not files:
+        sys.exit(error or 'No input files found')
+
+    if arguments.metrics or arguments.log_metrics:
+        Metrics.enable(arguments.allocations, arguments.log_metrics)
+    run_args = (files, arguments.cipher, arguments.mode, arguments.key, arguments.output_dir,
+                0 if arguments.profile else arguments.jobs)
+    sample_sz = None if arguments.sample_mb is None else arguments.sample_mb << 20
+    try:
+        if arguments.profile:
+            _, _, failed = Metrics.profile(arguments.profile, Batch.run, *run_args, binary=arguments.binary,
+                                           sample_sz=sample_sz)
+        else:
+            _, _, failed = Batch.run(*run_args, binary=arguments.binary, split_sz=arguments.split_mb << 20,
+                                     sample_sz=sample_sz)
+    except ValueError as exc:
+        sys.exit(str(exc))
+
+    if arguments.metrics:
+        Metrics.export(arguments.metrics)
+    if failed:
+        sys.exit(1)
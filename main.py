@@ -1,6 +1,20 @@
 from src.gui import CoderGUI
+from src.metrics import Metrics
+
+import os
 
 
 if __name__ == '__main__':
+    # CRYPTO_METRICS=<path to JSON or -> collects metrics, CRYPTO_PROFILE=<path> saves cProfile and tracemalloc report
+    metrics, profile = os.environ.get('CRYPTO_METRICS'), os.environ.get('CRYPTO_PROFILE')
+    if metrics:
+        Metrics.enable(os.environ.get('CRYPTO_ALLOCATIONS') == '1')
+
     gui = CoderGUI()
-    gui.run()
+    if profile:
+        Metrics.profile(profile, gui.run)
+    else:
+        gui.run()
+
+    if metrics:
+        Metrics.export(metrics)
@@ -0,0 +1,29 @@
+from src.service import Service
+
+import argparse
+import asyncio
+
+
+def parse_args(args=None):
+    """
+    :param args: list of command line arguments, sys.argv by default
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description='Serve the ciphers over local HTTP: POST /<cipher>/<mode>?key=<key>')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on, local only by default')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port to listen on')
+    parser.add_argument('--unix', help='path to Unix socket to listen on instead of TCP')
+    parser.add_argument('-j', '--jobs', type=int, help='number of worker processes, number of CPU cores by default')
+    parser.add_argument('--batch-size', type=int, default=Service.batch_size,
+                        help='small requests processed together at most, 1 turns batching off')
+    return parser.parse_args(args)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    service = Service(arguments.jobs, arguments.batch_size)
+    try:
+        asyncio.run(service.serve(arguments.host, arguments.port, arguments.unix,
+                                  ready=lambda address: print('Listening on {}'.format(address), flush=True)))
+    except KeyboardInterrupt:
+        pass
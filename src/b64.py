@@ -0,0 +1,210 @@
+from src.decode import Decrypt
+from src.encode import Encrypt
+from src.globals import Globals
+
+import numpy as np
+
+
+class Base64:
+    """
+    Class with table-driven Base64 codec over bytes-like objects
+    """
+    block_sz = 3 << 20  # input bytes per numpy pass, bounds the size of temporary arrays
+    invalid = 0xFF  # decode table value of bytes out of the alphabet
+    padding = 0x40  # decode table value of '='
+
+    pair_table = None  # 4096 two-character outputs indexed by 12 bits of input
+    decode_table = None  # 256 six-bit values indexed by encoded byte
+
+    @staticmethod
+    def __tables__():
+        """
+        :return: encoding table of character pairs and decoding table of 6-bit values
+
+        Builds both tables on first use
+        """
+        if Base64.pair_table is None:
+            alphabet = np.frombuffer(Globals.base64_alphabet[:1 << Globals.char_6bit].encode('ascii'), dtype=np.uint8)
+            high, low = np.divmod(np.arange(1 << (2 * Globals.char_6bit)), 1 << Globals.char_6bit)
+            Base64.pair_table = (alphabet[high].astype('<u2') | (alphabet[low].astype('<u2') << Globals.char_8bit))
+
+            Base64.decode_table = np.full(1 << Globals.char_8bit, Base64.invalid, dtype=np.uint8)
+            Base64.decode_table[alphabet] = np.arange(alphabet.size, dtype=np.uint8)
+            Base64.decode_table[ord('=')] = Base64.padding
+
+        return Base64.pair_table, Base64.decode_table
+
+    @staticmethod
+    def encode_groups(data):
+        """
+        :param data: bytes-like object with length divisible by 3
+        :return: encoded bytes without padding
+        """
+        pair_table = Base64.__tables__()[0]
+        source = np.frombuffer(data, dtype=np.uint8)
+        output = np.empty(source.size // Encrypt.base64_step * 2, dtype='<u2')
+
+        for start in range(0, source.size, Base64.block_sz):
+            block = source[start:start + Base64.block_sz].reshape(-1, Encrypt.base64_step).astype(np.uint16)
+            pairs = output[start // Encrypt.base64_step * 2:(start + block.size) // Encrypt.base64_step * 2]
+            pairs[0::2] = pair_table[(block[:, 0] << 4) | (block[:, 1] >> 4)]
+            pairs[1::2] = pair_table[((block[:, 1] & 0xF) << Globals.char_8bit) | block[:, 2]]
+
+        return output.tobytes()
+
+    @staticmethod
+    def decode_groups(data, final=False):
+        """
+        :param data: bytes-like object with length divisible by 4
+        :param final: whether the last group may end with padding
+        :return: decoded bytes
+
+        Raises ValueError on bytes out of the alphabet or misplaced padding
+        """
+        decode_table = Base64.__tables__()[1]
+        source = np.frombuffer(data, dtype=np.uint8)
+        tail = 0
+        if final and source.size:
+            tail = 2 if bytes(source[-2:]) == b'==' else int(source[-1] == ord('='))
+            source = source.copy()
+            source[source.size - tail:] = ord('A')
+
+        output = np.empty(source.size // Decrypt.base64_step * 3, dtype=np.uint8)
+        for start in range(0, source.size, Base64.block_sz):
+            block = decode_table[source[start:start + Base64.block_sz]].reshape(-1, Decrypt.base64_step)
+            if block.size and block.max() >= Base64.padding:
+                raise ValueError('Invalid Base64 character or misplaced padding')
+
+            triples = output[start // Decrypt.base64_step * 3:(start + block.size) // Decrypt.base64_step * 3]
+            triples[0::3] = (block[:, 0] << 2) | (block[:, 1] >> 4)
+            triples[1::3] = (block[:, 1] << 4) | (block[:, 2] >> 2)
+            triples[2::3] = (block[:, 2] << 6) | block[:, 3]
+
+        return output[:output.size - tail].tobytes()
+
+    @staticmethod
+    def encode(data):
+        """
+        :param data: bytes-like object
+        :return: standard Base64 encoding with padding
+        """
+        encoder = Base64Encoder()
+        return encoder.update(data) + encoder.finalize()
+
+    @staticmethod
+    def decode(data):
+        """
+        :param data: bytes-like object with standard Base64 encoding
+        :return: decoded bytes
+        """
+        decoder = Base64Decoder()
+        return decoder.update(data) + decoder.finalize()
+
+    @staticmethod
+    def encrypt(plain_text):
+        """
+        :param plain_text: text to be encrypted
+        :return: encrypted string, identical to Encrypt.base64
+
+        Uses the codec for text of 8-bit characters and Encrypt.base64 otherwise
+        """
+        try:
+            data = plain_text.encode('latin-1')
+        except UnicodeEncodeError:
+            return Encrypt.base64(plain_text)
+        return Base64.encode(data).decode('ascii')
+
+    @staticmethod
+    def decrypt(cypher_text):
+        """
+        :param cypher_text: encoded text
+        :return: decrypted string, identical to Decrypt.base64
+
+        Uses the codec for standard Base64 and Decrypt.base64 for anything else
+        """
+        try:
+            return Base64.decode(cypher_text.encode('ascii')).decode('latin-1')
+        except ValueError:
+            return Decrypt.base64(cypher_text)
+
+
+class Base64Encoder:
+    """
+    Incremental Base64 encoder, keeps at most 2 bytes between updates
+    """
+
+    def __init__(self):
+        """ constructor for encoder object """
+        self.rest = b''
+
+    def update(self, data):
+        """
+        :param data: next part of bytes-like input
+        :return: encoding of all complete 3-byte groups received so far
+        """
+        data = memoryview(data).cast('B')
+        head = b''
+        if self.rest:
+            take = min(Encrypt.base64_step - len(self.rest), len(data))
+            self.rest += bytes(data[:take])
+            data = data[take:]
+            if len(self.rest) < Encrypt.base64_step:
+                return b''
+            head, self.rest = Base64.encode_groups(self.rest), b''
+
+        cut = len(data) - len(data) % Encrypt.base64_step
+        self.rest = bytes(data[cut:])
+        return head + Base64.encode_groups(data[:cut])
+
+    def finalize(self):
+        """
+        :return: encoding of remaining bytes with padding
+        """
+        tail = (-len(self.rest)) % Encrypt.base64_step
+        encoded = Base64.encode_groups(self.rest + b'\x00' * tail) if self.rest else b''
+        self.rest = b''
+        return encoded[:len(encoded) - tail] + b'=' * tail
+
+
+class Base64Decoder:
+    """
+    Incremental Base64 decoder, keeps at most one group and an incomplete one between updates
+    """
+
+    def __init__(self):
+        """ constructor for decoder object """
+        self.rest = b''
+
+    def update(self, data):
+        """
+        :param data: next part of bytes-like Base64 input
+        :return: decoding of all groups received so far except the last one, which may hold padding
+        """
+        data = memoryview(data).cast('B')
+        take = (-len(self.rest)) % Decrypt.base64_step
+        if len(data) < take:
+            self.rest += bytes(data)
+            return b''
+
+        # complete the held back bytes to whole groups, then decode the bulk without copying it
+        head = self.rest + bytes(data[:take])
+        data = data[take:]
+        cut = len(data) - len(data) % Decrypt.base64_step - Decrypt.base64_step
+        if cut < 0:
+            keep = max(len(head) - Decrypt.base64_step, 0)
+            self.rest = head[keep:] + bytes(data)
+            return Base64.decode_groups(head[:keep])
+
+        self.rest = bytes(data[cut:])
+        return Base64.decode_groups(head) + Base64.decode_groups(data[:cut])
+
+    def finalize(self):
+        """
+        :return: decoding of the held back groups
+        """
+        if len(self.rest) % Decrypt.base64_step:
+            raise ValueError('Length of Base64 input must be divisible by {}'.format(Decrypt.base64_step))
+
+        decoded = Base64.decode_groups(self.rest, final=True)
+        self.rest = b''
+        return decoded
@@ -0,0 +1,257 @@
+from src.metrics import Metrics
+from src.registry import Builtin, Cipher, Registry
+
+import glob
+import os
+import time
+
+
+class Batch:
+    """
+    Class to run text ciphers over many files in parallel processes, without any GUI
+    """
+    modes = ('encrypt', 'decrypt')
+    suffixes = {'encrypt': 'enc', 'decrypt': 'dec'}
+    encoding = 'utf-8'
+    split_mb = 64  # text files of at least this size are split between all workers
+
+    @staticmethod
+    def ciphers():
+        """
+        :return: lower case names of registered text ciphers, including the ones registered after import
+        """
+        return tuple(name.lower() for name in Registry.names(image=False))
+
+    @staticmethod
+    def check_key(cipher, mode, key, binary=False):
+        """
+        :param cipher: name of cipher
+        :param mode: 'encrypt' or 'decrypt'
+        :param key: key given by user or None
+        :param binary: whether files are processed as bytes, any key is taken then
+        :return: error message or None if the key fits the cipher
+        """
+        registered = Registry.get(cipher)
+        if binary and registered.binary is None:
+            return '{} works on text only, binary files are supported by {}'.format(
+                registered.name, ', '.join(name for name in Batch.ciphers() if Registry.get(name).binary))
+        if key is None and registered.needs_key(mode == 'encrypt'):
+            return 'Please enter a key for {}'.format(registered.name)
+        return None if binary else registered.check_key(key, mode == 'encrypt')
+
+    @staticmethod
+    def is_output(path, mode, output_dir=None):
+        """
+        :param path: path to file
+        :param mode: 'encrypt' or 'decrypt'
+        :param output_dir: directory outputs are written into, None if they are put next to inputs
+        :return: whether the file lies in output_dir or looks like an output of this program, e.g. 'text.enc.txt'
+                 or 'text.dec.txt', except encrypted files when decrypting
+        """
+        if output_dir is not None and os.path.isdir(output_dir):
+            directory = os.path.realpath(output_dir)
+            if os.path.commonpath((directory, os.path.realpath(path))) == directory:
+                return True
+        stem, ext = os.path.splitext(os.path.basename(path))
+        suffix = os.path.splitext(stem)[1] or ext
+        return suffix in ('.' + Batch.suffixes[name] for name in Batch.modes if mode == 'encrypt' or name == mode)
+
+    @staticmethod
+    def collect(patterns, mode=None, output_dir=None):
+        """
+        :param patterns: file paths, directories or glob patterns
+        :param mode: 'encrypt' or 'decrypt' to skip outputs found in directories and by patterns, see is_output
+        :param output_dir: directory outputs are written into, its files are skipped the same way
+        :return: sorted list of distinct files, directories are walked recursively
+
+        Files named explicitly are always taken, outputs of earlier runs are skipped only in directories and patterns
+        """
+        files = set()
+        for pattern in patterns:
+            if os.path.isfile(pattern):
+                files.add(pattern)
+                continue
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isdir(path):
+                    found = (os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+                else:
+                    found = [path] if os.path.isfile(path) else []
+                files.update(name for name in found if mode is None or not Batch.is_output(name, mode, output_dir))
+        return sorted(files)
+
+    @staticmethod
+    def output_path(path, mode, output_dir=None):
+        """
+        :param path: path to input file
+        :param mode: 'encrypt' or 'decrypt'
+        :param output_dir: directory to write into, directory of the input by default
+        :return: path to output file, 'text.txt' becomes 'text.enc.txt' or 'text.dec.txt'
+        """
+        stem, ext = os.path.splitext(os.path.basename(path))
+        name = '{}.{}{}'.format(stem, Batch.suffixes[mode], ext)
+        return os.path.join(os.path.dirname(path) if output_dir is None else output_dir, name)
+
+    @staticmethod
+    def process(path, output_path, cipher, mode, key=None, binary=False):
+        """
+        :param path: path to input file
+        :param output_path: path to output file
+        :param cipher: name of cipher
+        :param mode: 'encrypt' or 'decrypt'
+        :param key: key of cipher, None to crack it while decrypting if the cipher allows
+        :param binary: whether to process the file as bytes instead of UTF-8 text
+        :return: input path, its size in bytes, processing time in seconds and warning about the key found or None,
+                 see Cipher.warning
+
+        Streams the file through the cipher, so memory use does not depend on file size
+        (except for cracking the key, which reads the whole text first).
+        Partial output is deleted if processing fails
+        """
+        start, warning = time.perf_counter(), None
+        try:
+            if binary:
+                registered = Registry.get(cipher)
+                with open(path, 'rb') as src, open(output_path, 'wb') as dst, \
+                        Metrics.operation('{}.{}.binary'.format(registered.name, mode)) as span:
+                    registered.binary(span.io(src, 'read', sized=True), span.io(dst, 'write'), key, mode == 'decrypt')
+                    span.rest('transform')
+            else:
+                with open(path, encoding=Batch.encoding, newline='') as src, \
+                        open(output_path, 'w', encoding=Batch.encoding, newline='') as dst:
+                    if mode == 'encrypt':
+                        Registry.get(cipher).encrypt_stream(src, dst, key)
+                    else:
+                        Registry.get(cipher).decrypt_stream(src, dst, key)
+                        warning = Cipher.warning()
+        except BaseException:
+            Batch.__discard__(output_path)
+            raise
+        return path, os.path.getsize(path), time.perf_counter() - start, warning
+
+    @staticmethod
+    def __discard__(output_path):
+        """
+        :param output_path: path to output file of a failed run, nothing happens if it was not created
+        """
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def __attempt__(path, output_path, func, *args):
+        """
+        :param path: path to input file
+        :param output_path: path to its output file, deleted if func fails
+        :param func: function processing the file, or returning the result of a worker
+        :return: input path, result of func or None and the exception it raised or None
+        """
+        try:
+            return path, func(*args), None
+        except Exception as exc:
+            Batch.__discard__(output_path)
+            return path, None, exc
+
+    @staticmethod
+    def prepare(cipher, metrics=None, sample_sz=None):
+        """
+        :param cipher: name of cipher
+        :param metrics: arguments of Metrics.enable to collect metrics in the worker with, None to keep them off
+        :param sample_sz: characters at the start of a file an unknown Vigenere key is found from,
+                          Builtin.sample_sz by default
+
+        Runs in every worker process before its first file, so file timings do not include imports
+        """
+        Registry.get(cipher).load()
+        if sample_sz is not None:
+            Builtin.sample_sz = sample_sz
+        if metrics is not None:
+            Metrics.enable(*metrics)
+
+    @staticmethod
+    def measured(*args):
+        """
+        :param args: arguments of process
+        :return: result of process and metrics recorded in this worker process since its previous file
+        """
+        return Batch.process(*args) + (Metrics.drain(),)
+
+    @staticmethod
+    def run(files, cipher, mode, key=None, output_dir=None, jobs=None, report=print, binary=False, split_sz=None,
+            sample_sz=None):
+        """
+        :param files: paths to input files
+        :param cipher: name of cipher
+        :param mode: 'encrypt' or 'decrypt'
+        :param key: key of cipher, None to crack Caesar or Vigenere while decrypting
+        :param output_dir: directory to write into, outputs are put next to inputs by default
+        :param jobs: number of worker processes, number of CPU cores by default, 0 to process files in this process
+        :param report: function to print a line of the report with
+        :param binary: whether to process files as bytes instead of UTF-8 text
+        :param split_sz: text files of at least this many bytes are split into shards processed by all workers,
+                         Batch.split_mb megabytes by default, 0 never splits them
+        :param sample_sz: characters at the start of a file an unknown Vigenere key is found from,
+                          Builtin.sample_sz by default
+        :return: total size of processed inputs in bytes, wall time in seconds and number of files which failed
+
+        Every file is processed by one worker, so speedup grows with the number of cores for many files.
+        Large files are processed one by one, each on all workers, if the cipher allows (see Shard.supports).
+        A file which fails is reported with its error and its partial output is deleted, the others go on.
+        A key found which may be wrong is reported after the file.
+        Metrics recorded by workers are merged into Metrics of this process.
+        Raises ValueError if two inputs would be written to the same output
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed  # only needed once files are processed
+        from itertools import chain
+        from src.shard import Shard
+
+        outputs = [Batch.output_path(path, mode, output_dir) for path in files]
+        if len(set(outputs)) != len(outputs):
+            raise ValueError('Several input files have the same name, they can not share one output directory')
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+
+        total, failed, start = 0, 0, time.perf_counter()
+        if jobs == 0:  # e.g. for profiling, which sees only this process
+            Batch.prepare(cipher, None, sample_sz)
+            results = (Batch.__attempt__(path, output, Batch.process, path, output, cipher, mode, key, binary)
+                       for path, output in zip(files, outputs))
+        else:
+            workers = jobs or os.cpu_count()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=Batch.prepare,
+                                       initargs=(cipher, (Metrics.allocations,) if Metrics.enabled else None,
+                                                 sample_sz))
+            split_sz = Batch.split_mb << 20 if split_sz is None else split_sz
+            split = [split_sz and workers > 1 and not binary and Shard.supports(cipher, mode, key) and
+                     os.path.getsize(path) >= split_sz for path in files]
+
+            task = Batch.measured if Metrics.enabled else Batch.process
+            futures = {pool.submit(task, path, output, cipher, mode, key, binary): (path, output)
+                       for path, output, large in zip(files, outputs, split) if not large}
+            results = chain((Batch.__attempt__(path, output, Shard.run, path, output, cipher, mode, key, pool, workers)
+                             for path, output, large in zip(files, outputs, split) if large),
+                            (Batch.__attempt__(*futures[future], future.result) for future in as_completed(futures)))
+
+        try:
+            for path, result, error in results:
+                if error is not None:
+                    failed += 1
+                    report('{}: failed, {}: {}'.format(path, type(error).__name__, error))
+                    continue
+                _, size, seconds, warning, *records = result
+                if records:
+                    Metrics.merge(records[0])
+                total += size
+                report('{}: {} bytes in {:.3f} s, {:.1f} MB/s'.format(path, size, seconds,
+                                                                      size / (1 << 20) / max(seconds, 1e-9)))
+                if warning:
+                    report('{}: {}'.format(path, warning))
+        finally:
+            if jobs != 0:
+                pool.shutdown(cancel_futures=True)
+
+        wall = time.perf_counter() - start
+        report('Total: {} files, {} bytes in {:.3f} s, {:.1f} MB/s{}'.format(
+            len(files) - failed, total, wall, total / (1 << 20) / max(wall, 1e-9),
+            ', {} failed'.format(failed) if failed else ''))
+        return total, wall, failed
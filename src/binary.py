@@ -0,0 +1,113 @@
+from src.b64 import Base64, Base64Decoder, Base64Encoder
+
+import mmap
+import numpy as np
+import os
+
+
+class Binary:
+    """
+    Class with byte-oriented Vernam and Base64 for binary files and UTF-8 text of any language.
+    Vernam is a byte-wise XOR with a repeating key, done in place in writable buffers, Base64 is the standard one.
+    Files are processed block by block through one reused buffer, without loops over bytes in Python
+    """
+    block_sz = 3 << 20  # bytes per pass, divisible by 3 for Base64 and bounding temporary arrays
+
+    @staticmethod
+    def key_bytes(key):
+        """
+        :param key: str (taken in UTF-8) or bytes-like key
+        :return: key as bytes
+
+        Raises ValueError for empty keys
+        """
+        key = key.encode('utf-8') if isinstance(key, str) else bytes(key)
+        if not key:
+            raise ValueError('Key must not be empty')
+        return key
+
+    @staticmethod
+    def xor(buffer, key, position=0):
+        """
+        :param buffer: writable bytes-like object (bytearray, memoryview, mmap), changed in place
+        :param key: str or bytes-like key
+        :param position: index of key byte the buffer starts with
+        :return: index of key byte the next buffer starts with
+
+        Vernam encryption and decryption are the same XOR
+        """
+        key = np.frombuffer(Binary.key_bytes(key), dtype=np.uint8)
+        array = np.frombuffer(buffer, dtype=np.uint8)
+        # key repeated over a whole block (or the shorter buffer), so every block takes a slice of it
+        tiled = np.tile(key, min(array.size, Binary.block_sz) // key.size + 2)
+        position %= key.size
+
+        for start in range(0, array.size, Binary.block_sz):
+            block = array[start:start + Binary.block_sz]
+            np.bitwise_xor(block, tiled[position:position + block.size], out=block)
+            position = (position + block.size) % key.size
+        return position
+
+    @staticmethod
+    def vernam(data, key):
+        """
+        :param data: bytes-like object to be encrypted or decrypted
+        :param key: str or bytes-like key
+        :return: bytearray with the XOR of data and the repeated key
+        """
+        output = bytearray(data)
+        Binary.xor(output, key)
+        return output
+
+    @staticmethod
+    def vernam_stream(src, dst, key, chunk_sz=block_sz):
+        """
+        :param src: binary file object to read from
+        :param dst: binary file object to write the result into
+        :param key: str or bytes-like key
+        :param chunk_sz: number of bytes to process at once
+        """
+        buffer = memoryview(bytearray(chunk_sz))
+        position = 0
+        while size := src.readinto(buffer):
+            position = Binary.xor(buffer[:size], key, position)
+            dst.write(buffer[:size])
+
+    @staticmethod
+    def base64_stream(src, dst, decrypt=False, chunk_sz=block_sz):
+        """
+        :param src: binary file object to read from
+        :param dst: binary file object to write the result into
+        :param decrypt: whether to decode Base64 or encode into it
+        :param chunk_sz: number of bytes to process at once
+
+        Raises ValueError on invalid Base64 input
+        """
+        coder = Base64Decoder() if decrypt else Base64Encoder()
+        buffer = memoryview(bytearray(chunk_sz))
+        while size := src.readinto(buffer):
+            dst.write(coder.update(buffer[:size]))
+        dst.write(coder.finalize())
+
+    @staticmethod
+    def xor_file(path, key):
+        """
+        :param path: path to file to be encrypted or decrypted in place
+        :param key: str or bytes-like key
+
+        The file is memory mapped, so the OS reads and writes back its pages as they are XORed, without a copy
+        """
+        if not os.path.getsize(path):
+            return
+        with open(path, 'r+b') as file, mmap.mmap(file.fileno(), 0) as data:
+            Binary.xor(data, key)
+            data.flush()
+
+    @staticmethod
+    def base64(data, decrypt=False):
+        """
+        :param data: bytes-like object
+        :param decrypt: whether to decode Base64 or encode into it
+        :return: standard Base64 encoding with padding or the decoded bytes
+        """
+        return Base64.decode(data) if decrypt else Base64.encode(data)
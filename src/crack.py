@@ -0,0 +1,207 @@
+from src.decode import Decrypt
+from src.globals import Globals
+from src.vector import Vector
+
+import numpy as np
+
+
+class Crack:
+    """
+    Class with frequency analysis attacks on ciphers without a known key
+    """
+    max_key_len = 20
+    ioc_sample = 1 << 16  # letters used to estimate key length
+    ioc_deviations = 2.0  # shortest key length with index of coincidence this many standard errors from the best wins
+    sample_sz = 1 << 12  # characters added per step of sampled Caesar detection
+    separation = 5.0  # margin at which sampled Caesar detection stops reading the text
+    reliable_margin = 3.0  # Caesar rotations found with a smaller margin may be wrong
+
+    circulant = None  # rotations of english frequencies, row i holds the frequency of letter j for rotation i
+    letter_lut = None  # 7-bit code -> index of English letter 0-25 or 26 for anything else
+
+    @staticmethod
+    def letters(text, prefix=None):
+        """
+        :param text: encoded text
+        :param prefix: number of first characters to analyse, whole text by default
+        :return: array with index 0-25 of every cased character, -1 for cased characters out of English alphabet
+
+        Non-English letters still take a place in the stream, since Vigenere advances its key on them too
+        """
+        array = Vector.__to_array__(text[:prefix])
+        cased = array[Vector.__maps__(array.dtype == np.uint8)['cased'][array]].astype(np.int64)
+        index = (cased | (ord('a') - ord('A'))) - ord('a')  # ASCII letters turn lowercase
+        return np.where((cased < 1 << (Globals.char_8bit - 1)) & (index >= 0) & (index < Globals.alphabet_len),
+                        index, -1)
+
+    @staticmethod
+    def histograms(letters, key_len):
+        """
+        :param letters: array made by Crack.letters
+        :param key_len: length of key
+        :return: (key_len, 26) array of letter counts in every column
+        """
+        positions = np.flatnonzero(letters >= 0)
+        columns = positions % key_len * Globals.alphabet_len + letters[positions]
+        return np.bincount(columns, minlength=key_len * Globals.alphabet_len).reshape(key_len, Globals.alphabet_len)
+
+    @staticmethod
+    def coincidence(histograms):
+        """
+        :param histograms: (columns, 26) array of letter counts
+        :return: average index of coincidence over columns
+        """
+        totals = histograms.sum(axis=1)
+        pairs = (histograms * (histograms - 1)).sum(axis=1)
+        valid = totals > 1
+        return float((pairs[valid] / (totals[valid] * (totals[valid] - 1))).mean()) if valid.any() else 0.0
+
+    @staticmethod
+    def __tables__():
+        """
+        Builds lookup tables on first use
+        """
+        if Crack.circulant is None:
+            frequencies = np.array(Decrypt.frequency_in_english)
+            rotations = np.arange(Globals.alphabet_len)
+            Crack.circulant = frequencies[(rotations[None, :] - rotations[:, None]) % Globals.alphabet_len]
+
+            Crack.letter_lut = np.full(1 << (Globals.char_8bit - 1), Globals.alphabet_len, dtype=np.intp)
+            Crack.letter_lut[ord('A'):ord('Z') + 1] = Crack.letter_lut[ord('a'):ord('z') + 1] = \
+                np.arange(Globals.alphabet_len)
+
+    @staticmethod
+    def scores(histograms):
+        """
+        :param histograms: (columns, 26) or (26,) array of letter counts
+        :return: correlation of every column with every rotation of english frequencies
+        """
+        Crack.__tables__()
+        return histograms @ Crack.circulant.T
+
+    @staticmethod
+    def shifts(histograms):
+        """
+        :param histograms: (columns, 26) array of letter counts
+        :return: array with the best Caesar rotation of every column
+
+        Correlates all columns with all rotations of english frequencies in one matrix product
+        """
+        return np.argmax(Crack.scores(histograms), axis=1)
+
+    @staticmethod
+    def letter_counts(block):
+        """
+        :param block: text, or bytes-like object with ASCII-compatible text (bytes, mmap)
+        :return: array with occurrences of letters A-Z, case-insensitive
+
+        Code points above 127 are clipped onto a non-letter inside the lookup, so no filtered copy is made
+        """
+        Crack.__tables__()
+        if isinstance(block, str):
+            try:
+                array = np.frombuffer(block.encode('ascii'), dtype=np.uint8)
+            except UnicodeEncodeError:
+                array = np.frombuffer(block.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        else:
+            array = np.frombuffer(block, dtype=np.uint8)
+        return np.bincount(Crack.letter_lut.take(array, mode='clip'),
+                           minlength=Globals.alphabet_len + 1)[:Globals.alphabet_len]
+
+    @staticmethod
+    def margin(counts, scores):
+        """
+        :param counts: occurrences of letters A-Z
+        :param scores: correlation of counts with every rotation of english frequencies
+        :return: best rotation and how many standard deviations its score is above the second best one
+
+        Every letter adds the difference of two rotated frequencies to the gap between the two best scores,
+        the spread of these differences over the counted letters gives its standard deviation
+        """
+        best, second = np.argsort(-scores, kind='stable')[:2]  # first of equal scores wins, like Decrypt does
+        total = counts.sum()
+        if total < 2:
+            return int(best), 0.0
+
+        gaps = Crack.circulant[best] - Crack.circulant[second]
+        mean = counts @ gaps / total
+        deviation = np.sqrt(max(counts @ gaps ** 2 / total - mean ** 2, 0.0) * total)
+        return int(best), float(mean * total / deviation) if deviation else float('inf')
+
+    @staticmethod
+    def caesar_warning(rot, margin):
+        """
+        :param rot: rotation found by Crack.margin
+        :param margin: its confidence margin
+        :return: warning that the rotation may be wrong, None if its margin is at least Crack.reliable_margin
+        """
+        if margin >= Crack.reliable_margin:
+            return None
+        return 'Key {} found by letter frequencies may be wrong, the text is too short to tell (margin {:.1f} < {})' \
+            .format(rot, margin, Crack.reliable_margin)
+
+    @staticmethod
+    def vigenere_key_len(letters, max_len=max_key_len):
+        """
+        :param letters: array made by Crack.letters
+        :param max_len: longest key length to try
+        :return: estimated key length
+
+        Index of coincidence is computed on the first ioc_sample letters, which is plenty for every candidate.
+        Multiples of the key length score as high as the key length itself, its divisors score lower. A shorter
+        length wins over the best one only if its score is within the noise of the estimate, whose standard error
+        on english text of n letters is sqrt(4 * (sum(p^3) - sum(p^2)^2) / n) whatever the number of columns
+        """
+        letters = letters[:Crack.ioc_sample]
+        scores = [Crack.coincidence(Crack.histograms(letters, key_len)) for key_len in range(1, max_len + 1)]
+        frequencies = np.array(Decrypt.frequency_in_english) / sum(Decrypt.frequency_in_english)
+        variance = 4 * ((frequencies ** 3).sum() - (frequencies ** 2).sum() ** 2)
+        bound = max(scores) - Crack.ioc_deviations * np.sqrt(variance / max(np.count_nonzero(letters >= 0), 1))
+        return next(key_len for key_len, score in enumerate(scores, 1) if score >= bound)
+
+    @staticmethod
+    def vigenere_key(cypher_text, prefix=None, max_len=max_key_len):
+        """
+        :param cypher_text: encoded text
+        :param prefix: number of first characters to analyse, whole text by default
+        :param max_len: longest key length to try
+        :return: key used to encrypt the text
+
+        Works for pretty long inputs, just like automatic Caesar decryption
+        """
+        letters = Crack.letters(cypher_text, prefix)
+        histograms = Crack.histograms(letters, Crack.vigenere_key_len(letters, max_len))
+        return ''.join(chr(ord('A') + int(shift)) for shift in Crack.shifts(histograms))
+
+    @staticmethod
+    def vigenere(cypher_text, prefix=None, max_len=max_key_len):
+        """
+        :param cypher_text: encoded text
+        :param prefix: number of first characters to analyse, whole text by default
+        :param max_len: longest key length to try
+        :return: decrypted string and the key found
+        """
+        key = Crack.vigenere_key(cypher_text, prefix, max_len)
+        return Vector.vigenere(cypher_text, key, decrypt=True), key
+
+    @staticmethod
+    def caesar_rot(cypher_text, sample=False):
+        """
+        :param cypher_text: encoded text, or bytes-like object with ASCII-compatible text (bytes, mmap)
+        :param sample: whether to stop reading once the best rotation is separated from the second one
+        :return: rotation of Caesar cypher and confidence margin, below 3 the answer is not reliable
+
+        Counts letters block by block and scores all rotations in one matrix product
+        """
+        block_sz = Crack.sample_sz if sample else Vector.block_sz
+        counts = np.zeros(Globals.alphabet_len, dtype=np.int64)
+        rot, margin = 0, 0.0
+
+        for start in range(0, len(cypher_text), block_sz):
+            counts += Crack.letter_counts(cypher_text[start:start + block_sz])
+            if sample:
+                rot, margin = Crack.margin(counts, Crack.scores(counts))
+                if margin >= Crack.separation:
+                    return rot, margin
+
+        return Crack.margin(counts, Crack.scores(counts))
@@ -1,6 +1,7 @@
 from src.globals import Globals
+from src.keycache import KeyCache
+from src.metrics import Metrics
 
-from PIL import Image, ImageDraw
 from random import randint
 
 import re
@@ -34,13 +35,23 @@ class Decrypt:
             if item in Globals.base64_alphabet[0:Globals.alphabet_len]:
                 mp[item.upper()] += 1
 
+        return Decrypt.__best_caesar_rot__([mp[Globals.base64_alphabet[j]] for j in range(Globals.alphabet_len)])
+
+    @staticmethod
+    def __best_caesar_rot__(counts):
+        """
+        :param counts: occurrences of letters A-Z in cypher text
+        :return: rotation of Caesar cypher
+
+        Finds the rotation which fits the frequencies of letters in english best
+        """
         max_sum = 0
         max_idx = 0
 
         for i in range(Globals.alphabet_len):  # iterate through possible rotations of caesar cypher
             total = 0
             for j in range(Globals.alphabet_len):
-                total += mp[Globals.base64_alphabet[j]] * Decrypt.frequency_in_english[(j - i) % Globals.alphabet_len]
+                total += counts[j] * Decrypt.frequency_in_english[(j - i) % Globals.alphabet_len]
             if total > max_sum:
                 max_sum = total
                 max_idx = i
@@ -48,6 +59,7 @@ class Decrypt:
         return max_idx
 
     @staticmethod
+    @Metrics.timed
     def caesar(cypher_text):
         """
         :param cypher_text: encoded text
@@ -84,11 +96,12 @@ class Decrypt:
             cur = ''
             for j in range(i, len(text_copy), key_len):
                 cur += text_copy[j]
-            output += chr(ord('A') + Decrypt.get_caesar_rot(cur))
+            output += chr(ord('A') + Decrypt.__get_caesar_rot__(cur))
 
         return output
 
     @staticmethod
+    @Metrics.timed
     def vigenere(cypher_text, key):
         """
         :param cypher_text: encoded text
@@ -99,7 +112,7 @@ class Decrypt:
         """
         # Firstly, I wanted to decrypt Vigenere automatically like Caesar, but...
         # key = Decrypt.get_vigenere_key(cypher_text, Decrypt.get_vigenere_key_len(cypher_text))
-        codes = [ord(elem.lower()) - ord('a') for elem in key]
+        codes = KeyCache.get('vigenere.codes', key, lambda key: [ord(elem.lower()) - ord('a') for elem in key])
         size = len(codes)
         current_position = 0
 
@@ -118,6 +131,7 @@ class Decrypt:
         return output
 
     @staticmethod
+    @Metrics.timed
     def vernam(cypher_text, key):
         """
         :param cypher_text: encoded text
@@ -126,7 +140,7 @@ class Decrypt:
 
         Performs Vernam decryption of given text
         """
-        codes = [ord(elem.upper()) - ord('A') for elem in key]
+        codes = KeyCache.get('vernam.codes', key, lambda key: [ord(elem.upper()) - ord('A') for elem in key])
         size = len(key)
 
         current_position = 0
@@ -148,6 +162,7 @@ class Decrypt:
         return output
 
     @staticmethod
+    @Metrics.timed
     def base64(cypher_text):
         """
         :param cypher_text: encoded text
@@ -184,14 +199,21 @@ class Decrypt:
 
         Performs steganography decryption of given image (in .bmp, .png or .jpeg format)
         """
-        decrypted = ''
-        img = Image.open(image_path)
-        pixels = img.load()
+        from PIL import Image  # Pillow is loaded only when an image is used
 
-        with open(keys_path) as coords:
-            for line in coords:
-                current_pos = (int(re.findall('\((\d+),', line)[0]), int(re.findall(', (\d+)\)', line)[0]))
-                key = int(re.findall(':: (\d+)', line)[0])
+        decrypted = ''
+        span = Metrics.operation('Decrypt.stega').start()  # arguments are paths, so it is sized by the keys
+        with span.phase('read'):
+            img = Image.open(image_path)
+            pixels = img.load()
+
+            with open(keys_path) as coords:
+                keys = [((int(re.findall('\((\d+),', line)[0]), int(re.findall(', (\d+)\)', line)[0])),
+                         int(re.findall(':: (\d+)', line)[0])) for line in coords]
+
+        span.size = len(keys)
+        with span.phase('transform', len(keys)):
+            for current_pos, key in keys:
                 r, g, b = pixels[current_pos][0:Globals.color_model_sz]
 
                 char = ((r ^ (key >> (2 * Globals.char_8bit))) << Globals.stega_bit_shift[0]) | \
@@ -199,4 +221,5 @@ class Decrypt:
                     | (b ^ (key & Globals.bitmask_8right_bit))
                 decrypted += chr(char)
 
+        span.finish()
         return decrypted
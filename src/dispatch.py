@@ -0,0 +1,355 @@
+from src.metrics import Metrics
+
+import io
+import os
+import sys
+import threading
+import time
+
+
+class Dispatch:
+    """
+    Class choosing the engine of every text call of a cipher by the length of the text. Pure-Python engines import
+    nothing heavy and win on short texts, vectorised stream engines win on long ones. The length they break even at
+    is calibrated for every cipher and mode, and cached on disk per machine. ASCII and other texts take different
+    paths of the vector engines, so both have their own thresholds. The first call long enough to matter only
+    schedules calibration of its kind of text on a background thread, and calls run on the pure-Python engine
+    up to Dispatch.guess characters meanwhile, so no call waits for it. Services calibrate once at start instead,
+    see Dispatch.prepare.
+    The first vector call of a process also imports NumPy and builds lookup tables, up to a second for Unicode ones,
+    so until the vector engine has run on such text, a cold threshold is used, at which the pure-Python engine
+    takes as long as this setup. Ciphers share part of the tables, so the longest setup measured on the machine
+    for ASCII or other texts counts for all of them
+    """
+    engines = ('python', 'vector')
+    floor = 64  # texts shorter than this run on the pure-Python engine without scheduling calibration
+    guess = 1 << 16  # characters from which the vector engine runs until the threshold is calibrated
+    sizes = tuple(1 << power for power in range(4, 17))  # lengths of text calibration tries, in characters
+    repeats = 3  # timed runs of every engine on every length, the fastest one counts
+    samples = {'ascii': 'The quick brown fox jumps over the lazy dog, THEN RUNS AWAY! 0123456789 ',
+               'unicode': 'Съешь же ещё этих мягких французских булок. The quick brown fox jumps over the lazy dog! '
+                          'Ζαφείρι δέξου πάγκαλο, βαθῶν ψυχῆς τὸ σῆμα. 0123456789 '}  # texts calibration cycles
+    cache_path = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                              'crypto_pyproj', 'engines.json')
+    override = None  # engine of every call, None to choose by length, set from CRYPTO_ENGINE below
+    thresholds = None  # '<cipher>.<mode>.<sample>' -> [characters from which the vector engine runs when warm,
+    # seconds per character of the pure-Python engine], 'setup.<sample>' -> longest setup of the vector engine
+    counts = {}  # '<Cipher>.<mode>.<engine>' -> number of calls
+    warm = set()  # '<cipher>.<mode>.<sample>' whose vector engine has run in this process
+    scheduled = set()  # '<cipher>.<mode>.<sample>' calibrated or waiting for calibration in the background
+    queue = []  # (cipher, mode, sample) the background thread calibrates in turn
+    worker = None  # background thread calibrating, None while the queue is empty
+    local = threading.local()
+    lock = threading.RLock()
+
+    @staticmethod
+    def force(engine, name='Engine'):
+        """
+        :param engine: one of Dispatch.engines to run every call on, None to choose by length again
+        :param name: what the engine was given by, for the error message
+        """
+        if engine is not None and engine not in Dispatch.engines:
+            raise ValueError('{} must be one of {}, got {!r}'.format(name, ', '.join(Dispatch.engines), engine))
+        Dispatch.override = engine
+
+    @staticmethod
+    def __fingerprint__():
+        """
+        :return: string telling this machine and Python from others sharing the cache file
+        """
+        if hasattr(os, 'uname'):
+            node, machine = os.uname().nodename, os.uname().machine
+        else:
+            import platform  # slower to import, Windows only
+            node, machine = platform.node(), platform.machine()
+        return '{}/{}/python{}.{}/{} cores'.format(node, machine, *sys.version_info[:2], os.cpu_count())
+
+    @staticmethod
+    def load(path=None):
+        """
+        :param path: path to the cache file, Dispatch.cache_path by default
+        :return: thresholds of this machine read from the cache, empty if it has none
+        """
+        import json  # json is loaded only when thresholds are
+
+        try:
+            with open(path or Dispatch.cache_path) as cache:
+                machines = json.load(cache)
+        except (OSError, ValueError):
+            machines = {}
+        with Dispatch.lock:
+            thresholds = machines.get(Dispatch.__fingerprint__(), {})
+            # single thresholds saved before ASCII and Unicode texts had their own ones are calibrated again
+            Dispatch.thresholds = {name: value for name, value in thresholds.items()
+                                   if isinstance(value, list) or name.startswith('setup.')}
+            return dict(Dispatch.thresholds)
+
+    @staticmethod
+    def save(path=None):
+        """
+        :param path: path to the cache file, Dispatch.cache_path by default
+
+        Thresholds of other machines in the file are kept. The file is replaced at once, so processes calibrating
+        at the same time never leave it half written. Nothing is saved if the directory can not be written
+        """
+        import json
+
+        path = path or Dispatch.cache_path
+        try:
+            with open(path) as cache:
+                machines = json.load(cache)
+        except (OSError, ValueError):
+            machines = {}
+        machines[Dispatch.__fingerprint__()] = Dispatch.thresholds
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(temp_path, 'w') as cache:
+                json.dump(machines, cache, indent=2, sort_keys=True)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def __time__(func, *args):
+        """
+        :return: fastest of Dispatch.repeats runs of func in seconds
+        """
+        best = float('inf')
+        for _ in range(Dispatch.repeats):
+            start = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    @staticmethod
+    def __key__(cipher, mode, text):
+        """
+        :return: '<cipher>.<mode>.<sample>' the text is ciphered like, see Dispatch.samples
+        """
+        return '{}.{}.{}'.format(cipher.name.lower(), mode, 'ascii' if text.isascii() else 'unicode')
+
+    @staticmethod
+    def __cold__(name):
+        """
+        :param name: '<cipher>.<mode>.<sample>' in Dispatch.thresholds
+        :return: characters the pure-Python engine takes as long at as the longest setup of the vector engine
+                 for such texts, at least the warm threshold
+        """
+        threshold, rate = Dispatch.thresholds[name]
+        setup = Dispatch.thresholds.get('setup.' + name.rsplit('.', 1)[1], 0.0)
+        return max(threshold, int(setup / max(rate, 1e-12)))
+
+    @staticmethod
+    def __break_even__(cipher, mode, sample):
+        """
+        :param cipher: cipher object with a pure-Python engine
+        :param mode: 'encrypt' or 'decrypt'
+        :param sample: text to cycle, one of Dispatch.samples
+        :return: shortest length of text in Dispatch.sizes from which the vector engine is faster, seconds per
+                 character of the pure-Python engine and seconds of the setup of the vector one
+
+        Stops once the vector engine is faster at two lengths in a row. The setup is the time the first vector call
+        takes more than the next ones, so it is shorter if this process has set up part of the vector engine already
+        """
+        python, key = cipher.python_engine[mode == 'decrypt'], cipher.sample_key
+        text = sample * (Dispatch.sizes[-1] // len(sample) + 1)
+        if mode == 'decrypt':
+            text = cipher.python_engine[0](text, key)
+        start = time.perf_counter()
+        Dispatch.__vector__(cipher, mode, text[:Dispatch.sizes[0]], key)  # imports and tables are not compared
+        setup = time.perf_counter() - start - Dispatch.__time__(Dispatch.__vector__, cipher, mode,
+                                                                text[:Dispatch.sizes[0]], key)
+
+        faster, threshold = [], Dispatch.sizes[-1] << 1
+        for idx, size in enumerate(Dispatch.sizes):
+            part = text[:size]
+            python_time = Dispatch.__time__(python, part, key)
+            faster.append(Dispatch.__time__(Dispatch.__vector__, cipher, mode, part, key) < python_time)
+            if faster[-2:] == [True, True]:
+                threshold = Dispatch.sizes[idx - 1]
+                break
+        return threshold, python_time / size, max(setup, 0.0)
+
+    @staticmethod
+    def calibrate(cipher, mode, path=None, kinds=None):
+        """
+        :param cipher: cipher object with a pure-Python engine
+        :param mode: 'encrypt' or 'decrypt'
+        :param path: path to the cache file, Dispatch.cache_path by default
+        :param kinds: names of Dispatch.samples to calibrate, all of them by default
+        :return: dict of '<cipher>.<mode>.<sample>' -> characters from which the vector engine runs once it has run
+                 on such text in this process, and before, see Dispatch.__cold__
+
+        Times both engines on texts of growing length, which takes well under a second besides the setup
+        of the vector engine, and saves the result. Operations of this thread are left out of the metrics meanwhile
+        """
+        measured = {}
+        paused = Metrics.pause()
+        try:
+            for kind in kinds or Dispatch.samples:
+                measured[kind] = Dispatch.__break_even__(cipher, mode, Dispatch.samples[kind])
+        finally:
+            Metrics.pause(paused)
+        with Dispatch.lock:
+            if Dispatch.thresholds is None:
+                Dispatch.load(path)
+            names = []
+            for kind, (threshold, rate, setup) in measured.items():
+                names.append('{}.{}.{}'.format(cipher.name.lower(), mode, kind))
+                Dispatch.thresholds[names[-1]] = [threshold, rate]
+                Dispatch.thresholds['setup.' + kind] = max(setup, Dispatch.thresholds.get('setup.' + kind, 0.0))
+            Dispatch.warm.update(names)
+            Dispatch.save(path)
+            return {name: (Dispatch.thresholds[name][0], Dispatch.__cold__(name)) for name in names}
+
+    @staticmethod
+    def prepare(ciphers, path=None):
+        """
+        :param ciphers: cipher objects, the ones without a pure-Python engine are skipped
+        :param path: path to the cache file, Dispatch.cache_path by default
+        :return: dict of thresholds calibrated, see Dispatch.calibrate, empty if the cache had all of them
+
+        Calibrates in this thread every cipher, mode and kind of text the cache of this machine lacks,
+        e.g. when a service starts, before its workers take requests
+        """
+        with Dispatch.lock:
+            if Dispatch.thresholds is None:
+                Dispatch.load(path)
+            known = set(Dispatch.thresholds)
+        calibrated = {}
+        for cipher in ciphers:
+            for mode in ('encrypt', 'decrypt') if cipher.python_engine is not None else ():
+                kinds = [kind for kind in Dispatch.samples
+                         if '{}.{}.{}'.format(cipher.name.lower(), mode, kind) not in known]
+                if kinds:
+                    calibrated.update(Dispatch.calibrate(cipher, mode, path, kinds))
+        return calibrated
+
+    @staticmethod
+    def __schedule__(cipher, mode, name):
+        """
+        :param name: '<cipher>.<mode>.<sample>' to calibrate on the background thread, started if it is not running
+
+        Called with Dispatch.lock held
+        """
+        if name in Dispatch.scheduled:
+            return
+        Dispatch.scheduled.add(name)
+        Dispatch.queue.append((cipher, mode, name.rsplit('.', 1)[1]))
+        if Dispatch.worker is None:
+            Dispatch.worker = threading.Thread(target=Dispatch.__background__, name='dispatch-calibration',
+                                               daemon=True)
+            Dispatch.worker.start()
+
+    @staticmethod
+    def __background__():
+        """
+        Calibrates the queue one entry at a time, so calibrations never time each other
+        """
+        while True:
+            with Dispatch.lock:
+                if not Dispatch.queue:
+                    Dispatch.worker = None
+                    return
+                cipher, mode, kind = Dispatch.queue.pop(0)
+            try:
+                Dispatch.calibrate(cipher, mode, kinds=(kind,))
+            except Exception:  # the pure-Python engine keeps running up to Dispatch.guess characters
+                pass
+
+    @staticmethod
+    def threshold(cipher, mode, text):
+        """
+        :param cipher: cipher object with a pure-Python engine
+        :param mode: 'encrypt' or 'decrypt'
+        :param text: text to cipher
+        :return: characters from which the vector engine runs. Dispatch.guess is returned until the threshold
+                 is calibrated, which is scheduled if the text is long enough to matter, and the cold threshold
+                 until the vector engine has run on such text in this process
+        """
+        name = Dispatch.__key__(cipher, mode, text)
+        with Dispatch.lock:
+            if Dispatch.thresholds is None:
+                Dispatch.load()
+            if name not in Dispatch.thresholds:
+                if len(text) >= Dispatch.floor:
+                    Dispatch.__schedule__(cipher, mode, name)
+                return Dispatch.guess
+            return Dispatch.thresholds[name][0] if name in Dispatch.warm else Dispatch.__cold__(name)
+
+    @staticmethod
+    def choose(cipher, mode, text, engine=None):
+        """
+        :param cipher: cipher object
+        :param mode: 'encrypt' or 'decrypt'
+        :param text: text to cipher
+        :param engine: engine asked for by caller, Dispatch.override and then the text decide by default
+        :return: name of engine to run
+        """
+        engine = engine or Dispatch.override
+        if cipher.python_engine is None:
+            return 'vector'
+        if engine is not None:
+            return engine
+        return 'python' if len(text) < Dispatch.threshold(cipher, mode, text) else 'vector'
+
+    @staticmethod
+    def __vector__(cipher, mode, text, key, src=None):
+        """
+        :param src: file object to read the text from, io.StringIO(text) by default
+        :return: text ciphered by the stream functions of the cipher
+        """
+        src, dst = io.StringIO(text) if src is None else src, io.StringIO()
+        if mode == 'encrypt':
+            cipher.encrypt_stream(src, dst, key)
+        else:
+            cipher.decrypt_stream(src, dst, key, text)
+        return dst.getvalue()
+
+    @staticmethod
+    def run(cipher, mode, text, key, engine=None, src=None):
+        """
+        :param cipher: cipher object
+        :param mode: 'encrypt' or 'decrypt'
+        :param text: text to cipher
+        :param key: key of the cipher, checked by caller
+        :param engine: 'python' or 'vector' to run on, chosen by Dispatch.choose by default
+        :param src: file object with the text for the vector engine, e.g. one reporting progress of a GUI job
+        :return: ciphered text
+
+        Calls the pure-Python engine does not take, e.g. decryption without a key, run on the vector engine.
+        Dispatch.last tells which engine ran
+        """
+        engine = Dispatch.choose(cipher, mode, text, engine)
+        output = cipher.python_engine[mode == 'decrypt'](text, key) if engine == 'python' else None
+        if output is None:
+            engine = 'vector'
+            output = Dispatch.__vector__(cipher, mode, text, key, src)
+
+        name = '{}.{}.{}'.format(cipher.name, mode, engine)
+        with Dispatch.lock:
+            Dispatch.counts[name] = Dispatch.counts.get(name, 0) + 1
+            if engine == 'vector':
+                Dispatch.warm.add(Dispatch.__key__(cipher, mode, text))
+        Dispatch.local.engine = engine
+        return output
+
+    @staticmethod
+    def last():
+        """
+        :return: name of engine of the last call in this thread, None before the first one
+        """
+        return getattr(Dispatch.local, 'engine', None)
+
+    @staticmethod
+    def stats():
+        """
+        :return: dict of '<Cipher>.<mode>.<engine>' -> number of calls, and thresholds in use
+        """
+        with Dispatch.lock:
+            return {'calls': dict(Dispatch.counts), 'thresholds': dict(Dispatch.thresholds or {}),
+                    'override': Dispatch.override}
+
+
+Dispatch.force(os.environ.get('CRYPTO_ENGINE') or None, 'CRYPTO_ENGINE')
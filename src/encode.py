@@ -1,6 +1,7 @@
 from src.globals import Globals
+from src.keycache import KeyCache
+from src.metrics import Metrics
 
-from PIL import Image, ImageDraw
 from random import randint
 
 import re
@@ -13,6 +14,7 @@ class Encrypt:
     base64_step = 3
 
     @staticmethod
+    @Metrics.timed
     def caesar(plain_text, rot):
         """
         :param plain_text: text to be encrypted
@@ -34,6 +36,7 @@ class Encrypt:
         return encrypted
 
     @staticmethod
+    @Metrics.timed
     def vigenere(plain_text, key):
         """
         :param plain_text: text to be encrypted
@@ -42,7 +45,7 @@ class Encrypt:
 
         Performs Vigenere encryption upon the given text
         """
-        codes = [ord(elem.lower()) - ord('a') for elem in key]
+        codes = KeyCache.get('vigenere.codes', key, lambda key: [ord(elem.lower()) - ord('a') for elem in key])
         current_position = 0
         size = len(codes)
 
@@ -60,6 +63,7 @@ class Encrypt:
         return output
 
     @staticmethod
+    @Metrics.timed
     def vernam(plain_text, key):
         """
         Performs Vernam encryption upon the given text
@@ -68,7 +72,7 @@ class Encrypt:
         :return: encrypted string
         """
         plain_text = plain_text.upper()
-        codes = [ord(elem.upper()) - ord('A') for elem in key]
+        codes = KeyCache.get('vernam.codes', key, lambda key: [ord(elem.upper()) - ord('A') for elem in key])
         size = len(key)
 
         current_position = 0
@@ -85,6 +89,7 @@ class Encrypt:
         return output
 
     @staticmethod
+    @Metrics.timed
     def base64(plain_text):
         """
         :param plain_text: text to be encrypted
@@ -114,6 +119,7 @@ class Encrypt:
         return encrypted
 
     @staticmethod
+    @Metrics.timed
     def stega(text, image_path):
         """
         :param text: text to be encrypted
@@ -122,14 +128,16 @@ class Encrypt:
 
         Encrypts the given text slightly changing random pixels bits
         """
+        from PIL import Image, ImageDraw  # Pillow is loaded only when an image is used
 
-        img = Image.open(image_path)
-        pixels = img.load()
+        with Metrics.phase('read'):
+            img = Image.open(image_path)
+            pixels = img.load()
         width, height = img.size[0], img.size[1]
 
         text = [ord(elem) for elem in text]
 
-        with open('coords.keys', 'w') as coords:
+        with open('coords.keys', 'w') as coords, Metrics.phase('transform', len(text)):
             # will XOR 3-2-3 last bits of red, green and blue parts of a pixel respectively
             for elem in text:
                 pos = (randint(1, width - 1), randint(1, height - 1))
@@ -142,4 +150,5 @@ class Encrypt:
                 ImageDraw.Draw(img).point(pos, (r_init ^ r_enc, g_init ^ g_enc, b_init ^ b_enc))
                 coords.write('{pos} :: {key}\n'.format(pos=pos, key=(r_init << (2 * Globals.char_8bit)) |
                                                                     (g_init << Globals.char_8bit) | b_init))
+        with Metrics.phase('write'):
             img.save('encoded.png', 'PNG')
@@ -1,12 +1,18 @@
-from src.decode import Decrypt
-from src.encode import Encrypt
+from src.metrics import Metrics
+from src.pager import Pager
+from src.registry import Registry
+from src.worker import Worker
 
+import io
+import os
 import re
 import shutil
+import tempfile
 
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
+from tkinter import messagebox
 
 
 class CoderGUI:
@@ -17,6 +23,14 @@ class CoderGUI:
     padding = 10
     text_area_width = 40
     text_area_height = 20
+    poll_ms = 16  # progress of background jobs is checked at about 60 fps
+    large_file_sz = 1 << 20  # bytes, bigger text files are shown page by page and ciphered file to file
+    sample_sz = 1 << 22  # bytes of a large file to find unknown keys from
+    preview_delay_ms = 10  # keystrokes closer to each other than this are previewed at once
+    # choices of encoded image -> format, zlib level and strategy passed to Stega.save. PNG level 1 with RLE
+    # is as small as the default level 6 on photos and 3 times faster, BMP and TIFF are not compressed at all
+    image_settings = {'PNG, fast': ('PNG', 1, 'rle'), 'PNG, default': ('PNG', None, None),
+                      'PNG, smallest': ('PNG', 9, None), 'BMP': ('BMP', None, None), 'TIFF': ('TIFF', None, None)}
 
     def __init__(self):
         """ constructor for GUI object\n
@@ -24,6 +38,18 @@ class CoderGUI:
         """
 
         self.loaded_file = ""
+        self.worker = None
+        self.span = Metrics.noop  # metrics of the operation whose job runs
+        self.warning = None  # doubt about the key the job found, shown once it is finished
+        self.image = None  # bytes and format of the last image steganography encoded, written by "Save image"
+        self.keys = None  # bytes of its keys, written by "Save keys"
+        self.source = None  # pager of loaded large file
+        self.output = None  # pager of its en-/decoded version
+        self.output_path = None  # temporary file with the en-/decoded version, deleted with the pager
+        self.page = 0
+        self.preview = None  # output kept up to date with the left text area in live preview mode
+        self.preview_settings = None
+        self.preview_job = None
 
         self.root = tk.Tk()
         self.root.title('Encode-Decode')
@@ -41,7 +67,7 @@ class CoderGUI:
         self.decode_area.insert(tk.END, 'Output area')
 
         # Drop-down list
-        self.options = ('Caesar', 'Vigenere', 'Vernam', 'Base64', 'Steganography')
+        self.options = Registry.names()
         self.select_coding = tk.StringVar(self.root)
         self.select_coding.set(self.options[0])
         self.dropdown = ttk.Combobox(self.root, textvariable=self.select_coding, values=self.options)
@@ -57,16 +83,37 @@ class CoderGUI:
         self.go_button = tk.Button(self.root, text="Let's go!", command=self.execute)
         self.go_button.pack(side=tk.TOP, padx=CoderGUI.padding, pady=CoderGUI.padding)
 
+        # Live preview switch, output follows the text as it is typed
+        self.live_preview = tk.BooleanVar(self.root, False)
+        self.preview_check = tk.Checkbutton(self.root, text='Live preview', variable=self.live_preview,
+                                            command=self.schedule_preview)
+        self.preview_check.pack(side=tk.TOP, padx=CoderGUI.padding, pady=CoderGUI.padding)
+        self.encode_area.bind('<<Modified>>', self.on_modified)
+
+        # Progress of running job and the button to stop it, shown only while the job runs
+        self.progress_bar = ttk.Progressbar(self.root, maximum=1.0, length=150)
+        self.cancel_button = tk.Button(self.root, text='Cancel', command=self.cancel_job)
+
         # Create key text area
         self.key_label = tk.Label(self.root, text='Enter key:')
         self.key_text = tk.Text(self.root, font=('Helvetica', CoderGUI.font_sz), width=15, height=1)
         self.key_text.pack(side=tk.BOTTOM, padx=CoderGUI.padding, pady=CoderGUI.padding)
         self.key_label.pack(side=tk.BOTTOM, padx=CoderGUI.padding, pady=CoderGUI.padding)
+        self.key_text.bind('<<Modified>>', self.on_modified)
 
         # Wanna load the file
         self.load_file_button = tk.Button(self.root, text='Load file', command=self.load_file)
         self.load_file_button.pack(side=tk.TOP, padx=CoderGUI.padding, pady=CoderGUI.padding)
 
+        # Paging through large files, shown only when one is loaded
+        self.page_frame = tk.Frame(self.root)
+        self.prev_page_button = tk.Button(self.page_frame, text='<', command=lambda: self.show_page(self.page - 1))
+        self.page_label = tk.Label(self.page_frame)
+        self.next_page_button = tk.Button(self.page_frame, text='>', command=lambda: self.show_page(self.page + 1))
+        self.prev_page_button.pack(side=tk.LEFT)
+        self.page_label.pack(side=tk.LEFT, padx=CoderGUI.padding)
+        self.next_page_button.pack(side=tk.LEFT)
+
         # Wanna save the keys for steganography
         self.save_keys_button = tk.Button(self.root, text='Save keys', command=self.save_keys)
         self.save_keys_button.pack_forget()
@@ -79,68 +126,118 @@ class CoderGUI:
         self.save_img_button = tk.Button(self.root, text='Save image', command=self.save_image)
         self.save_img_button.pack_forget()
 
+        # Format and compression of encoded image
+        self.select_image = tk.StringVar(self.root)
+        self.select_image.set(next(iter(CoderGUI.image_settings)))
+        self.image_dropdown = ttk.Combobox(self.root, textvariable=self.select_image,
+                                           values=list(CoderGUI.image_settings), state='readonly')
+        self.image_dropdown.pack_forget()
+
     @staticmethod
-    def encrypt(mode, input_text, key=''):
+    def encrypt(mode, input_text, key='', image_path='', worker=None, image_output='encoded.png',
+                image_settings=('PNG', None, None), keys_output='coords.keys'):
         """
         :param mode: mode of encryption
         :param input_text: text to encrypt
         :param key: key used to encryption
+        :param image_path: path to an image for steganography
+        :param worker: background worker to report progress to and check for cancellation
+        :param image_output: path or binary file object to write the image encoded by steganography to
+        :param image_settings: format, zlib level and strategy of the encoded image, see CoderGUI.image_settings
+        :param keys_output: path or binary file object to write the steganography keys to
         :return: encrypted string or a warning message
 
-        performs encryption with output to right text area
-        """
-        match mode:
-            case 'Caesar':
-                if not re.fullmatch('^\d+$', key):
-                    return 'Please enter right key for encryption (format: any number)'
-                return Encrypt.caesar(input_text, int(key))
-            case 'Vigenere':
-                if not re.fullmatch('^[a-zA-Z]+$', key):
-                    return 'Please enter right key for encryption (format: only letters)'
-                return Encrypt.vigenere(input_text, key)
-            case 'Vernam':
-                if not re.fullmatch('^[a-zA-Z]+$', key):
-                    return 'Please enter right key for encryption (format: only letters)'
-                return Encrypt.vernam(input_text, key)
-            case 'Base64':
-                return Encrypt.base64(input_text)
-            case 'Steganography':
-                image_path = filedialog.askopenfilename()
-                if re.match('.+(png|jpg|jpeg|bmp)\s*$', image_path):
-                    Encrypt.stega(input_text, image_path)  # self.root.clipboard_get()
-                    return "Your text was encrypted. You can download the '.png' encrypted image and " \
-                           "file with keys to decrypt it."
-                else:
-                    return 'Please choose image with .png, .jpg, .jpeg or .bmp format'
-
-    def decrypt(self, mode, cypher_text, key):
+        performs encryption with output to right text area, on the engine Dispatch chooses for the text
+        """
+        cipher = Registry.get(mode)
+        if cipher.image:
+            return cipher.encrypt(input_text, image_path, image_output, *image_settings, keys=keys_output)
+
+        message = cipher.check_key(key, True)
+        if message:
+            return message
+        return cipher.encrypt_text(input_text, key, src=worker.reader(input_text) if worker else None)
+
+    def encrypt_image(self, mode, input_text, image_path, settings, worker):
+        """
+        :param mode: mode of encryption, steganography
+        :param input_text: text to hide
+        :param image_path: path to the cover image
+        :param settings: format, zlib level and strategy of the encoded image
+        :param worker: background worker running the job
+        :return: message for user
+
+        Encodes the image and its keys in memory and keeps them for "Save image" and "Save keys",
+        nothing is written to the working directory
+        """
+        output, keys = io.BytesIO(), io.BytesIO()
+        message = CoderGUI.encrypt(mode, input_text, '', image_path, worker, output, settings, keys)
+        if output.getbuffer().nbytes:
+            self.image, self.keys = (output.getvalue(), settings[0]), keys.getvalue()
+        return message
+
+    def decrypt(self, mode, cypher_text, key, image_path='', worker=None):
         """
         :param mode: mode of encryption
         :param cypher_text: text to encrypt
         :param key: key used to encryption
+        :param image_path: path to an encrypted image for steganography
+        :param worker: background worker to report progress to and check for cancellation
         :return: decrypted string or a warning message
 
-        performs decryption with output to right text area
-        """
-        match mode:
-            case 'Caesar':
-                return Decrypt.caesar(cypher_text)
-            case 'Vigenere':
-                if not re.fullmatch('^[a-zA-Z]+$', key):
-                    return 'Please enter right key for encryption (format: only letters)'
-                return Decrypt.vigenere(cypher_text, key)
-            case 'Vernam':
-                if not re.fullmatch('^[a-zA-Z]+$', key):
-                    return 'Please enter right key for encryption (format: only letters)'
-                return Decrypt.vernam(cypher_text, key)
-            case 'Base64':
-                return Decrypt.base64(cypher_text)
-            case 'Steganography':
-                image_path = filedialog.askopenfilename()
-                if image_path.endswith('.png'):
-                    return Decrypt.stega(self.loaded_file, image_path)
-                else:
-                    return 'Please select encoded image (it is in .png format)'
+        performs decryption with output to right text area, on the engine Dispatch chooses for the text
+        """
+        cipher = Registry.get(mode)
+        if cipher.image:
+            return cipher.decrypt(self.loaded_file, image_path)
+
+        message = cipher.check_key(key, False)
+        if message:
+            return message
+        output = cipher.decrypt_text(cypher_text, key, src=worker.reader(cypher_text) if worker else None)
+        self.warning = cipher.warning()
+        return output
+
+    def output_file(self):
+        """
+        :return: path to a new empty file for the output of the loaded large file, next to it if its directory
+                 can be written, in the temporary directory otherwise
+
+        The file never is the loaded one, which is memory-mapped and must not be truncated
+        """
+        stem = os.path.splitext(os.path.basename(self.source.path))[0]
+        try:
+            handle, path = tempfile.mkstemp('.txt', stem + '.', os.path.dirname(os.path.abspath(self.source.path)))
+        except OSError:
+            handle, path = tempfile.mkstemp('.txt', stem + '.')
+        os.close(handle)
+        return path
+
+    def process_file(self, encrypt, mode, key, output_path, worker):
+        """
+        :param encrypt: whether to encrypt or decrypt
+        :param mode: mode of encryption, any but steganography
+        :param key: key used to encryption
+        :param output_path: path to write the output into, see output_file
+        :param worker: background worker to report progress to and check for cancellation
+        :return: a warning message or None if the output file was written
+
+        Ciphers the loaded large file straight into output_path, without text areas
+        """
+        cipher = Registry.get(mode)
+        message = cipher.check_key(key, encrypt)
+        if message:
+            return message
+        if os.path.realpath(output_path) == os.path.realpath(self.source.path):
+            return 'Output can not be written into the loaded file'
+        with worker.file_reader(self.source.path, Pager.encoding) as src, \
+                open(output_path, 'w', encoding=Pager.encoding, newline='') as dst:
+            if encrypt:
+                cipher.encrypt_stream(src, dst, key)
+            else:
+                cipher.decrypt_stream(src, dst, key, self.source.text(0, CoderGUI.sample_sz))
+                self.warning = cipher.warning()
+        return None
 
     def execute(self):
         """
@@ -150,22 +247,109 @@ class CoderGUI:
         selected_option = self.select_coding.get()
         selected_mode = self.select_mode.get()
 
-        # Get the text from the left text area
-        input_text = self.encode_area.get('1.0', tk.END).strip()
+        cipher = Registry.get(selected_option)
         key = self.key_text.get('1.0', tk.END).strip()
+        self.preview = None  # right text area is going to be overwritten
 
-        if not key and (selected_option in ('Vigenere', 'Vernam')
-                        or (selected_option == 'Caesar' and selected_mode == 'Encrypt')):
+        if not key and cipher.needs_key(selected_mode == 'Encrypt'):
             self.decode_area.delete('1.0', tk.END)
             self.decode_area.insert(tk.END, 'Enter appropriate key before proceeding')
             return
 
-        output_text = CoderGUI.encrypt(selected_option, input_text, key) if selected_mode == 'Encrypt' else \
-            self.decrypt(selected_option, input_text, key)
+        # file dialogs have to be shown from the main thread, before the job starts
+        image_path = filedialog.askopenfilename() if cipher.image else ''
+
+        span = Metrics.operation('gui.{}.{}'.format(cipher.name, selected_mode.lower())).start()
+
+        if self.source is not None and not cipher.image:
+            self.close_output()  # the output file is going to be replaced
+            self.output_path = output_path = self.output_file()
+            self.start_job(lambda worker: self.process_file(selected_mode == 'Encrypt', selected_option, key,
+                                                            output_path, worker), span)
+            return
+
+        # Get the text from the left text area, or the whole loaded large file
+        with span.phase('read'):
+            input_text = self.source.text() if self.source is not None else self.encode_area.get('1.0', tk.END).strip()
+        span.size = len(input_text)
+
+        if selected_mode == 'Encrypt' and cipher.image:
+            settings = CoderGUI.image_settings[self.select_image.get()]
+            self.start_job(lambda worker: self.encrypt_image(selected_option, input_text, image_path, settings, worker),
+                           span)
+        elif selected_mode == 'Encrypt':
+            self.start_job(lambda worker: CoderGUI.encrypt(selected_option, input_text, key, image_path, worker), span)
+        else:
+            self.start_job(lambda worker: self.decrypt(selected_option, input_text, key, image_path, worker), span)
+
+    def start_job(self, job, span=Metrics.noop):
+        """
+        :param job: function taking the worker and returning text for the right text area
+        :param span: metrics of the operation the job belongs to, its output is rendered by poll_job
+
+        Runs the job in background, showing its progress and the button to cancel it
+        """
+        def transform(worker):
+            with span.phase('transform'):
+                return job(worker)
+
+        self.span = span
+        self.warning = None
+        self.worker = Worker(transform)
+        self.go_button.config(state=tk.DISABLED)
+        self.load_file_button.config(state=tk.DISABLED)  # the loaded file is read by the job
+        self.progress_bar['value'] = 0
+        self.progress_bar.pack(side=tk.TOP, padx=CoderGUI.padding, pady=CoderGUI.padding, after=self.go_button)
+        self.cancel_button.pack(side=tk.TOP, padx=CoderGUI.padding, pady=CoderGUI.padding, after=self.progress_bar)
+        self.worker.start()
+        self.root.after(CoderGUI.poll_ms, self.poll_job)
+
+    def poll_job(self):
+        """
+        Moves the progress bar, puts the result into the right text area once the job is finished
+        """
+        self.progress_bar['value'] = self.worker.progress
+        if not self.worker.finished.is_set():
+            self.root.after(CoderGUI.poll_ms, self.poll_job)
+            return
+
+        if self.worker.error is not None:
+            output_text = 'Error: {}'.format(self.worker.error)
+        elif self.worker.cancelled.is_set():
+            output_text = 'Cancelled'
+        elif self.worker.result is None:  # large file was ciphered into self.output_path
+            self.output = Pager(self.output_path)
+            output_text = None
+        else:
+            output_text = self.worker.result
+        if self.output is None:
+            self.close_output()  # partial output of a large file job which did not finish
+
+        self.worker = None
+        self.progress_bar.pack_forget()
+        self.cancel_button.pack_forget()
+        self.go_button.config(state=tk.NORMAL)
+        self.load_file_button.config(state=tk.NORMAL)
 
         # Set the output text to the right text area
-        self.decode_area.delete('1.0', tk.END)
-        self.decode_area.insert(tk.END, output_text)
+        with self.span.phase('render'):
+            if output_text is None:
+                self.show_page(self.page)
+            else:
+                self.decode_area.delete('1.0', tk.END)
+                self.decode_area.insert(tk.END, output_text)
+        self.span.finish()
+        self.span = Metrics.noop
+        if self.warning is not None:
+            messagebox.showwarning('Decrypt', self.warning)
+            self.warning = None
+
+    def cancel_job(self):
+        """
+        "Cancel" button event handler.
+        """
+        if self.worker is not None:
+            self.worker.cancel()
 
     def run(self):
         """
@@ -174,6 +358,75 @@ class CoderGUI:
         self.select_coding.trace_add('write', lambda *_: self.show_elements())
         self.select_mode.trace_add('write', lambda *_: self.show_elements())
         self.root.mainloop()
+        self.close_source()  # the temporary output is not left behind
+
+    def on_modified(self, event):
+        """
+        :param event: modification of the left text area or of the key
+
+        Schedules live preview
+        """
+        if event.widget.edit_modified():
+            event.widget.edit_modified(False)
+            self.schedule_preview()
+
+    def schedule_preview(self):
+        """
+        Refreshes live preview once no keys were pressed for preview_delay_ms
+        """
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(CoderGUI.preview_delay_ms, self.refresh_preview)
+
+    def refresh_preview(self):
+        """
+        Updates the right text area after the changed part of the text, if live preview is on
+        """
+        self.preview_job = None
+        if not self.live_preview.get() or self.source is not None or self.worker is not None:
+            self.preview = None
+            return
+
+        from src.preview import Preview  # NumPy is loaded once live preview is used
+
+        option, mode = self.select_coding.get(), self.select_mode.get()
+        if option not in Preview.ciphers:
+            self.preview = None
+            return
+
+        key = self.key_text.get('1.0', tk.END).strip()
+        if self.preview is None or self.preview_settings != (option, mode, key):
+            self.preview = None
+            self.decode_area.delete('1.0', tk.END)
+            if Registry.get(option).check_key(key, mode == 'Encrypt') or \
+                    not Preview.supports(option, mode == 'Encrypt', key):
+                self.decode_area.insert(tk.END, 'Enter appropriate key for live preview')
+                return
+            self.preview = Preview(option, mode == 'Encrypt', key)
+            self.preview_settings = (option, mode, key)
+
+        self.show_preview(*self.preview.update(self.encode_area.get('1.0', 'end-1c')))
+
+    def advance_preview(self):
+        """
+        Computes next part of live preview far from the edit point
+        """
+        self.preview_job = None
+        if self.preview is not None:
+            self.show_preview(*self.preview.advance())
+
+    def show_preview(self, start, end, replacement):
+        """
+        :param start: start of replaced part of the right text area
+        :param end: end of replaced part of the right text area
+        :param replacement: text to replace it with
+
+        Patches the right text area, the rest of the output is computed while there is no typing
+        """
+        self.decode_area.delete('1.0 + {} chars'.format(start), '1.0 + {} chars'.format(end))
+        self.decode_area.insert('1.0 + {} chars'.format(start), replacement)
+        if self.preview.pending():
+            self.preview_job = self.root.after(1, self.advance_preview)
 
     def show_elements(self):
         """
@@ -184,20 +437,24 @@ class CoderGUI:
         mode = self.select_mode.get()
 
         self.save_keys_button.pack_forget()
+        self.image_dropdown.pack_forget()
         self.save_file_button.pack(side=tk.BOTTOM, padx=CoderGUI.padding, pady=CoderGUI.padding)
         self.load_file_button.pack(side=tk.TOP, padx=CoderGUI.padding, pady=CoderGUI.padding)
 
         self.load_file_button.config(text='Load file')
 
-        if coding in ('Vigenere', 'Vernam') or (coding == 'Caesar' and mode == 'Encrypt'):
+        cipher = Registry.get(coding)
+        if cipher.key_pattern is not None:
             # do need text area for key
             self.show_key_area()
         else:
             # do not need that area
             self.delete_key_area()
-            if coding == 'Steganography':
+            if cipher.image:
                 self.configure_stega(mode)
 
+        self.schedule_preview()  # live preview depends on the cipher and mode
+
     def show_key_area(self):
         """
         Shows text area to enter the key for en-/decoding
@@ -225,6 +482,7 @@ class CoderGUI:
             self.save_file_button.pack_forget()
             self.save_keys_button.pack(side=tk.BOTTOM, padx=CoderGUI.padding, pady=CoderGUI.padding)
             self.save_img_button.pack(side=tk.BOTTOM, padx=CoderGUI.padding, pady=CoderGUI.padding)
+            self.image_dropdown.pack(side=tk.BOTTOM, padx=CoderGUI.padding, pady=CoderGUI.padding)
         else:
             self.load_file_button.config(text='Load keys')
 
@@ -232,12 +490,22 @@ class CoderGUI:
         """
         Loads the user chosen file and puts its content into left text area
         """
+        from src.keyfile import KeyFile  # NumPy is loaded once a file is, not at program start
+
         filename = filedialog.askopenfilename()
         if filename and re.fullmatch('.+\.(txt|keys)', filename):
-            with open(filename, 'r') as f:
-                file_contents = f.read()
-                self.encode_area.delete('1.0', tk.END)
-                self.encode_area.insert(tk.END, file_contents)
+            self.close_source()
+            self.preview = None
+            if filename.endswith('.txt') and os.path.getsize(filename) > CoderGUI.large_file_sz:
+                self.source = Pager(filename)
+                self.page_frame.pack(side=tk.TOP, padx=CoderGUI.padding, pady=CoderGUI.padding,
+                                     after=self.load_file_button)
+                self.show_page(0)
+            elif not KeyFile.is_binary(filename):
+                with open(filename, 'r') as f:
+                    file_contents = f.read()
+                    self.encode_area.delete('1.0', tk.END)
+                    self.encode_area.insert(tk.END, file_contents)
             self.loaded_file = filename
         else:
             self.decode_area.delete('1.0', tk.END)
@@ -249,25 +517,81 @@ class CoderGUI:
         """
         filename = filedialog.asksaveasfilename(defaultextension='.txt',
                                                 filetypes=[('Text files', '*.txt'), ('All files', '*.*')])
-        if filename:
+        if filename and self.source is not None and os.path.realpath(filename) == os.path.realpath(self.source.path):
+            self.decode_area.delete('1.0', tk.END)
+            self.decode_area.insert('1.0', 'The loaded file can not be overwritten, please choose another one')
+        elif filename and self.output is not None:
+            shutil.copyfile(self.output.path, filename)
+        elif filename:
             with open(filename, 'w') as f:
                 f.write(self.decode_area.get('1.0', tk.END))
 
-    @staticmethod
-    def save_keys():
+    def show_page(self, number):
+        """
+        :param number: index of page of the loaded large file to show, clamped to existing pages
+
+        Shows the page of the large file in the left text area and the same page of its output in the right one
+        """
+        self.page = max(0, min(number, self.source.pages() - 1))
+        self.page_label.config(text='Page {} of {}'.format(self.page + 1, self.source.pages()))
+
+        self.encode_area.delete('1.0', tk.END)
+        self.encode_area.insert(tk.END, self.source.page(self.page))
+        if self.output is not None:
+            self.decode_area.delete('1.0', tk.END)
+            self.decode_area.insert(tk.END, self.output.page(self.page) if self.page < self.output.pages() else '')
+
+    def close_output(self):
+        """
+        Releases the output of the loaded large file and deletes its temporary file
+        """
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+        if self.output_path is not None:
+            try:
+                os.remove(self.output_path)
+            except OSError:
+                pass
+            self.output_path = None
+
+    def close_source(self):
+        """
+        Leaves large file mode, releasing the loaded file and its output
+        """
+        self.close_output()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+            self.page_frame.pack_forget()
+
+    def save_keys(self):
         """
         Saves file with steganography keys into user chosen directory
         """
+        if self.keys is None:
+            self.decode_area.delete('1.0', tk.END)
+            self.decode_area.insert('1.0', 'Please encrypt a text into an image before saving its keys')
+            return
         filename = filedialog.asksaveasfilename(defaultextension='.keys', filetypes=[('All files', '*.*')])
         if filename:
-            shutil.copyfile('coords.keys', filename)
+            with open(filename, 'wb') as keys_file:
+                keys_file.write(self.keys)
 
-    @staticmethod
-    def save_image():
+    def save_image(self):
         """
         Saves steganography encrypted image into user chosen directory
         """
-        filename = filedialog.asksaveasfilename(defaultextension='.png',
-                                                filetypes=[('Image files', '*.png'), ('All files', '*.*')])
+        from src.stega import Stega  # loaded by the encryption already
+
+        if self.image is None:
+            self.decode_area.delete('1.0', tk.END)
+            self.decode_area.insert('1.0', 'Please encrypt a text into an image before saving it')
+            return
+        data, image_format = self.image
+        extension = Stega.formats[image_format]
+        filename = filedialog.asksaveasfilename(defaultextension=extension,
+                                                filetypes=[('Image files', '*' + extension), ('All files', '*.*')])
         if filename:
-            shutil.copyfile('encoded.png', filename)
+            with open(filename, 'wb') as image_file:
+                image_file.write(data)
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+
+import threading
+
+
+class KeyCache:
+    """
+    Class with a bounded LRU cache of material derived from keys: results of key validation, codes of key letters,
+    tiled key arrays and fused pipeline stages. Entries are keyed by (cipher, key), so many short messages under
+    a handful of keys derive them once, and the least recently used entries are evicted beyond maxsize
+    """
+    maxsize = 256
+    entries = OrderedDict()  # (cipher, key) -> derived material
+    lock = threading.Lock()
+    hits = 0
+    misses = 0
+    evictions = 0
+
+    @staticmethod
+    def get(cipher, key, build):
+        """
+        :param cipher: name of cipher and kind of material, e.g. 'vigenere.encrypt'
+        :param key: hashable key the material is derived from
+        :param build: function taking the key and returning the material, called on a miss
+        :return: cached or newly built material, shared between callers, so it must not be changed
+
+        Exceptions raised by build are passed on and nothing is cached then
+        """
+        entry = (cipher, key)
+        with KeyCache.lock:
+            if entry in KeyCache.entries:
+                KeyCache.entries.move_to_end(entry)
+                KeyCache.hits += 1
+                return KeyCache.entries[entry]
+            KeyCache.misses += 1
+
+        material = build(key)  # outside the lock, building may look up other entries
+        with KeyCache.lock:
+            KeyCache.entries[entry] = material
+            while len(KeyCache.entries) > KeyCache.maxsize:
+                KeyCache.entries.popitem(last=False)
+                KeyCache.evictions += 1
+        return material
+
+    @staticmethod
+    def resize(maxsize):
+        """
+        :param maxsize: number of entries to keep at most, 0 turns caching off
+        """
+        with KeyCache.lock:
+            KeyCache.maxsize = maxsize
+            while len(KeyCache.entries) > maxsize:
+                KeyCache.entries.popitem(last=False)
+                KeyCache.evictions += 1
+
+    @staticmethod
+    def clear():
+        """
+        Drops all entries and resets statistics, e.g. after a cipher is registered again
+        """
+        with KeyCache.lock:
+            KeyCache.entries.clear()
+            KeyCache.hits = KeyCache.misses = KeyCache.evictions = 0
+
+    @staticmethod
+    def stats():
+        """
+        :return: dict with number of entries, maxsize, hits, misses, evictions and hit rate
+        """
+        with KeyCache.lock:
+            lookups = KeyCache.hits + KeyCache.misses
+            return {'size': len(KeyCache.entries), 'maxsize': KeyCache.maxsize, 'hits': KeyCache.hits,
+                    'misses': KeyCache.misses, 'evictions': KeyCache.evictions,
+                    'hit_rate': KeyCache.hits / lookups if lookups else 0.0}
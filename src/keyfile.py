@@ -0,0 +1,232 @@
+from src.globals import Globals
+from src.scheduler import PixelScheduler
+
+import contextlib
+import numpy as np
+import os
+import struct
+
+
+class KeyFile:
+    """
+    Class to read and write steganography keys in text and packed binary formats
+
+    Binary format (little-endian): header, then x coordinates, y coordinates and initial RGB of every pixel.
+    Header holds magic bytes, version, width of one coordinate in bytes (2 or 4), image width and height
+    and the number of keys. Seeded version has no coordinates, it stores the seed of PixelScheduler instead.
+    Bundle version holds many messages: it is seeded and its header holds the width of one message id in bytes
+    and the number of messages instead, followed by the index of messages sorted by id
+    """
+    magic = b'STGK'
+    version = 1
+    seeded_version = 2
+    bundle_version = 3
+    prefix = struct.Struct('<4sH')
+    header = struct.Struct('<4sHHIIQ')
+    seeded_header = struct.Struct('<4sHHIIQQ')
+    bundle_header = struct.Struct('<4sHHIIQQQ')
+
+    @staticmethod
+    def __coord_type__(width):
+        """
+        :param width: width of one coordinate in bytes
+        :return: little-endian numpy type of coordinates
+        """
+        return np.dtype('<u2') if width == 2 else np.dtype('<u4')
+
+    @staticmethod
+    def is_binary(keys_path):
+        """
+        :param keys_path: path to file with keys
+        :return: whether the file is in binary format
+        """
+        with open(keys_path, 'rb') as keys_file:
+            return keys_file.read(len(KeyFile.magic)) == KeyFile.magic
+
+    @staticmethod
+    def __output__(keys_path):
+        """
+        :param keys_path: path or binary file object, e.g. io.BytesIO, to write binary keys to
+        :return: binary file to be used in a with statement, a file object given stays open
+        """
+        if isinstance(keys_path, (str, os.PathLike)):
+            return open(keys_path, 'wb')
+        return contextlib.nullcontext(keys_path)
+
+    @staticmethod
+    def pack(rgb):
+        """
+        :param rgb: (n, 3) array of initial pixel colors
+        :return: array of keys, RGB packed into 24 bits
+        """
+        rgb = rgb.astype(np.int64)
+        return (rgb[:, 0] << (2 * Globals.char_8bit)) | (rgb[:, 1] << Globals.char_8bit) | rgb[:, 2]
+
+    @staticmethod
+    def unpack(keys):
+        """
+        :param keys: array of keys, RGB packed into 24 bits
+        :return: (n, 3) uint8 array of initial pixel colors
+        """
+        return np.stack((keys >> (2 * Globals.char_8bit), keys >> Globals.char_8bit, keys),
+                        axis=1).astype(np.uint8)
+
+    @staticmethod
+    def write_text(keys_path, xs, ys, keys):
+        """
+        :param keys_path: path to text file with keys in '(x, y) :: key' format
+        :param xs: x coordinates of target pixels
+        :param ys: y coordinates of target pixels
+        :param keys: initial RGB of every target pixel packed into 24 bits
+        """
+        with open(keys_path, 'w') as coords:
+            coords.writelines(map('({}, {}) :: {}\n'.format, xs.tolist(), ys.tolist(), keys.tolist()))
+
+    @staticmethod
+    def read_text(keys_path):
+        """
+        :param keys_path: path to text file with keys in '(x, y) :: key' format
+        :return: arrays of x coordinates, y coordinates and keys
+
+        Parses the whole file at once instead of running regexes line by line
+        """
+        with open(keys_path) as coords:
+            content = coords.read().translate(str.maketrans('(),:', '    '))
+        values = np.fromstring(content, dtype=np.int64, sep=' ').reshape(-1, 3)
+        return values[:, 0], values[:, 1], values[:, 2]
+
+    @staticmethod
+    def write_binary(keys_path, xs, ys, keys, size):
+        """
+        :param keys_path: path or binary file object to write keys to
+        :param xs: x coordinates of target pixels
+        :param ys: y coordinates of target pixels
+        :param keys: initial RGB of every target pixel packed into 24 bits
+        :param size: width and height of the image
+        """
+        width = 2 if max(size) <= np.iinfo(np.uint16).max else 4
+        coord_type = KeyFile.__coord_type__(width)
+
+        with KeyFile.__output__(keys_path) as keys_file:
+            keys_file.write(KeyFile.header.pack(KeyFile.magic, KeyFile.version, width, size[0], size[1], len(keys)))
+            keys_file.write(np.asarray(xs, dtype=coord_type).tobytes())
+            keys_file.write(np.asarray(ys, dtype=coord_type).tobytes())
+            keys_file.write(KeyFile.unpack(np.asarray(keys, dtype=np.int64)).tobytes())
+
+    @staticmethod
+    def write_seeded(keys_path, seed, keys, size):
+        """
+        :param keys_path: path or binary file object to write keys to
+        :param seed: seed of PixelScheduler which chose the target pixels
+        :param keys: initial RGB of every target pixel packed into 24 bits
+        :param size: width and height of the image
+        """
+        with KeyFile.__output__(keys_path) as keys_file:
+            keys_file.write(KeyFile.seeded_header.pack(KeyFile.magic, KeyFile.seeded_version, 0,
+                                                       size[0], size[1], len(keys), seed))
+            keys_file.write(KeyFile.unpack(np.asarray(keys, dtype=np.int64)).tobytes())
+
+    @staticmethod
+    def index_type(width):
+        """
+        :param width: width of one message id in bytes
+        :return: numpy type of one index entry: id, number of keys before the message and number of its keys
+        """
+        return np.dtype([('id', 'S{}'.format(width)), ('start', '<u8'), ('count', '<u8')])
+
+    @staticmethod
+    def write_bundle(keys_path, seed, index, keys, size):
+        """
+        :param keys_path: path or binary file object to write keys to
+        :param seed: seed of PixelScheduler which chose the target pixels of all messages
+        :param index: array of KeyFile.index_type sorted by id
+        :param keys: initial RGB of every target pixel packed into 24 bits, messages one after another
+        :param size: width and height of the image
+        """
+        with KeyFile.__output__(keys_path) as keys_file:
+            keys_file.write(KeyFile.bundle_header.pack(KeyFile.magic, KeyFile.bundle_version,
+                                                       index.dtype['id'].itemsize, size[0], size[1], len(keys),
+                                                       seed, index.size))
+            keys_file.write(index.tobytes())
+            keys_file.write(KeyFile.unpack(np.asarray(keys, dtype=np.int64)).tobytes())
+
+    @staticmethod
+    def map_bundle(keys_path):
+        """
+        :param keys_path: path to binary file with keys of many messages
+        :return: image size, seed, index sorted by id and (n, 3) initial RGB of all messages
+
+        Memory-maps the file, returned index and RGB are read-only views into it
+        """
+        mapped = np.memmap(keys_path, dtype=np.uint8, mode='r')
+        magic, version = KeyFile.prefix.unpack(mapped[:KeyFile.prefix.size].tobytes())
+        if magic != KeyFile.magic or version != KeyFile.bundle_version:
+            raise ValueError('Not a keys file of many messages: {}'.format(keys_path))
+
+        _, _, width, img_width, img_height, count, seed, messages = KeyFile.bundle_header.unpack(
+            mapped[:KeyFile.bundle_header.size].tobytes())
+        index_type = KeyFile.index_type(width)
+        start = KeyFile.bundle_header.size + messages * index_type.itemsize
+        index = mapped[KeyFile.bundle_header.size:start].view(index_type)
+        rgb = mapped[start:start + count * Globals.color_model_sz].reshape(-1, Globals.color_model_sz)
+        return (img_width, img_height), seed, index, rgb
+
+    @staticmethod
+    def map_binary(keys_path):
+        """
+        :param keys_path: path to binary file with keys
+        :return: image size, arrays of x coordinates, y coordinates and (n, 3) initial RGB
+
+        Memory-maps the file, returned RGB and stored coordinates are read-only views into it.
+        Coordinates of seeded files are regenerated from the seed
+        """
+        mapped = np.memmap(keys_path, dtype=np.uint8, mode='r')
+        magic, version = KeyFile.prefix.unpack(mapped[:KeyFile.prefix.size].tobytes())
+        if magic != KeyFile.magic or version not in (KeyFile.version, KeyFile.seeded_version):
+            raise ValueError('Unsupported keys file: {}'.format(keys_path))
+
+        if version == KeyFile.seeded_version:
+            _, _, _, img_width, img_height, count, seed = KeyFile.seeded_header.unpack(
+                mapped[:KeyFile.seeded_header.size].tobytes())
+            xs, ys = PixelScheduler((img_width, img_height), seed).coords(count)
+            start = KeyFile.seeded_header.size
+        else:
+            _, _, width, img_width, img_height, count = KeyFile.header.unpack(mapped[:KeyFile.header.size].tobytes())
+            coord_type = KeyFile.__coord_type__(width)
+            start = KeyFile.header.size
+            xs = mapped[start:start + count * width].view(coord_type)
+            ys = mapped[start + count * width:start + 2 * count * width].view(coord_type)
+            start += 2 * count * width
+
+        rgb = mapped[start:start + count * Globals.color_model_sz].reshape(-1, Globals.color_model_sz)
+        return (img_width, img_height), xs, ys, rgb
+
+    @staticmethod
+    def read(keys_path):
+        """
+        :param keys_path: path to file with keys in any format
+        :return: arrays of x coordinates, y coordinates and keys
+        """
+        if KeyFile.is_binary(keys_path):
+            _, xs, ys, rgb = KeyFile.map_binary(keys_path)
+            return xs, ys, KeyFile.pack(rgb)
+        return KeyFile.read_text(keys_path)
+
+    @staticmethod
+    def convert(src_path, dst_path, size=None):
+        """
+        :param src_path: path to file with keys in one format
+        :param dst_path: path to write the keys in the other format to
+        :param size: width and height of the image for text to binary conversion,
+                     by default the smallest one holding all coordinates
+
+        Converts text keys to binary and binary keys to text
+        """
+        if KeyFile.is_binary(src_path):
+            _, xs, ys, rgb = KeyFile.map_binary(src_path)
+            KeyFile.write_text(dst_path, xs, ys, KeyFile.pack(rgb))
+        else:
+            xs, ys, keys = KeyFile.read_text(src_path)
+            if size is None:
+                size = (int(xs.max(initial=0)) + 1, int(ys.max(initial=0)) + 1)
+            KeyFile.write_binary(dst_path, xs, ys, keys, size)
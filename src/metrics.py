@@ -0,0 +1,449 @@
+import sys
+import threading
+import time
+
+
+class Span:
+    """
+    Class of one measured operation or of its phase: wall time, size of input and, while tracemalloc traces,
+    memory allocated and peak memory above the level at its start
+    """
+    lock = threading.Lock()
+    open_spans = set()  # spans measuring memory, they keep the peak tracemalloc forgets on reset_peak
+
+    def __init__(self, name, size=0, parent=None):
+        """ constructor for span object\n
+            :param name: name of operation or phase
+            :param size: characters or bytes processed
+            :param parent: span this one is a phase of, None for operations
+        """
+        self.name = name
+        self.size = size
+        self.parent = parent
+        self.phases = {}  # phase name -> dict of count, seconds, size, allocated and peak
+        self.started = 0.0
+        self.seconds = 0.0
+        self.memory = None  # traced memory at start
+        self.seen_peak = 0
+        self.allocated = 0
+        self.peak = 0
+
+    def start(self):
+        """
+        :return: the span, measuring from now on
+        """
+        import tracemalloc  # tracemalloc, logging and json are loaded only when metrics are on
+
+        if tracemalloc.is_tracing():
+            with Span.lock:
+                self.memory, peak = tracemalloc.get_traced_memory()
+                for span in Span.open_spans:
+                    span.seen_peak = max(span.seen_peak, peak)
+                tracemalloc.reset_peak()
+                Span.open_spans.add(self)
+        self.started = time.perf_counter()
+        return self
+
+    def finish(self):
+        """
+        Stops measuring and records the span into its parent or into Metrics
+        """
+        import tracemalloc
+
+        self.seconds = time.perf_counter() - self.started
+        if self.memory is not None:
+            with Span.lock:
+                current, peak = tracemalloc.get_traced_memory()
+                Span.open_spans.discard(self)
+                self.allocated = current - self.memory
+                self.peak = max(peak, self.seen_peak) - self.memory
+
+        if self.parent is None:
+            Metrics.record(self)
+        else:
+            self.parent.add_phase(self.name, self.seconds, self.size, self.allocated, self.peak)
+
+    def add_phase(self, name, seconds, size=0, allocated=0, peak=0):
+        """
+        :param name: name of phase
+        :param seconds: wall time of the phase
+        :param size: characters or bytes processed in the phase
+        :param allocated: memory left allocated by the phase
+        :param peak: peak memory of the phase
+        """
+        phase = self.phases.setdefault(name, {'count': 0, 'seconds': 0.0, 'size': 0, 'allocated': 0, 'peak': 0})
+        phase['count'] += 1
+        phase['seconds'] += seconds
+        phase['size'] += size
+        phase['allocated'] += allocated
+        phase['peak'] = max(phase['peak'], peak)
+
+    def rest(self, name):
+        """
+        :param name: name of phase
+
+        Records the time since start not covered by other phases as a phase, e.g. 'transform' between reads
+        and writes of a stream
+        """
+        covered = sum(phase['seconds'] for phase in self.phases.values())
+        self.add_phase(name, max(time.perf_counter() - self.started - covered, 0.0), self.size)
+
+    def phase(self, name, size=0):
+        """
+        :param name: name of phase
+        :param size: characters or bytes processed in the phase
+        :return: span of the phase, to be used in a with statement
+        """
+        return Span(name, size, self)
+
+    def io(self, file, name, sized=False):
+        """
+        :param file: file object
+        :param name: name of phase to count its reads and writes into
+        :param sized: whether what is read or written is the size of the span as well
+        :return: file object timing its reads and writes
+        """
+        return TimedFile(file, self, name, sized)
+
+    def __enter__(self):
+        if self.parent is None:  # phases found by Metrics.phase belong to operations
+            Metrics.stack().append(self)
+        return self.start()
+
+    def __exit__(self, *exc):
+        if self.parent is None:
+            Metrics.stack().pop()
+        self.finish()
+        return False
+
+
+class NoSpan:
+    """
+    Class of the span returned while metrics are off, every method does nothing
+    """
+    size = 0
+
+    def start(self):
+        return self
+
+    def finish(self):
+        pass
+
+    def add_phase(self, name, seconds, size=0, allocated=0, peak=0):
+        pass
+
+    def rest(self, name):
+        pass
+
+    def phase(self, name, size=0):
+        return self
+
+    def io(self, file, name, sized=False):
+        return file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class TimedFile:
+    """
+    Class of file object wrapper which adds time spent in read, readinto and write to a phase of a span
+    """
+
+    def __init__(self, file, span, name, sized=False):
+        """ constructor for timed file object\n
+            :param file: file object to wrap
+            :param span: span to add the phase to
+            :param name: name of the phase
+            :param sized: whether to add sizes of reads and writes to the size of the span
+        """
+        self.file = file
+        self.span = span
+        self.name = name
+        self.sized = sized
+
+    def __timed__(self, method, argument):
+        start = time.perf_counter()
+        result = method(argument)
+        size = result if isinstance(result, int) else len(result or '')
+        self.span.add_phase(self.name, time.perf_counter() - start, size)
+        if self.sized:
+            self.span.size += size
+        return result
+
+    def read(self, size=-1):
+        return self.__timed__(self.file.read, size)
+
+    def readinto(self, buffer):
+        return self.__timed__(self.file.readinto, buffer)
+
+    def write(self, data):
+        return self.__timed__(self.file.write, data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class Metrics:
+    """
+    Class with opt-in instrumentation. While it is off, every hook returns a shared do-nothing span or calls
+    the function straight away, so instrumented code runs at full speed. Once enabled, operations record wall time,
+    characters or bytes processed, allocations (with tracemalloc) and their phases: read, transform, write, render.
+    Totals are exported as a snapshot dict, JSON or a text table, and every operation can be logged as a JSON line
+    to the 'crypto.metrics' logger
+    """
+    enabled = False
+    allocations = False  # whether tracemalloc was started by enable
+    records = {}  # operation name -> totals
+    local = threading.local()
+    noop = NoSpan()
+    log = False  # whether operations are logged to the 'crypto.metrics' logger
+    profiles = None  # cProfile profiles of all threads while profile runs
+
+    @staticmethod
+    def enable(allocations=False, log=False):
+        """
+        :param allocations: whether to trace memory allocations, which makes Python code a few times slower
+        :param log: whether to print the JSON line of every operation to stderr
+        """
+        import logging
+        import tracemalloc
+
+        Metrics.enabled = True
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            Metrics.allocations = True
+        logger = logging.getLogger('crypto.metrics')
+        if log and not logger.handlers:
+            logger.addHandler(logging.StreamHandler(sys.stderr))
+            logger.setLevel(logging.INFO)
+        Metrics.log = logger.isEnabledFor(logging.INFO)
+
+    @staticmethod
+    def disable():
+        """
+        Turns metrics off, recorded totals are kept
+        """
+        import tracemalloc
+
+        Metrics.enabled = False
+        if Metrics.allocations:
+            tracemalloc.stop()
+            Metrics.allocations = False
+
+    @staticmethod
+    def stack():
+        """
+        :return: list of operations open in the current thread
+        """
+        if not hasattr(Metrics.local, 'stack'):
+            Metrics.local.stack = []
+        return Metrics.local.stack
+
+    @staticmethod
+    def paused():
+        """
+        :return: whether operations of the current thread are left out of the metrics, see Metrics.pause
+        """
+        return getattr(Metrics.local, 'paused', False)
+
+    @staticmethod
+    def pause(paused=True):
+        """
+        :param paused: whether to leave operations of the current thread out of the metrics
+        :return: previous state, to be passed back to restore it
+
+        Other threads keep being measured, e.g. while one of them calibrates engines in the background
+        """
+        previous, Metrics.local.paused = Metrics.paused(), paused
+        return previous
+
+    @staticmethod
+    def operation(name, size=0):
+        """
+        :param name: name of operation
+        :param size: characters or bytes processed
+        :return: span to be used in a with statement, or started and finished by hand across threads
+        """
+        return Span(name, size) if Metrics.enabled and not Metrics.paused() else Metrics.noop
+
+    @staticmethod
+    def phase(name, size=0):
+        """
+        :param name: name of phase
+        :param size: characters or bytes processed in the phase
+        :return: span of the phase of the innermost operation open in this thread, to be used in a with statement
+        """
+        if not Metrics.enabled or Metrics.paused() or not Metrics.stack():
+            return Metrics.noop
+        return Metrics.stack()[-1].phase(name, size)
+
+    @staticmethod
+    def timed(func):
+        """
+        :param func: function to measure, its first argument is taken as the input for the size
+        :return: function recording an operation named after func on every call while metrics are on
+        """
+        def wrapper(*args, **kwargs):
+            if not Metrics.enabled or Metrics.paused():
+                return func(*args, **kwargs)
+            size = len(args[0]) if args and isinstance(args[0], (str, bytes, bytearray)) else 0
+            with Metrics.operation(func.__qualname__, size):
+                return func(*args, **kwargs)
+
+        wrapper.__name__, wrapper.__qualname__, wrapper.__doc__ = func.__name__, func.__qualname__, func.__doc__
+        return wrapper
+
+    @staticmethod
+    def record(span):
+        """
+        :param span: finished operation, added to the totals and logged
+        """
+        with Span.lock:
+            total = Metrics.records.setdefault(span.name, {'count': 0, 'seconds': 0.0, 'size': 0, 'allocated': 0,
+                                                           'peak': 0, 'phases': {}})
+            total['count'] += 1
+            total['seconds'] += span.seconds
+            total['size'] += span.size
+            total['allocated'] += span.allocated
+            total['peak'] = max(total['peak'], span.peak)
+            for name, phase in span.phases.items():
+                Metrics.__accumulate__(total['phases'].setdefault(name, dict.fromkeys(phase, 0)), phase)
+
+        if Metrics.log:
+            import json
+            import logging
+            logging.getLogger('crypto.metrics').info(json.dumps({
+                'operation': span.name, 'seconds': span.seconds, 'size': span.size, 'allocated': span.allocated,
+                'peak': span.peak, 'phases': span.phases}))
+
+    @staticmethod
+    def __accumulate__(total, part):
+        """
+        :param total: dict of totals, changed in place
+        :param part: dict of the same keys to add, peaks are maximized
+        """
+        for key, value in part.items():
+            total[key] = max(total[key], value) if key == 'peak' else total[key] + value
+
+    @staticmethod
+    def snapshot():
+        """
+        :return: copy of totals of all operations
+        """
+        import copy
+
+        with Span.lock:
+            return copy.deepcopy(Metrics.records)
+
+    @staticmethod
+    def drain():
+        """
+        :return: totals recorded so far, which are cleared. Worker processes send them to the main one
+        """
+        with Span.lock:
+            records, Metrics.records = Metrics.records, {}
+        return records
+
+    @staticmethod
+    def merge(records):
+        """
+        :param records: totals drained in another process
+        """
+        with Span.lock:
+            for name, part in records.items():
+                total = Metrics.records.setdefault(name, {'count': 0, 'seconds': 0.0, 'size': 0, 'allocated': 0,
+                                                          'peak': 0, 'phases': {}})
+                Metrics.__accumulate__(total, {key: value for key, value in part.items() if key != 'phases'})
+                for phase_name, phase in part['phases'].items():
+                    Metrics.__accumulate__(total['phases'].setdefault(phase_name, dict.fromkeys(phase, 0)), phase)
+
+    @staticmethod
+    def report():
+        """
+        :return: text table of totals, phases are listed under their operations
+        """
+        lines = ['{:<34} {:>7} {:>10} {:>12} {:>10} {:>12} {:>10}'.format(
+            'operation / phase', 'count', 'total, ms', 'size', 'MB/s', 'alloc, KB', 'peak, KB')]
+        for name, total in sorted(Metrics.snapshot().items()):
+            rows = [(name, total)] + [('  ' + phase_name, phase) for phase_name, phase in total['phases'].items()]
+            for row_name, row in rows:
+                lines.append('{:<34} {:>7} {:>10.2f} {:>12} {:>10.1f} {:>12.1f} {:>10.1f}'.format(
+                    row_name, row['count'], row['seconds'] * 1000, row['size'],
+                    row['size'] / (1 << 20) / row['seconds'] if row['seconds'] else 0.0,
+                    row['allocated'] / 1024, row['peak'] / 1024))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def export(path):
+        """
+        :param path: path to write JSON snapshot to, '-' to print the text table to stderr
+        """
+        import json
+
+        if path == '-':
+            print(Metrics.report(), file=sys.stderr)
+            return
+        with open(path, 'w') as file:
+            json.dump(Metrics.snapshot(), file, indent=2)
+
+    @staticmethod
+    def profile(path, func, *args, **kwargs):
+        """
+        :param path: path to write the report to
+        :param func: function to run
+        :return: result of func
+
+        Runs func under cProfile and tracemalloc. Threads started by Worker are profiled as well.
+        The report holds functions sorted by cumulative time and lines which allocated most memory
+        """
+        import cProfile
+        import io
+        import pstats
+        import tracemalloc
+
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        Metrics.profiles = [cProfile.Profile()]
+        Metrics.profiles[0].enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            Metrics.profiles[0].disable()
+            allocations = tracemalloc.take_snapshot().statistics('lineno')
+            if not tracing:
+                tracemalloc.stop()
+
+            text = io.StringIO()
+            stats = pstats.Stats(Metrics.profiles[0], stream=text)
+            for profile in Metrics.profiles[1:]:
+                stats.add(profile)
+            Metrics.profiles = None
+            stats.sort_stats('cumulative').print_stats(40)
+            text.write('Memory allocated by lines, still alive at the end:\n')
+            for statistic in allocations[:20]:
+                text.write('{}\n'.format(statistic))
+            with open(path, 'w') as report:
+                report.write(text.getvalue())
+
+    @staticmethod
+    def thread_profile(func, *args):
+        """
+        :param func: function to run in a background thread
+        :return: result of func, which is profiled if profile is running
+        """
+        if Metrics.profiles is None:
+            return func(*args)
+
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            Metrics.profiles.append(profile)
@@ -0,0 +1,62 @@
+import mmap
+import os
+
+
+class Pager:
+    """
+    Class to show a big UTF-8 text file page by page. Only a memory map of the file is kept,
+    pages are decoded when they are shown
+    """
+    page_sz = 1 << 16  # bytes per page, few enough for Tk Text widget to stay responsive
+    encoding = 'utf-8'
+
+    def __init__(self, path, page_sz=page_sz):
+        """ constructor for pager object\n
+            :param path: path to text file
+            :param page_sz: number of bytes per page
+        """
+        self.path = path
+        self.page_sz = page_sz
+        self.size = os.path.getsize(path)
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+    def __boundary__(self, offset):
+        """
+        :param offset: byte offset in the file
+        :return: offset of the first character starting at it or after it
+        """
+        offset = min(offset, self.size)
+        while offset < self.size and self.data[offset] & 0xC0 == 0x80:  # continuation byte of UTF-8 character
+            offset += 1
+        return offset
+
+    def pages(self):
+        """
+        :return: number of pages, empty file has one empty page
+        """
+        return max(1, -(-self.size // self.page_sz))
+
+    def text(self, start=0, end=None):
+        """
+        :param start: byte offset to start from
+        :param end: byte offset to end at, end of the file by default
+        :return: decoded text, offsets are moved to the nearest character starts
+        """
+        end = self.size if end is None else end
+        return self.data[self.__boundary__(start):self.__boundary__(end)].decode(Pager.encoding, 'replace')
+
+    def page(self, number):
+        """
+        :param number: index of page
+        :return: text of the page
+        """
+        return self.text(number * self.page_sz, (number + 1) * self.page_sz)
+
+    def close(self):
+        """
+        Releases the memory map and the file
+        """
+        if self.size:
+            self.data.close()
+        self.file.close()
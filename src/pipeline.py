@@ -0,0 +1,173 @@
+from src.b64 import Base64
+from src.encode import Encrypt
+from src.globals import Globals
+from src.keycache import KeyCache
+from src.registry import Registry
+from src.stream import DecryptStream, Stream
+from src.tables import Tables
+from src.vector import Vector
+
+import math
+import re
+
+
+class Pipeline:
+    """
+    Class to run a chain of ciphers over a text in one streaming pass. Every chunk goes through all the stages
+    before the next one is read, so no intermediate text is kept in full. Adjacent Caesar and Vigenere stages
+    shift the same letters, so they are fused into one Vigenere key and the letters are shifted once
+    """
+    stages = ('caesar', 'vigenere', 'vernam', 'base64')
+    fuse_limit = 1 << 12  # longest fused key, stages whose keys would make a longer one are run one by one
+    stage_pattern = '[a-zA-Z0-9]+(:[a-zA-Z0-9]+)?'
+    spec_pattern = '^\\s*{0}(\\s*,\\s*{0})*\\s*$'.format(stage_pattern)
+
+    def __init__(self, spec):
+        """ constructor for pipeline object\n
+            :param spec: stages separated by commas, each one is a cipher name and its key after a colon,
+                         e.g. 'vigenere:LEMON, caesar:3, base64'. The same string is the key of 'Pipeline'
+                         in GUI and command line. Raises ValueError if a stage is wrong
+        """
+        self.chain = KeyCache.get('pipeline', spec, Pipeline.parse)
+
+    @staticmethod
+    def parse(spec):
+        """
+        :param spec: stages separated by commas, see constructor
+        :return: tuple of (cipher name, key) pairs, the key is empty for Base64
+
+        Raises ValueError for unknown ciphers and wrong keys
+        """
+        if not re.fullmatch(Pipeline.spec_pattern, spec):
+            raise ValueError('Pipeline must look like vigenere:KEY, caesar:3, base64')
+
+        chain = []
+        for stage in spec.split(','):
+            name, _, key = stage.strip().partition(':')
+            if name.lower() not in Pipeline.stages:
+                raise ValueError('{} can not be a pipeline stage, use one of: {}'.format(name,
+                                                                                      ', '.join(Pipeline.stages)))
+            cipher = Registry.get(name)
+            message = cipher.check_key(key, True)
+            if message:
+                raise ValueError('{}: {}'.format(cipher.name, message))
+            chain.append((name.lower(), key if cipher.key_pattern is not None else ''))
+        return tuple(chain)
+
+    def spec(self):
+        """
+        :return: normalized string form of the pipeline, taken by the constructor
+        """
+        return ', '.join('{}:{}'.format(name, key) if key else name for name, key in self.chain)
+
+    def __ops__(self, encrypt):
+        """
+        :param encrypt: whether to encrypt or decrypt
+        :return: list of (kind, key, decrypt) operations, decryption runs inverse stages in reverse order.
+                 Key of 'shift' is a list of letter shifts applied in turn, of 'vernam' the key string
+        """
+        ops = []
+        for name, key in self.chain if encrypt else reversed(self.chain):
+            sign = 1 if encrypt else -1
+            match name:
+                case 'caesar':
+                    ops.append(('shift', [sign * int(key) % Globals.alphabet_len], not encrypt))
+                case 'vigenere':
+                    ops.append(('shift', [sign * (ord(elem.lower()) - ord('a')) % Globals.alphabet_len
+                                          for elem in key], not encrypt))
+                case 'vernam':
+                    ops.append(('vernam', key, not encrypt))
+                case 'base64':
+                    ops.append(('base64', None, not encrypt))
+        return ops
+
+    @staticmethod
+    def __fuse__(ops):
+        """
+        :param ops: operations made by __ops__
+        :return: operations with adjacent shifts merged
+
+        Caesar and Vigenere map a cased character to an English letter of the same case and keep the rest,
+        so every next shift sees the letters at the same positions. Two shifts with keys of lengths m and n
+        make one with a key of length lcm(m, n), holding sums of the shifts met at every position
+        """
+        fused = []
+        for kind, key, decrypt in ops:
+            if fused and kind == 'shift' and fused[-1][0] == 'shift':
+                previous = fused[-1][1]
+                size = math.lcm(len(previous), len(key))
+                if size <= Pipeline.fuse_limit:
+                    fused[-1] = ('shift', [(previous[i % len(previous)] + key[i % len(key)]) % Globals.alphabet_len
+                                           for i in range(size)], decrypt)
+                    continue
+            fused.append((kind, key, decrypt))
+        return fused
+
+    def __stages__(self, encrypt):
+        """
+        :param encrypt: whether to encrypt or decrypt
+        :return: fused operations, kept in KeyCache for the chain
+        """
+        return KeyCache.get('pipeline.encrypt' if encrypt else 'pipeline.decrypt', self.chain,
+                            lambda chain: Pipeline.__fuse__(self.__ops__(encrypt)))
+
+    def plan(self, encrypt=True):
+        """
+        :param encrypt: whether to encrypt or decrypt
+        :return: stages really run after fusion, in string form of the pipeline
+        """
+        names = []
+        for kind, key, decrypt in self.__stages__(encrypt):
+            match kind:
+                case 'shift':
+                    names.append('caesar:{}'.format(key[0]) if len(key) == 1 else
+                                 'vigenere:{}'.format(''.join(chr(ord('a') + code) for code in key)))
+                case 'vernam':
+                    names.append('vernam:{}{}'.format(key, ' (decrypt)' if decrypt else ''))
+                case 'base64':
+                    names.append('base64{}'.format(' (decrypt)' if decrypt else ''))
+        return names
+
+    @staticmethod
+    def __apply__(chunks, kind, key, decrypt):
+        """
+        :param chunks: iterable of text chunks
+        :param kind: 'shift', 'vernam' or 'base64'
+        :param key: key of operation, see __ops__
+        :param decrypt: whether the operation decrypts
+        :return: generator of transformed chunks
+        """
+        match kind:
+            case 'shift' if len(key) == 1:
+                for chunk in chunks:
+                    yield Tables.caesar(chunk, key[0])
+            case 'shift':
+                letters, position = ''.join(chr(ord('a') + code) for code in key), 0
+                for chunk in chunks:
+                    output, position = Vector.vigenere_part(chunk, letters, position)
+                    yield output
+            case 'vernam':
+                position = 0
+                for chunk in chunks:
+                    output, position = Vector.vernam_part(chunk, key, position, decrypt)
+                    yield output
+            case 'base64' if decrypt:
+                yield from DecryptStream.base64_chunks(chunks)
+            case 'base64':
+                for chunk in Stream.regroup(chunks, Encrypt.base64_step):
+                    yield Base64.encrypt(chunk)
+
+    def run(self, src, dst, encrypt=True, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with text to transform
+        :param dst: file object to write the result into
+        :param encrypt: whether to encrypt or decrypt
+        :param chunk_sz: number of characters to read at once
+
+        Output is identical to running the stages one after another over the whole text
+        """
+        chunks = Stream.chunks(src, chunk_sz)
+        for kind, key, decrypt in self.__stages__(encrypt):
+            chunks = Pipeline.__apply__(chunks, kind, key, decrypt)
+        for chunk in chunks:
+            dst.write(chunk)
@@ -0,0 +1,214 @@
+from src.b64 import Base64
+from src.crack import Crack
+from src.decode import Decrypt
+from src.encode import Encrypt
+from src.globals import Globals
+from src.tables import Tables
+from src.vector import Vector
+
+import numpy as np
+
+
+class Preview:
+    """
+    Class to keep en-/decrypted version of a text being edited. After an edit only the output
+    from the edit point (or the start of its Base64 group) is recomputed, and the old output
+    after the edit is reused whenever the key lines up with it the same way as before.
+    Otherwise the rest of the output is recomputed in steps, so no step takes long
+    """
+    block_sz = 12 << 10  # characters between saved key positions, whole number of Base64 groups
+    horizon = 2 * block_sz  # characters computed after the edit at once, the rest is left to advance
+    ciphers = ('Caesar', 'Vigenere', 'Vernam', 'Base64')
+
+    def __init__(self, cipher, encrypt, key=''):
+        """ constructor for preview object\n
+            :param cipher: 'Caesar', 'Vigenere', 'Vernam' or 'Base64'
+            :param encrypt: whether to encrypt or decrypt
+            :param key: key of the cipher, checked by caller. Caesar decryption finds its own key if it is empty
+        """
+        self.cipher = cipher
+        self.encrypt = encrypt
+        self.key = key
+        self.text = ''
+        self.output = ''  # output of text[:done]
+        self.done = 0
+        self.position = 0  # key position at done
+        self.checkpoints = [(0, 0)]  # (offset in text, key position there) up to done, every block_sz characters
+        self.counts = np.zeros(Globals.alphabet_len, dtype=np.int64)  # letters of text for Caesar decryption
+        self.rot = int(key) if cipher == 'Caesar' and key else None
+
+        if cipher == 'Base64':
+            self.step, self.out_step = (Encrypt.base64_step, Decrypt.base64_step) if encrypt else \
+                (Decrypt.base64_step, Encrypt.base64_step)
+        else:
+            self.step, self.out_step = 1, 1
+
+    @staticmethod
+    def supports(cipher, encrypt, key):
+        """
+        :param cipher: name of cipher
+        :param encrypt: whether to encrypt or decrypt
+        :param key: key of the cipher, empty if not given
+        :return: whether the output can be previewed, only Caesar decryption can go without the key
+        """
+        return cipher in Preview.ciphers and bool(key or cipher == 'Base64' or (cipher == 'Caesar' and not encrypt))
+
+    @staticmethod
+    def __common_prefix__(first, second):
+        """
+        :return: length of common prefix of two strings
+
+        Binary search comparing slices, so strings are compared at C speed
+        """
+        low, high = 0, min(len(first), len(second))
+        while low < high:
+            middle = (low + high + 1) // 2
+            if first[low:middle] == second[low:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    @staticmethod
+    def __common_suffix__(first, second, limit):
+        """
+        :param limit: maximal length of the suffix
+        :return: length of common suffix of two strings
+        """
+        low, high = 0, limit
+        while low < high:
+            middle = (low + high + 1) // 2
+            if first[len(first) - middle:len(first) - low] == second[len(second) - middle:len(second) - low]:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def __part__(self, text, position):
+        """
+        :param text: piece of text starting at a whole Base64 group
+        :param position: index of key letter the piece starts with
+        :return: transformed piece and index of key letter the next piece starts with
+        """
+        match self.cipher:
+            case 'Caesar':
+                return Tables.caesar(text, self.rot if self.encrypt else -self.rot), 0
+            case 'Vigenere':
+                return Vector.vigenere_part(text, self.key, position, not self.encrypt)
+            case 'Vernam':
+                return Vector.vernam_part(text, self.key, position, not self.encrypt)
+            case 'Base64':
+                if self.encrypt:
+                    return Base64.encrypt(text), 0
+                return Base64.decrypt(text[:len(text) - len(text) % self.step]), 0  # group being typed is skipped
+
+    def __out_offset__(self, offset):
+        """
+        :param offset: offset in text at a whole Base64 group, before its end
+        :return: offset of its output
+        """
+        return offset // self.step * self.out_step
+
+    def __run__(self, text, start, position, stop):
+        """
+        :param text: whole text
+        :param start: offset to start from, saved checkpoint
+        :param position: key position at start
+        :param stop: offset to stop at
+        :return: output of text[start:stop], key position at stop and checkpoints passed
+        """
+        pieces, checkpoints = [], []
+        for offset in range(start, stop, Preview.block_sz):
+            checkpoints.append((offset, position))
+            piece, position = self.__part__(text[offset:min(offset + Preview.block_sz, stop)], position)
+            pieces.append(piece)
+        return ''.join(pieces), position, checkpoints
+
+    def __position__(self, offset):
+        """
+        :param offset: offset in current text at a whole Base64 group, not after done
+        :return: key position at the offset
+        """
+        start, position = [checkpoint for checkpoint in self.checkpoints if checkpoint[0] <= offset][-1]
+        return self.__part__(self.text[start:offset], position)[1] if offset > start else position
+
+    def __restart__(self, text):
+        """
+        :param text: new text
+        :return: start and end of replaced part of previous output and the text to replace it with
+        """
+        old_len = len(self.output)
+        self.text, self.output, self.done, self.position, self.checkpoints = text, '', 0, 0, [(0, 0)]
+        return 0, old_len, self.advance()[2]
+
+    def pending(self):
+        """
+        :return: whether the end of output is still to be computed by advance
+        """
+        return self.done < len(self.text)
+
+    def advance(self):
+        """
+        :return: start and end of replaced part of previous output and the text to replace it with,
+                 output of the next horizon characters is appended
+        """
+        stop = min(len(self.text), self.done + Preview.horizon)
+        piece, self.position, checkpoints = self.__run__(self.text, self.done, self.position, stop)
+        self.checkpoints += checkpoints
+        self.done = stop
+        self.output += piece
+        return len(self.output) - len(piece), len(self.output) - len(piece), piece
+
+    def update(self, text):
+        """
+        :param text: new version of the text
+        :return: start and end of replaced part of previous output and the text to replace it with
+
+        Output is computed up to horizon characters after the edit, unless the old output can be reused
+        after it. The rest is appended by further calls of advance while pending returns True
+        """
+        old = self.text
+        prefix = Preview.__common_prefix__(old, text)
+        if prefix == len(old) == len(text):
+            return len(self.output), len(self.output), ''
+        suffix = Preview.__common_suffix__(old, text, min(len(old), len(text)) - prefix)
+        old_end, new_end = len(old) - suffix, len(text) - suffix  # old[prefix:old_end] became text[prefix:new_end]
+        shift = new_end - old_end
+
+        if self.cipher == 'Caesar' and not self.key:
+            self.counts += Crack.letter_counts(text[prefix:new_end]) - Crack.letter_counts(old[prefix:old_end])
+            rot = Crack.margin(self.counts, Crack.scores(self.counts))[0]
+            if rot != self.rot:  # every character changes
+                self.rot = rot
+                return self.__restart__(text)
+        if self.step == 1 and len(self.output) != self.done:  # upper case of some letter is longer, no 1:1 mapping
+            return self.__restart__(text)
+        if self.done <= prefix and self.done < len(old):  # edit in the part not computed yet
+            self.text = text
+            return len(self.output), len(self.output), ''
+
+        start, position = [checkpoint for checkpoint in self.checkpoints if checkpoint[0] <= prefix][-1]
+        kept = [checkpoint for checkpoint in self.checkpoints if checkpoint[0] < start]
+        kept += [(start, position)]  # __run__ passes no checkpoint if nothing is recomputed, e.g. after a deletion
+        stop = -(-new_end // self.step) * self.step  # end of the group holding the last edited character
+        old_stop = stop - shift
+
+        if shift % self.step == 0 and stop < len(text) and old_stop <= self.done:
+            piece, new_position, checkpoints = self.__run__(text, start, position, stop)
+            out_start, out_stop = self.__out_offset__(start), self.__out_offset__(old_stop)
+            if new_position == self.__position__(old_stop) and len(piece) == self.__out_offset__(stop) - out_start:
+                self.checkpoints = kept + checkpoints[1:] + [(offset + shift, saved) for offset, saved in
+                                                             self.checkpoints if offset >= old_stop]
+                self.output = self.output[:out_start] + piece + self.output[out_stop:]
+                self.text = text
+                self.done += shift
+                return out_start, out_stop, piece
+
+        stop = min(len(text), max(stop, start) + Preview.horizon)
+        piece, self.position, checkpoints = self.__run__(text, start, position, stop)
+        out_start, out_stop = self.__out_offset__(start), len(self.output)
+        self.checkpoints = kept + checkpoints[1:]
+        self.output = self.output[:out_start] + piece
+        self.text = text
+        self.done = stop
+        return out_start, out_stop, piece
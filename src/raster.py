@@ -0,0 +1,119 @@
+from src.globals import Globals
+
+from PIL import Image
+
+import numpy as np
+
+
+class RawRaster:
+    """
+    Class to access pixels of uncompressed images (BMP, uncompressed TIFF, PPM) right in the file.
+    The file is memory-mapped, so only pages holding requested pixels are ever read or written.
+    The mapping is released by close or at the end of a with statement, before the file can be replaced on Windows
+    """
+    # raw mode of Pillow -> (byte offsets of R, G and B, bytes per pixel, byte offset of alpha or None)
+    layouts = {'RGB': ((0, 1, 2), 3, None), 'BGR': ((2, 1, 0), 3, None),
+               'RGBX': ((0, 1, 2), 4, None), 'BGRX': ((2, 1, 0), 4, None),
+               'RGBA': ((0, 1, 2), 4, 3), 'BGRA': ((2, 1, 0), 4, 3)}
+
+    def __init__(self, image_path, writable=False):
+        """ constructor for raster object\n
+            :param image_path: path to an uncompressed image
+            :param writable: whether pixels are going to be changed in the file
+        """
+        with Image.open(image_path) as img:  # reads the header only
+            self.size = img.size
+            tiles = RawRaster.__raw_tiles__(img)
+        if tiles is None:
+            raise ValueError('Pixels of {} can not be accessed without decoding'.format(image_path))
+
+        rawmode = tiles[0][3]
+        self.channels, self.pixel_sz, self.alpha = RawRaster.layouts[rawmode]
+        self.boxes = np.array([tile[0] for tile in tiles], dtype=np.int64)
+        self.starts = np.array([tile[1] for tile in tiles], dtype=np.int64)
+        self.strides = np.array([tile[2] or (tile[0][2] - tile[0][0]) * self.pixel_sz for tile in tiles],
+                                dtype=np.int64)
+        self.bottom_up = np.array([tile[4] < 0 for tile in tiles])
+
+        # tiles form a grid, find the tile of a pixel by its column and row of tiles
+        self.tile_xs = np.unique(self.boxes[:, 0])
+        self.tile_ys = np.unique(self.boxes[:, 1])
+        self.grid = np.full((self.tile_ys.size, self.tile_xs.size), -1, dtype=np.int64)
+        self.grid[np.searchsorted(self.tile_ys, self.boxes[:, 1]), np.searchsorted(self.tile_xs, self.boxes[:, 0])] = \
+            np.arange(len(tiles))
+
+        self.data = np.memmap(image_path, dtype=np.uint8, mode='r+' if writable else 'r')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Releases the mapping of the file, read and write return copies, so no view of it is left
+        """
+        if self.data is not None:
+            self.data._mmap.close()
+            self.data = None
+
+    @staticmethod
+    def __raw_tiles__(img):
+        """
+        :param img: opened, not loaded PIL image
+        :return: list of (box, offset, stride, rawmode, orientation) or None if pixels are compressed
+        """
+        if img.mode not in ('RGB', 'RGBA') or not img.tile:
+            return None
+
+        tiles = []
+        for codec, box, offset, args in img.tile:
+            rawmode, stride, orientation = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+            if codec != 'raw' or rawmode not in RawRaster.layouts or (tiles and rawmode != tiles[0][3]):
+                return None
+            tiles.append((box, offset, stride, rawmode, orientation))
+
+        return tiles
+
+    @staticmethod
+    def supports(image_path):
+        """
+        :param image_path: path to an image
+        :return: whether its pixels can be accessed without decoding the image
+        """
+        with Image.open(image_path) as img:
+            return RawRaster.__raw_tiles__(img) is not None
+
+    def offsets(self, xs, ys):
+        """
+        :param xs: x coordinates of pixels
+        :param ys: y coordinates of pixels
+        :return: offsets of the first byte of every pixel in the file
+        """
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        tile = self.grid[np.searchsorted(self.tile_ys, ys, 'right') - 1, np.searchsorted(self.tile_xs, xs, 'right') - 1]
+        boxes = self.boxes[tile]
+        rows = np.where(self.bottom_up[tile], boxes[:, 3] - 1 - ys, ys - boxes[:, 1])
+        return self.starts[tile] + rows * self.strides[tile] + (xs - boxes[:, 0]) * self.pixel_sz
+
+    def read(self, xs, ys):
+        """
+        :param xs: x coordinates of pixels
+        :param ys: y coordinates of pixels
+        :return: (n, 3) uint8 array of their RGB
+        """
+        offsets = self.offsets(xs, ys)
+        return self.data[offsets[:, None] + np.array(self.channels)]
+
+    def write(self, xs, ys, rgb):
+        """
+        :param xs: x coordinates of pixels
+        :param ys: y coordinates of pixels
+        :param rgb: (n, 3) array of new RGB, pixels with alpha channel also become opaque
+        """
+        offsets = self.offsets(xs, ys)
+        self.data[offsets[:, None] + np.array(self.channels)] = rgb
+        if self.alpha is not None:
+            self.data[offsets + self.alpha] = (1 << Globals.char_8bit) - 1
+        self.data.flush()
@@ -0,0 +1,394 @@
+from src.dispatch import Dispatch
+from src.keycache import KeyCache
+from src.metrics import Metrics
+
+import importlib
+import re
+import threading
+
+
+class Cipher:
+    """
+    Class describing a registered cipher: its functions, the key it takes and how it processes text.
+    Functions are plain callables, engines behind them are imported on their first call
+    """
+    local = threading.local()  # warning of the last decryption in this thread
+
+    def __init__(self, name, encrypt, decrypt, streaming=True, key_pattern=None, key_format='', crackable=False,
+                 image=False, modules=(), key_check=None, binary=None, python_engine=None, sample_key=None):
+        """ constructor for cipher object\n
+            :param name: name shown to user, the command line takes it in lower case
+            :param encrypt: function(src, dst, key) writing encrypted text of file object src into file object dst,
+                            function(text, key) returning encrypted text if not streaming,
+                            function(text, image_path, output, image_format, compress_level, strategy) returning
+                            a message if the cipher hides text in an image, written to path or file object output
+            :param decrypt: function(src, dst, key, sample) writing decrypted text of src into dst, where sample is
+                            the text or its beginning to find an unknown key from, or None to read src for it,
+                            function(text, key) returning decrypted text if not streaming,
+                            function(keys_path, image_path) returning hidden text if the cipher uses an image
+            :param streaming: whether the functions process the text chunk by chunk
+            :param key_pattern: regular expression the key has to match, None if the cipher has no key
+            :param key_format: description of the key for warnings
+            :param crackable: whether decryption finds the key when it is not given
+            :param image: whether the text is hidden in an image chosen by user
+            :param modules: names of modules the functions import on their first call
+            :param key_check: function(key) returning warning message or None, for keys a pattern can not check
+            :param binary: function(src, dst, key, decrypt) processing binary file object src into dst,
+                           None if the cipher works on text only
+            :param python_engine: pure-Python (encrypt(text, key), decrypt(text, key)) for short texts, returning
+                                  None for calls they do not take. Dispatch runs them below a calibrated length
+            :param sample_key: valid key to calibrate python_engine against the stream functions with
+        """
+        self.name = name
+        self.encrypt = encrypt
+        self.decrypt = decrypt
+        self.streaming = streaming
+        self.key_pattern = key_pattern
+        self.key_format = key_format
+        self.crackable = crackable
+        self.image = image
+        self.modules = modules
+        self.key_check = key_check
+        self.binary = binary
+        self.python_engine = python_engine
+        self.sample_key = sample_key
+
+    def load(self):
+        """
+        Imports modules of the cipher ahead of its first call, e.g. in worker processes before they are timed
+        """
+        for module in self.modules:
+            importlib.import_module(module)
+
+    def needs_key(self, encrypt):
+        """
+        :param encrypt: whether to encrypt or decrypt
+        :return: whether the key has to be given
+        """
+        return self.key_pattern is not None and (encrypt or not self.crackable)
+
+    def check_key(self, key, encrypt):
+        """
+        :param key: key given by user, empty string or None if there is none
+        :param encrypt: whether to encrypt or decrypt
+        :return: warning message or None if the key fits the cipher
+
+        Results are kept in KeyCache, so repeated keys are not matched again
+        """
+        if self.key_pattern is None or (not key and not self.needs_key(encrypt)):
+            return None
+        return KeyCache.get('{}.check'.format(self.name), key, self.__check__)
+
+    def __check__(self, key):
+        """
+        :param key: key given by user, empty string or None if there is none
+        :return: warning message or None if the key fits key_pattern and key_check
+        """
+        if not key or not re.fullmatch(self.key_pattern, key):
+            return 'Please enter right key for encryption (format: {})'.format(self.key_format)
+        return self.key_check(key) if self.key_check is not None else None
+
+    def encrypt_stream(self, src, dst, key):
+        """
+        :param src: file object with text to encrypt
+        :param dst: file object to write encrypted text into
+        :param key: key of the cipher, checked by caller
+        """
+        with Metrics.operation(self.name + '.encrypt') as span:
+            src, dst = span.io(src, 'read', sized=True), span.io(dst, 'write')
+            if self.streaming:
+                self.encrypt(src, dst, key)
+            else:
+                dst.write(self.encrypt(src.read(), key))
+            span.rest('transform')
+
+    def decrypt_stream(self, src, dst, key, sample=None):
+        """
+        :param src: file object with text to decrypt
+        :param dst: file object to write decrypted text into
+        :param key: key of the cipher, checked by caller, empty to find it if the cipher is crackable
+        :param sample: encoded text, or its beginning, to find unknown key from. Seekable src is read by default
+
+        Cipher.warning tells afterwards whether a key found is doubtful
+        """
+        Cipher.local.warning = None
+        with Metrics.operation(self.name + '.decrypt') as span:
+            src, dst = span.io(src, 'read', sized=True), span.io(dst, 'write')
+            if self.streaming:
+                self.decrypt(src, dst, key, sample)
+            else:
+                dst.write(self.decrypt(src.read(), key))
+            span.rest('transform')
+
+    def encrypt_text(self, text, key, engine=None, src=None):
+        """
+        :param text: text to encrypt
+        :param key: key of the cipher, checked by caller
+        :param engine: 'python' or 'vector', chosen by the length of the text by default
+        :param src: file object with the text for the vector engine, e.g. one reporting progress of a GUI job
+        :return: encrypted text
+        """
+        return Dispatch.run(self, 'encrypt', text, key, engine, src)
+
+    def decrypt_text(self, text, key, engine=None, src=None):
+        """
+        :param text: text to decrypt
+        :param key: key of the cipher, checked by caller
+        :param engine: 'python' or 'vector', chosen by the length of the text by default
+        :param src: file object with the text for the vector engine, e.g. one reporting progress of a GUI job
+        :return: decrypted text
+
+        Cipher.warning tells afterwards whether a key found is doubtful
+        """
+        Cipher.local.warning = None
+        return Dispatch.run(self, 'decrypt', text, key, engine, src)
+
+    @staticmethod
+    def warn(message):
+        """
+        :param message: warning about the decryption running in this thread, e.g. a key found may be wrong,
+                        None if there is none
+        """
+        Cipher.local.warning = message
+
+    @staticmethod
+    def warning():
+        """
+        :return: warning of the last decryption in this thread, None if there was none
+        """
+        return getattr(Cipher.local, 'warning', None)
+
+
+class Registry:
+    """
+    Class keeping all ciphers known to the program. GUI and command line take the ciphers from here,
+    so a new cipher is added by registering it, without changes in their code
+    """
+    ciphers = {}  # lower case name -> cipher, in order of registration
+
+    @staticmethod
+    def register(cipher):
+        """
+        :param cipher: cipher object, replaces the one registered under the same name
+        :return: the cipher
+        """
+        Registry.ciphers[cipher.name.lower()] = cipher
+        KeyCache.clear()  # checks of the cipher replaced may be cached
+        return cipher
+
+    @staticmethod
+    def get(name):
+        """
+        :param name: name of cipher in any case
+        :return: cipher object
+
+        Raises ValueError for unknown names
+        """
+        try:
+            return Registry.ciphers[name.lower()]
+        except KeyError:
+            raise ValueError('Unknown cipher {}'.format(name)) from None
+
+    @staticmethod
+    def names(image=None):
+        """
+        :param image: True or False to list only the ciphers which do or do not hide text in images
+        :return: names of registered ciphers
+        """
+        return tuple(cipher.name for cipher in Registry.ciphers.values() if image is None or cipher.image == image)
+
+
+class Builtin:
+    """
+    Class with functions of built-in ciphers in the form taken by the registry. Modules of the engines
+    (and NumPy and Pillow with them) are imported on the first call, not at program start
+    """
+    sample_sz = 1 << 22  # characters at the start of a text an unknown Vigenere key is found from
+
+    @staticmethod
+    def __sample__(src):
+        """
+        :param src: seekable file object
+        :return: at most Builtin.sample_sz characters of its text, the position is restored
+        """
+        start = src.tell()
+        sample = src.read(Builtin.sample_sz)
+        src.seek(start)
+        return sample
+
+    @staticmethod
+    def caesar_encrypt(src, dst, key):
+        from src.stream import EncryptStream
+        EncryptStream.caesar(src, dst, int(key))
+
+    @staticmethod
+    def caesar_decrypt(src, dst, key, sample):
+        from src.crack import Crack
+        from src.stream import DecryptStream, EncryptStream
+        if key:
+            EncryptStream.caesar(src, dst, -int(key))
+        elif sample is None:
+            Cipher.warn(Crack.caesar_warning(*DecryptStream.caesar(src, dst)))  # counts letters of the whole file
+        else:
+            rot, margin = Crack.caesar_rot(sample, sample=True)
+            Cipher.warn(Crack.caesar_warning(rot, margin))
+            EncryptStream.caesar(src, dst, -rot)
+
+    @staticmethod
+    def caesar_python_encrypt(text, key):
+        from src.encode import Encrypt
+        return Encrypt.caesar(text, int(key))
+
+    @staticmethod
+    def caesar_python_decrypt(text, key):
+        from src.encode import Encrypt
+        return Encrypt.caesar(text, -int(key)) if key else None  # cracking needs the vector engine
+
+    @staticmethod
+    def vigenere_encrypt(src, dst, key):
+        from src.stream import EncryptStream
+        EncryptStream.vigenere(src, dst, key)
+
+    @staticmethod
+    def vigenere_decrypt(src, dst, key, sample):
+        from src.crack import Crack
+        from src.stream import DecryptStream
+        if not key:
+            key = Crack.vigenere_key(Builtin.__sample__(src) if sample is None else sample, Builtin.sample_sz)
+        DecryptStream.vigenere(src, dst, key)
+
+    @staticmethod
+    def vigenere_python_encrypt(text, key):
+        from src.encode import Encrypt
+        return Encrypt.vigenere(text, key)
+
+    @staticmethod
+    def vigenere_python_decrypt(text, key):
+        from src.decode import Decrypt
+        return Decrypt.vigenere(text, key) if key else None
+
+    @staticmethod
+    def vernam_encrypt(src, dst, key):
+        from src.stream import EncryptStream
+        EncryptStream.vernam(src, dst, key)
+
+    @staticmethod
+    def vernam_decrypt(src, dst, key, sample):
+        from src.stream import DecryptStream
+        DecryptStream.vernam(src, dst, key)
+
+    @staticmethod
+    def vernam_binary(src, dst, key, decrypt):
+        from src.binary import Binary
+        Binary.vernam_stream(src, dst, key)
+
+    @staticmethod
+    def vernam_python_encrypt(text, key):
+        from src.encode import Encrypt
+        return Encrypt.vernam(text, key)
+
+    @staticmethod
+    def vernam_python_decrypt(text, key):
+        from src.decode import Decrypt
+        return Decrypt.vernam(text, key)
+
+    @staticmethod
+    def base64_encrypt(src, dst, key):
+        from src.stream import EncryptStream
+        EncryptStream.base64(src, dst)
+
+    @staticmethod
+    def base64_decrypt(src, dst, key, sample):
+        from src.stream import DecryptStream
+        DecryptStream.base64(src, dst)
+
+    @staticmethod
+    def base64_binary(src, dst, key, decrypt):
+        from src.binary import Binary
+        Binary.base64_stream(src, dst, decrypt)
+
+    @staticmethod
+    def base64_python_encrypt(text, key):
+        from src.encode import Encrypt
+        return Encrypt.base64(text)
+
+    @staticmethod
+    def base64_python_decrypt(text, key):
+        from src.decode import Decrypt
+        return Decrypt.base64(text) if not len(text) % Decrypt.base64_step else None  # errors come from the stream
+
+    @staticmethod
+    def pipeline_check(key):
+        """
+        :return: warning message or None if every stage of the pipeline is right
+        """
+        from src.pipeline import Pipeline
+        try:
+            Pipeline.parse(key)
+        except ValueError as exc:
+            return str(exc)
+        return None
+
+    @staticmethod
+    def pipeline_encrypt(src, dst, key):
+        from src.pipeline import Pipeline
+        Pipeline(key).run(src, dst)
+
+    @staticmethod
+    def pipeline_decrypt(src, dst, key, sample):
+        from src.pipeline import Pipeline
+        Pipeline(key).run(src, dst, encrypt=False)
+
+    @staticmethod
+    def stega_encrypt(text, image_path, output='encoded.png', image_format='PNG', compress_level=None, strategy=None,
+                      keys='coords.keys'):
+        """
+        :param output: path or binary file object, e.g. io.BytesIO, to write the encoded image to
+        :param image_format: format of the encoded image, see Stega.save
+        :param compress_level: zlib level of PNG, see Stega.save
+        :param strategy: zlib strategy of PNG, see Stega.save
+        :param keys: path or binary file object, e.g. io.BytesIO, to write the binary keys to
+        :return: message for user
+        """
+        from src.stega import Stega
+        if not re.match('.+(png|jpg|jpeg|bmp)\\s*$', image_path):
+            return 'Please choose image with .png, .jpg, .jpeg or .bmp format'
+        if len(text) > Stega.capacity(image_path):
+            return 'Text is too long for this image (at most {} characters)'.format(Stega.capacity(image_path))
+        Stega.embed(text, image_path, keys, output_path=output, binary_keys=True, image_format=image_format,
+                    compress_level=compress_level, strategy=strategy)
+        return "Your text was encrypted. You can download the {} encrypted image and " \
+               "file with keys to decrypt it.".format(image_format)
+
+    @staticmethod
+    def stega_decrypt(keys_path, image_path):
+        """
+        :return: hidden text or a warning message
+        """
+        from src.stega import Stega
+        if not image_path.lower().endswith(tuple(Stega.formats.values()) + ('.tif',)):
+            return 'Please select encoded image (it is in {} format)'.format(', '.join(Stega.formats.values()))
+        return Stega.extract(keys_path, image_path)
+
+
+text_modules = ('src.stream', 'src.crack')
+Registry.register(Cipher('Caesar', Builtin.caesar_encrypt, Builtin.caesar_decrypt, key_pattern='^\\d+$',
+                         key_format='any number', crackable=True, modules=text_modules,
+                         python_engine=(Builtin.caesar_python_encrypt, Builtin.caesar_python_decrypt), sample_key='3'))
+Registry.register(Cipher('Vigenere', Builtin.vigenere_encrypt, Builtin.vigenere_decrypt, key_pattern='^[a-zA-Z]+$',
+                         key_format='only letters', crackable=True, modules=text_modules,
+                         python_engine=(Builtin.vigenere_python_encrypt, Builtin.vigenere_python_decrypt),
+                         sample_key='LEMON'))
+Registry.register(Cipher('Vernam', Builtin.vernam_encrypt, Builtin.vernam_decrypt, key_pattern='^[a-zA-Z]+$',
+                         key_format='only letters', modules=text_modules + ('src.binary',),
+                         binary=Builtin.vernam_binary,
+                         python_engine=(Builtin.vernam_python_encrypt, Builtin.vernam_python_decrypt),
+                         sample_key='LEMON'))
+Registry.register(Cipher('Base64', Builtin.base64_encrypt, Builtin.base64_decrypt,
+                         modules=text_modules + ('src.binary',), binary=Builtin.base64_binary,
+                         python_engine=(Builtin.base64_python_encrypt, Builtin.base64_python_decrypt)))
+Registry.register(Cipher('Pipeline', Builtin.pipeline_encrypt, Builtin.pipeline_decrypt,
+                         key_pattern='^[a-zA-Z0-9:,\\s]+$', key_format='stages like vigenere:KEY, caesar:3, base64',
+                         modules=('src.pipeline',), key_check=Builtin.pipeline_check))
+Registry.register(Cipher('Steganography', Builtin.stega_encrypt, Builtin.stega_decrypt, streaming=False, image=True,
+                         modules=('src.stega',)))
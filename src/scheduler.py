@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class PixelScheduler:
+    """
+    Class to choose distinct pixels of an image in pseudo-random order derived from a seed.
+    Walks a Feistel permutation of pixel indices, so n pixels cost O(n) whatever the image size.
+    Round keys are derived from the seed with splitmix64 rather than a NumPy generator, whose stream may change
+    between NumPy releases, so keys files saved with a seed stay readable
+    """
+    rounds = 4
+    golden = np.uint64(0x9E3779B97F4A7C15)
+    mixer = np.uint64(0xBF58476D1CE4E5B9)
+    mask = (1 << 64) - 1
+
+    def __init__(self, size, seed):
+        """ constructor for scheduler object\n
+            :param size: width and height of the image
+            :param seed: non-negative integer, same seed and size give the same pixels
+        """
+        self.width, self.height = size
+        self.seed = seed
+        self.capacity = self.width * self.height  # every pixel can hold one character
+        self.half_bits = max(1, ((self.capacity - 1).bit_length() + 1) // 2)
+        self.round_keys = np.array(PixelScheduler.splitmix(seed, PixelScheduler.rounds), dtype=np.uint64)
+
+    @staticmethod
+    def splitmix(seed, count):
+        """
+        :param seed: non-negative integer
+        :param count: number of values
+        :return: list of the first count 64-bit outputs of splitmix64 seeded with seed
+        """
+        state, values = seed & PixelScheduler.mask, []
+        for _ in range(count):
+            state = (state + int(PixelScheduler.golden)) & PixelScheduler.mask
+            value = ((state ^ (state >> 30)) * 0xBF58476D1CE4E5B9) & PixelScheduler.mask
+            value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & PixelScheduler.mask
+            values.append(value ^ (value >> 31))
+        return values
+
+    def __mix__(self, half, key):
+        """
+        :param half: array of half-indices
+        :param key: round key
+        :return: pseudo-random function of the half-indices
+        """
+        mixed = half * PixelScheduler.golden + key
+        mixed ^= mixed >> np.uint64(29)
+        mixed *= PixelScheduler.mixer
+        mixed ^= mixed >> np.uint64(32)
+        return mixed & np.uint64((1 << self.half_bits) - 1)
+
+    def __permute__(self, indices):
+        """
+        :param indices: uint64 array of indices below 4 ** half_bits
+        :return: their images under the Feistel permutation
+        """
+        shift, mask = np.uint64(self.half_bits), np.uint64((1 << self.half_bits) - 1)
+        left, right = indices >> shift, indices & mask
+        for key in self.round_keys:
+            left, right = right, left ^ self.__mix__(right, key)
+        return (left << shift) | right
+
+    def indices(self, count, start=0):
+        """
+        :param count: number of pixels needed
+        :param start: number of pixels chosen before them, so any part of the sequence is made on its own
+        :return: uint64 array of distinct flat pixel indices
+
+        Indices falling outside of the image are walked along their permutation cycle until they fall inside
+        """
+        if start + count > self.capacity:
+            raise ValueError('Image holds at most {} characters, got {}'.format(self.capacity, start + count))
+
+        indices = self.__permute__(np.arange(start, start + count, dtype=np.uint64))
+        outside = np.flatnonzero(indices >= self.capacity)
+        while outside.size:
+            indices[outside] = self.__permute__(indices[outside])
+            outside = outside[indices[outside] >= self.capacity]
+        return indices
+
+    def coords(self, count, start=0):
+        """
+        :param count: number of pixels needed
+        :param start: number of pixels chosen before them
+        :return: int64 arrays of x and y coordinates of distinct pixels
+        """
+        ys, xs = np.divmod(self.indices(count, start).astype(np.int64), self.width)
+        return xs, ys
@@ -0,0 +1,370 @@
+from src.batch import Batch
+from src.dispatch import Dispatch
+from src.registry import Registry
+
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import asyncio
+import io
+import os
+import tempfile
+
+
+class HttpError(Exception):
+    """
+    Raised while handling a request which gets an error response
+    """
+
+    def __init__(self, status, message):
+        """ constructor for error object\n
+            :param status: HTTP status code of the response
+            :param message: text of the response
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class Service:
+    """
+    Class of local HTTP service running the ciphers for other programs, over TCP or a Unix socket.
+    POST /<cipher>/<mode>?key=<key> with the text as body returns the result, e.g. POST /vigenere/encrypt?key=LEMON.
+    Bodies are read chunk by chunk and ciphers run in worker processes, so the event loop only moves bytes.
+    Small bodies arriving while all workers are busy are sent to the next free one as one batch, bigger ones
+    are spooled to temporary files and streamed through the cipher file to file
+    """
+    small_sz = 1 << 16  # bodies up to this size are kept in memory and batched
+    chunk_sz = 1 << 16  # bytes read from the socket or the spooled output at once
+    head_sz = 1 << 14  # longest request line and headers
+    batch_size = 64  # requests sent to a worker at once at most
+
+    def __init__(self, jobs=None, batch_size=batch_size):
+        """ constructor for service object\n
+            :param jobs: number of worker processes, number of CPU cores by default
+            :param batch_size: requests sent to a worker at once at most, 1 turns batching off
+        """
+        self.jobs = jobs or os.cpu_count()
+        self.batch_size = batch_size
+        self.pool = None
+        self.pending = []  # (request, future) of small requests waiting for a free worker
+        self.running = 0  # batches being processed
+        self.spool_dir = None
+
+    @staticmethod
+    def prepare():
+        """
+        Runs in every worker process before its first job, imports the engines of all ciphers
+        """
+        for name in Registry.names(image=False):
+            Registry.get(name).load()
+
+    @staticmethod
+    def calibrate():
+        """
+        Runs in one worker process when the service starts, calibrates the engine thresholds missing from the cache,
+        see Dispatch.prepare. The other workers read them from the cache on their first request
+        """
+        Dispatch.prepare([Registry.get(name) for name in Registry.names(image=False)])
+
+    @staticmethod
+    def run_one(cipher, mode, key, binary, data):
+        """
+        :param cipher: name of cipher
+        :param mode: 'encrypt' or 'decrypt'
+        :param key: key of cipher, checked by caller
+        :param binary: whether to process data as bytes instead of UTF-8 text
+        :param data: request body
+        :return: HTTP status code and response body
+        """
+        registered = Registry.get(cipher)
+        try:
+            if binary:
+                dst = io.BytesIO()
+                registered.binary(io.BytesIO(data), dst, key, mode == 'decrypt')
+                return HTTPStatus.OK, dst.getvalue()
+            text = data.decode(Batch.encoding)
+            if mode == 'encrypt':
+                return HTTPStatus.OK, registered.encrypt_text(text, key).encode(Batch.encoding)
+            return HTTPStatus.OK, registered.decrypt_text(text, key).encode(Batch.encoding)
+        except UnicodeDecodeError:
+            return HTTPStatus.BAD_REQUEST, b'Body must be UTF-8 text, add binary=1 for bytes'
+        except ValueError as exc:
+            return HTTPStatus.BAD_REQUEST, str(exc).encode(Batch.encoding)
+
+    @staticmethod
+    def run_batch(requests):
+        """
+        :param requests: list of (cipher, mode, key, binary, body) tuples
+        :return: list of (status, response body) in the same order
+        """
+        return [Service.run_one(*request) for request in requests]
+
+    @staticmethod
+    def run_file(path, output_path, cipher, mode, key, binary):
+        """
+        :param path: path to spooled request body
+        :param output_path: path to write the result into
+        :return: HTTP status code and error message, empty if the output was written
+        """
+        try:
+            Batch.process(path, output_path, cipher, mode, key, binary)
+        except UnicodeDecodeError:
+            return HTTPStatus.BAD_REQUEST, 'Body must be UTF-8 text, add binary=1 for bytes'
+        except ValueError as exc:
+            return HTTPStatus.BAD_REQUEST, str(exc)
+        return HTTPStatus.OK, ''
+
+    @staticmethod
+    async def __read_head__(reader):
+        """
+        :param reader: stream of the connection
+        :return: method, target, HTTP version and dict of lower case header names -> values,
+                 None if the connection was closed before a new request
+        """
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as exc:
+            if not exc.partial.strip():
+                return None
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Incomplete request head')
+        except asyncio.LimitOverrunError:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'Request head is too long')
+
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3:
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Malformed request line')
+
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        return parts[0], parts[1], parts[2], headers
+
+    @staticmethod
+    async def __body__(reader, headers):
+        """
+        :param reader: stream of the connection
+        :param headers: headers of the request
+        :return: async generator of body chunks, from Content-Length or chunked transfer encoding
+
+        Raises HttpError if Content-Length is not a number of bytes
+        """
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if not size:
+                    while (await reader.readline()).strip():  # trailers
+                        pass
+                    return
+                yield await reader.readexactly(size)
+                await reader.readline()
+        else:
+            length = headers.get('content-length', '0').strip()
+            if not length.isascii() or not length.isdigit():  # int() would take '-5', '+5' and '1_000' as well
+                raise HttpError(HTTPStatus.BAD_REQUEST, 'Content-Length must be a number of bytes, got {!r}'.format(
+                    length))
+            left = int(length)
+            while left:
+                chunk = await reader.read(min(left, Service.chunk_sz))
+                if not chunk:
+                    raise HttpError(HTTPStatus.BAD_REQUEST, 'Body is shorter than Content-Length')
+                left -= len(chunk)
+                yield chunk
+
+    @staticmethod
+    def __route__(method, target):
+        """
+        :param method: HTTP method
+        :param target: request target with the query
+        :return: cipher name, mode, key (None if not given) and whether to process bytes
+        """
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        if method != 'POST' or len(parts) != 2 or parts[0].lower() not in Batch.ciphers() \
+                or parts[1] not in Batch.modes:
+            raise HttpError(HTTPStatus.NOT_FOUND, 'Use POST /<cipher>/<mode>, cipher is one of: {}, mode is {}'.format(
+                ', '.join(Batch.ciphers()), ' or '.join(Batch.modes)))
+
+        query = parse_qs(url.query)
+        key = query['key'][0] if 'key' in query else None
+        binary = query.get('binary', ['0'])[0] not in ('0', '', 'false')
+        error = Batch.check_key(parts[0].lower(), parts[1], key, binary)
+        if error:
+            raise HttpError(HTTPStatus.BAD_REQUEST, error)
+        return parts[0].lower(), parts[1], key, binary
+
+    def __flush__(self):
+        """
+        Sends the pending small requests to a worker as one batch
+        """
+        batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+        self.running += 1
+
+        def deliver(job):
+            self.running -= 1
+            if self.pending:
+                self.__flush__()  # the requests which came while the workers were busy
+            error = job.exception()
+            for (_, future), result in zip(batch, [None] * len(batch) if error else job.result()):
+                if future.done():  # the client is gone
+                    continue
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+        job = asyncio.get_running_loop().run_in_executor(self.pool, Service.run_batch,
+                                                         [request for request, _ in batch])
+        job.add_done_callback(deliver)
+
+    async def submit(self, request):
+        """
+        :param request: (cipher, mode, key, binary, body) of a small request
+        :return: HTTP status code and response body
+
+        The request goes to a worker at once if one is free. Otherwise it waits with others for the first
+        batch to finish, so batches grow with the load and a lone request is never delayed
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((request, future))
+        if self.running < self.jobs:
+            self.__flush__()
+        return await future
+
+    async def __process__(self, reader, writer, method, target, headers):
+        """
+        Reads the body of one request, runs the cipher and writes the response
+        """
+        try:
+            route = Service.__route__(method, target)
+        except HttpError:
+            async for _ in Service.__body__(reader, headers):  # the body is skipped to keep the connection usable
+                pass
+            raise
+
+        chunks, size, spool = [], 0, None
+        try:
+            async for chunk in Service.__body__(reader, headers):
+                size += len(chunk)
+                if spool is None and size > Service.small_sz:
+                    spool = tempfile.NamedTemporaryFile(dir=self.spool_dir, delete=False)
+                    spool.writelines(chunks)
+                    chunks = None
+                if spool is None:
+                    chunks.append(chunk)
+                else:
+                    spool.write(chunk)
+
+            if spool is None:
+                status, body = await self.submit(route + (b''.join(chunks),))
+                await Service.__respond__(writer, status, body, route[3])
+                return
+
+            spool.close()
+            output_path = spool.name + '.out'
+            try:
+                status, message = await asyncio.get_running_loop().run_in_executor(
+                    self.pool, Service.run_file, spool.name, output_path, *route)
+                if status != HTTPStatus.OK:
+                    await Service.__respond__(writer, status, message.encode(Batch.encoding), False)
+                else:
+                    await Service.__respond_file__(writer, output_path, route[3])
+            finally:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+        finally:
+            if spool is not None:
+                spool.close()
+                os.remove(spool.name)
+
+    @staticmethod
+    async def __respond__(writer, status, body, binary=False, close=False):
+        """
+        :param writer: stream of the connection
+        :param status: HTTP status code
+        :param body: response body bytes
+        :param binary: whether the body is bytes rather than UTF-8 text
+        :param close: whether the connection is closed after the response
+        """
+        writer.write(Service.__head__(status, len(body), binary, close) + body)
+        await writer.drain()
+
+    @staticmethod
+    async def __respond_file__(writer, path, binary):
+        """
+        :param writer: stream of the connection
+        :param path: path to file with response body, sent chunk by chunk
+        :param binary: whether the body is bytes rather than UTF-8 text
+        """
+        writer.write(Service.__head__(HTTPStatus.OK, os.path.getsize(path), binary))
+        with open(path, 'rb') as body:
+            while chunk := body.read(Service.chunk_sz):
+                writer.write(chunk)
+                await writer.drain()
+
+    @staticmethod
+    def __head__(status, length, binary=False, close=False):
+        """
+        :return: status line and headers of a response
+        """
+        return 'HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n{}\r\n'.format(
+            int(status), HTTPStatus(status).phrase,
+            'application/octet-stream' if binary else 'text/plain; charset={}'.format(Batch.encoding), length,
+            'Connection: close\r\n' if close else '').encode('latin-1')
+
+    async def handle(self, reader, writer):
+        """
+        :param reader: stream of a new connection
+        :param writer: stream of the connection
+
+        Serves requests of the connection one after another while the client keeps it open
+        """
+        try:
+            while True:
+                try:
+                    request = await Service.__read_head__(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers = request
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    await self.__process__(reader, writer, method, target, headers)
+                except HttpError as exc:
+                    await Service.__respond__(writer, exc.status, str(exc).encode(Batch.encoding), close=True)
+                    break
+                except (ValueError, asyncio.IncompleteReadError):
+                    await Service.__respond__(writer, HTTPStatus.BAD_REQUEST, b'Malformed request', close=True)
+                    break
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        except Exception as exc:  # a bug must not take the service down, only this connection
+            await Service.__respond__(writer, HTTPStatus.INTERNAL_SERVER_ERROR, str(exc).encode(Batch.encoding),
+                                      close=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix=None, ready=None):
+        """
+        :param host: address to listen on, local only by default
+        :param port: TCP port to listen on
+        :param unix: path to Unix socket to listen on instead of TCP
+        :param ready: function called with the listening address once the service accepts connections
+
+        Runs until cancelled. Engine thresholds are calibrated before connections are accepted, so requests
+        never wait for calibration and workers do not time each other
+        """
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=Service.prepare) as self.pool, \
+                tempfile.TemporaryDirectory() as self.spool_dir:
+            await asyncio.get_running_loop().run_in_executor(self.pool, Service.calibrate)
+            if unix is not None:
+                server = await asyncio.start_unix_server(self.handle, unix, limit=Service.head_sz)
+            else:
+                server = await asyncio.start_server(self.handle, host, port, limit=Service.head_sz)
+            async with server:
+                if ready is not None:
+                    ready(unix or '{}:{}'.format(*server.sockets[0].getsockname()[:2]))
+                await server.serve_forever()
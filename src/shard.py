@@ -0,0 +1,273 @@
+from src.b64 import Base64
+from src.crack import Crack
+from src.decode import Decrypt
+from src.encode import Encrypt
+from src.metrics import Metrics
+from src.registry import Cipher
+from src.tables import Tables
+from src.vector import Vector
+
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+
+import codecs
+import numpy as np
+import os
+import time
+
+
+class Shard:
+    """
+    Class to run one text cipher over a single large file on all cores. The file is cut into shards at character
+    boundaries. A first parallel pass counts key letters (or characters, for Base64) of every shard, so prefix sums
+    give the key position every shard starts with. A second pass transforms the shards in worker processes into
+    shared memory, which is written out in order while the next shards are transformed.
+    Output is identical to the one of Batch.process
+    """
+    shard_sz = 1 << 25  # bytes of input per shard
+    encoding = 'utf-8'
+
+    @staticmethod
+    def supports(cipher, mode, key):
+        """
+        :param cipher: name of cipher
+        :param mode: 'encrypt' or 'decrypt'
+        :param key: key of cipher or None
+        :return: whether the file can be split for the cipher
+
+        Vernam decryption moves to the next key letter only if the decrypted character is a letter, which depends
+        on the key letter itself, so letters before a shard do not tell its key position. Vigenere without a key
+        is cracked from the whole text by the stream, so it is not split either
+        """
+        match cipher.lower():
+            case 'caesar' | 'base64':
+                return True
+            case 'vigenere':
+                return bool(key)
+            case 'vernam':
+                return mode == 'encrypt'
+        return False
+
+    @staticmethod
+    def bounds(path, shard_sz=None):
+        """
+        :param path: path to UTF-8 text file
+        :param shard_sz: bytes per shard, Shard.shard_sz by default
+        :return: byte offsets of shard starts followed by the file size, no UTF-8 sequence is cut
+
+        The last shard is merged into the previous one if it is shorter than half of shard_sz
+        """
+        shard_sz = shard_sz or Shard.shard_sz
+        size = os.path.getsize(path)
+        offsets = [0]
+        with open(path, 'rb') as file:
+            for offset in range(shard_sz, size - shard_sz // 2, shard_sz):
+                file.seek(offset)
+                head = file.read(4)
+                # continuation bytes of UTF-8 look like 10xxxxxx
+                while head and head[0] & 0xC0 == 0x80:
+                    head, offset = head[1:], offset + 1
+                offsets.append(offset)
+        return offsets + [size]
+
+    @staticmethod
+    def __read__(path, start, end, skip=0, extra=0):
+        """
+        :param path: path to UTF-8 text file
+        :param start: byte offset of the shard
+        :param end: byte offset of the next shard
+        :param skip: characters at the start taken by the previous shard
+        :param extra: characters of the next shard taken by this one
+        :return: text of the shard
+        """
+        with open(path, 'rb') as file:
+            file.seek(start)
+            text = file.read(end - start).decode(Shard.encoding)
+            if extra:
+                # every character takes at most 4 bytes, the decoder keeps a cut one for itself
+                text += codecs.getincrementaldecoder(Shard.encoding)().decode(file.read(4 * extra))[:extra]
+        return text[skip:]
+
+    @staticmethod
+    def count(path, start, end, kind):
+        """
+        :param path: path to UTF-8 text file
+        :param start: byte offset of the shard
+        :param end: byte offset of the next shard
+        :param kind: 'cased' for letters moving Vigenere key, 'alpha' for letters moving Vernam key,
+                     'letters' for occurrences of A-Z, see Crack.letter_counts, 'padding' for characters and '=' signs
+        :return: number of letters, list of 26 numbers for 'letters', (characters, '=' signs) for 'padding'
+        """
+        with open(path, 'rb') as file:
+            file.seek(start)
+            data = file.read(end - start)
+
+        if kind == 'letters':  # bytes of other UTF-8 characters are never ASCII letters
+            return Crack.letter_counts(data).tolist()
+        if kind == 'padding':
+            codes = np.frombuffer(data, dtype=np.uint8)
+            return int(codes.size - np.count_nonzero((codes & 0xC0) == 0x80)), data.count(b'=')
+
+        if data.isascii():
+            codes = np.frombuffer(data, dtype=np.uint8)
+        else:
+            text = data.decode(Shard.encoding)
+            codes = np.frombuffer((text.upper() if kind != 'cased' else text).encode('utf-32-le', 'surrogatepass'),
+                                  dtype=np.uint32)
+        return int(np.count_nonzero(np.take(Vector.__maps__(codes.dtype == np.uint8)[kind], codes)))
+
+    @staticmethod
+    def transform(path, start, end, cipher, decrypt, key, position=0, skip=0, extra=0, trim=0):
+        """
+        :param path: path to UTF-8 text file
+        :param start: byte offset of the shard
+        :param end: byte offset of the next shard
+        :param cipher: lower case name of cipher
+        :param decrypt: whether to decrypt
+        :param key: rotation for Caesar (negative to decrypt), key for Vigenere and Vernam
+        :param position: number of letters before the shard moving the key
+        :param skip: characters at the start taken by the previous shard
+        :param extra: characters of the next shard taken by this one
+        :param trim: characters to drop from the end of the output
+        :return: name of shared memory block with UTF-8 output and its size, None instead of the name if it is empty
+
+        The caller unlinks the shared memory block
+        """
+        text = Shard.__read__(path, start, end, skip, extra)
+        match cipher:
+            case 'caesar':
+                output = Tables.caesar(text, key)
+            case 'vigenere':
+                output = Vector.vigenere_part(text, key, position, decrypt)[0]
+            case 'vernam':
+                output = Vector.vernam_part(text, key, position)[0]
+            case 'base64' if decrypt:
+                output = Base64.decrypt(text.replace('=', 'A'))
+            case _:
+                output = Base64.encrypt(text)
+
+        data = output[:len(output) - trim].encode(Shard.encoding)
+        if not data:
+            return None, 0
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        block.close()
+        if os.name == 'posix':  # the block belongs to the caller now, which tracks and unlinks it
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block.name, len(data)
+
+    @staticmethod
+    def __plan__(path, bounds, cipher, mode, key, pool):
+        """
+        :return: list of keyword arguments of transform for every shard, after the counting pass if it is needed
+
+        Raises ValueError if Base64 text can not be decoded
+        """
+        shards = len(bounds) - 1
+        decrypt = mode == 'decrypt'
+        plan = [{'cipher': cipher, 'decrypt': decrypt, 'key': key} for _ in range(shards)]
+        kind = {'caesar': None if key or not decrypt else 'letters', 'vigenere': 'cased', 'vernam': 'alpha',
+                'base64': 'padding'}[cipher]
+        counts = list(pool.map(Shard.count, [path] * shards, bounds[:-1], bounds[1:], [kind] * shards)) if kind \
+            else []
+
+        if cipher == 'caesar':
+            if key:
+                rot = -int(key) if decrypt else int(key)
+            else:  # cracked from letters of the whole text, like DecryptStream.caesar does
+                total = np.sum(counts, axis=0)
+                rot, margin = Crack.margin(total, Crack.scores(total))
+                Cipher.warn(Crack.caesar_warning(rot, margin))
+                rot = -rot
+            for stage in plan:
+                stage['key'] = rot
+        elif cipher in ('vigenere', 'vernam'):
+            for stage, position in zip(plan, np.cumsum([0] + counts[:-1]).tolist()):
+                stage['position'] = position
+        else:
+            step = Decrypt.base64_step if decrypt else Encrypt.base64_step
+            prefix = np.cumsum([0] + [chars for chars, _ in counts]).tolist()
+            if decrypt and prefix[-1] % step:
+                raise ValueError('Length of Base64 text must be divisible by {}'.format(Decrypt.base64_step))
+            kept = prefix[-1] // step * Encrypt.base64_step - sum(padding for _, padding in counts)
+            for idx, stage in enumerate(plan):
+                stage['skip'] = -prefix[idx] % step
+                stage['extra'] = -prefix[idx + 1] % step if idx + 1 < shards else 0
+                if decrypt:  # Decrypt.base64 drops as many characters from the end as there are '=' signs
+                    first = (prefix[idx] + stage['skip']) // step * Encrypt.base64_step
+                    last = (prefix[idx + 1] + stage['extra']) // step * Encrypt.base64_step
+                    stage['trim'] = last - first - min(max(kept - first, 0), last - first)
+        return plan
+
+    @staticmethod
+    def run(path, output_path, cipher, mode, key, pool, jobs, shard_sz=None):
+        """
+        :param path: path to input file
+        :param output_path: path to output file
+        :param cipher: name of cipher, supported by Shard.supports
+        :param mode: 'encrypt' or 'decrypt'
+        :param key: key of cipher or None
+        :param pool: process pool to run the passes on
+        :param jobs: number of processes of the pool
+        :param shard_sz: bytes per shard, Shard.shard_sz by default
+        :return: input path, its size in bytes, processing time in seconds and warning about the key found or None,
+                 like Batch.process
+
+        At most two shards per process are kept in memory at once
+        """
+        start = time.perf_counter()
+        cipher = cipher.lower()
+        Cipher.warn(None)
+        bounds = Shard.bounds(path, shard_sz)
+        with Metrics.operation('{}.{}.sharded'.format(cipher.capitalize(), mode), bounds[-1]) as span:
+            with span.phase('count'):
+                plan = Shard.__plan__(path, bounds, cipher, mode, key, pool)
+
+            pending = deque()
+            try:
+                with open(output_path, 'wb') as dst:
+                    for idx, stage in enumerate(plan):
+                        pending.append(pool.submit(Shard.transform, path, bounds[idx], bounds[idx + 1], **stage))
+                        if len(pending) >= 2 * jobs:
+                            Shard.__write__(dst, pending.popleft().result(), span)
+                    while pending:
+                        Shard.__write__(dst, pending.popleft().result(), span)
+            finally:
+                Shard.__discard__(pending)
+            span.rest('transform')
+        return path, bounds[-1], time.perf_counter() - start, Cipher.warning()
+
+    @staticmethod
+    def __write__(dst, result, span):
+        """
+        :param dst: binary file object to write into
+        :param result: name and size of shared memory block made by transform, which is unlinked
+        :param span: metrics of the run
+        """
+        name, size = result
+        if name is None:
+            return
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            with span.phase('write', size), block.buf[:size] as view:
+                dst.write(view)
+        finally:
+            block.close()
+            block.unlink()
+
+    @staticmethod
+    def __discard__(futures):
+        """
+        :param futures: futures of transform which are not written, after a failure
+
+        Cancels the ones not started and unlinks shared memory of the finished ones
+        """
+        for future in futures:
+            if future.cancel():
+                continue
+            try:
+                name, _ = future.result()
+            except Exception:
+                continue
+            if name is not None:
+                shared_memory.SharedMemory(name=name).unlink()
@@ -0,0 +1,379 @@
+from src.globals import Globals
+from src.keyfile import KeyFile
+from src.metrics import Metrics
+from src.raster import RawRaster
+from src.scheduler import PixelScheduler
+
+from PIL import Image
+
+import numpy as np
+import os
+import secrets
+import shutil
+import tempfile
+import zlib
+
+
+class Stega:
+    """
+    Class with array-backed steganography, compatible with Encrypt.stega and Decrypt.stega
+    """
+    max_channel = (1 << Globals.char_8bit) - 1
+    formats = {'PNG': '.png', 'BMP': '.bmp', 'TIFF': '.tiff'}  # lossless formats of encoded images -> extension
+    strategies = {'default': zlib.Z_DEFAULT_STRATEGY, 'filtered': zlib.Z_FILTERED, 'huffman': zlib.Z_HUFFMAN_ONLY,
+                  'rle': zlib.Z_RLE, 'fixed': zlib.Z_FIXED}  # zlib strategies of PNG
+
+    @staticmethod
+    def __pixels__(img):
+        """
+        :param img: opened PIL image, closed by the caller
+        :return: (height, width, channels) uint8 array of its pixels in RGB or RGBA mode, and the mode
+        """
+        if img.mode not in ('RGB', 'RGBA'):
+            with img.convert('RGB') as converted:
+                return np.array(converted), converted.mode
+        return np.array(img), img.mode
+
+    @staticmethod
+    def __read__(image_path, xs, ys):
+        """
+        :param image_path: path to an image or binary file object, e.g. io.BytesIO
+        :param xs: x coordinates of pixels
+        :param ys: y coordinates of pixels
+        :return: (n, 3) uint8 array of their RGB, read right from the file for uncompressed images
+        """
+        if isinstance(image_path, (str, os.PathLike)) and RawRaster.supports(image_path):
+            with RawRaster(image_path) as raster:
+                return raster.read(xs, ys)
+        with Image.open(image_path) as img:
+            return Stega.__pixels__(img)[0][ys, xs, :Globals.color_model_sz]
+
+    @staticmethod
+    def __masks__(codes):
+        """
+        :param codes: array of character codes
+        :return: array of (r, g, b) values to XOR with, 3-2-3 bits of every code
+        """
+        return np.stack((codes >> Globals.stega_bit_shift[0],
+                         (codes >> Globals.stega_bit_shift[1]) & Globals.bitmask_2right_bit,
+                         codes & Globals.bitmask_3right_bit), axis=1)
+
+    @staticmethod
+    def __xor__(initial, masks):
+        """
+        :param initial: (n, 3) array of initial RGB
+        :param masks: (n, 3) array of values to XOR with
+        :return: new RGB, clamped to 255 the way ImageDraw does
+        """
+        return np.minimum(initial.astype(np.int64) ^ masks, Stega.max_channel)
+
+    @staticmethod
+    def __ranks__(indices):
+        """
+        :param indices: flat pixel indices
+        :return: for every index, how many times it occurred before
+        """
+        order = np.argsort(indices, kind='stable')
+        ordered = indices[order]
+        starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        group_start = np.repeat(starts, np.diff(np.r_[starts, ordered.size]))
+        ranks = np.empty_like(indices)
+        ranks[order] = np.arange(ordered.size) - group_start
+        return ranks
+
+    @staticmethod
+    def embed_array(pixels, codes, xs, ys):
+        """
+        :param pixels: (height, width, channels) uint8 array, modified in place
+        :param codes: array of character codes
+        :param xs: x coordinates of target pixels
+        :param ys: y coordinates of target pixels
+        :return: array of keys, initial RGB of every target pixel packed into 24 bits
+
+        XORs all target pixels at once. A pixel chosen several times is processed in rounds,
+        so every character sees the pixel as left by the previous one, like in Encrypt.stega
+        """
+        masks = Stega.__masks__(codes.astype(np.int64))
+        ranks = Stega.__ranks__(ys.astype(np.int64) * pixels.shape[1] + xs)
+        keys = np.empty(codes.size, dtype=np.int64)
+
+        for rank in range(int(ranks.max()) + 1 if ranks.size else 0):
+            sel = np.flatnonzero(ranks == rank)
+            initial = pixels[ys[sel], xs[sel], :Globals.color_model_sz]
+            keys[sel] = KeyFile.pack(initial)
+            pixels[ys[sel], xs[sel], :Globals.color_model_sz] = Stega.__xor__(initial, masks[sel])
+            if pixels.shape[2] > Globals.color_model_sz:
+                pixels[ys[sel], xs[sel], Globals.color_model_sz:] = Stega.max_channel  # drawn points are opaque
+
+        return keys
+
+    @staticmethod
+    def extract_array(pixels, xs, ys, keys):
+        """
+        :param pixels: (height, width, channels) uint8 array
+        :param xs: x coordinates of target pixels
+        :param ys: y coordinates of target pixels
+        :param keys: initial RGB of every target pixel packed into 24 bits
+        :return: array of character codes
+        """
+        return Stega.__unxor__(pixels[ys, xs, :Globals.color_model_sz], keys)
+
+    @staticmethod
+    def __unxor__(rgb, keys):
+        """
+        :param rgb: (n, 3) array of RGB of target pixels
+        :param keys: initial RGB of every target pixel packed into 24 bits
+        :return: array of character codes
+        """
+        rgb = rgb.astype(np.int64)
+        return ((rgb[:, 0] ^ (keys >> (2 * Globals.char_8bit))) << Globals.stega_bit_shift[0]) | \
+            ((rgb[:, 1] ^ ((keys >> Globals.char_8bit) & Globals.bitmask_8right_bit)) << Globals.stega_bit_shift[1]) \
+            | (rgb[:, 2] ^ (keys & Globals.bitmask_8right_bit))
+
+    @staticmethod
+    def capacity(image_path):
+        """
+        :param image_path: path to an image
+        :return: number of characters the image can hold
+
+        Reads only the image header
+        """
+        with Image.open(image_path) as img:
+            return img.size[0] * img.size[1]
+
+    @staticmethod
+    def save(pixels, mode, output, image_format='PNG', compress_level=None, strategy=None):
+        """
+        :param pixels: (height, width, channels) uint8 array
+        :param mode: 'RGB' or 'RGBA'
+        :param output: path or binary file object, e.g. io.BytesIO, to write the image to
+        :param image_format: 'PNG', 'BMP' or 'TIFF', the latter two are written uncompressed
+        :param compress_level: zlib level of PNG from 0 (stored, fastest) to 9 (smallest), 6 by default
+        :param strategy: zlib strategy of PNG, one of Stega.strategies, 'default' by default
+
+        BMP and TIFF take no time to encode but are as big as the pixels, PNG at level 1 is a few times faster
+        than at level 6 and a little bigger. Raises ValueError for other formats and strategies
+        """
+        image_format = image_format.upper()
+        if image_format not in Stega.formats:
+            raise ValueError('Encoded image must be one of {}'.format(', '.join(Stega.formats)))
+        if strategy is not None and strategy not in Stega.strategies:
+            raise ValueError('Strategy of PNG must be one of {}'.format(', '.join(Stega.strategies)))
+
+        options = {}
+        if image_format == 'PNG' and compress_level is not None:
+            options['compress_level'] = compress_level
+        if image_format == 'PNG' and strategy is not None:
+            options['compress_type'] = Stega.strategies[strategy]
+        if image_format == 'TIFF':
+            options['compression'] = 'raw'
+        Image.fromarray(pixels, mode).save(output, image_format, **options)
+
+    @staticmethod
+    @Metrics.timed
+    def embed(text, image_path, keys_path='coords.keys', output_path=None, binary_keys=False, seed=None,
+              tiled=False, image_format=None, compress_level=None, strategy=None):
+        """
+        :param text: text to be encrypted
+        :param image_path: path to an image to encode the text
+        :param keys_path: path to save keys to, or binary file object, e.g. io.BytesIO, for binary keys
+        :param output_path: path or binary file object, e.g. io.BytesIO, to save encoded image to,
+                            'encoded' with the extension of the output format by default
+        :param binary_keys: whether to save keys in binary format, which stores the seed instead of coordinates
+        :param seed: seed of PixelScheduler choosing the pixels, random by default
+        :param tiled: whether to patch only target pixels of an uncompressed cover (BMP, TIFF, PPM)
+                      in a copy of it instead of decoding the image. Output then keeps the format of the cover
+        :param image_format: format of encoded image, see Stega.save, PNG or the format of a tiled cover by default
+        :param compress_level: zlib level of PNG, see Stega.save
+        :param strategy: zlib strategy of PNG, see Stega.save
+
+        Encrypts the given text slightly changing bits of distinct pseudo-random pixels.
+        Raises ValueError if the text does not fit into the image, or if the extension of output_path or
+        image_format do not match the format of a tiled cover
+        """
+        codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        if output_path is None:
+            output_path = 'encoded' + Stega.__suffix__(image_path, tiled, image_format)
+        scheduler, xs, ys, keys = Stega.__embed__(codes, image_path, output_path, seed, tiled,
+                                                  (image_format, compress_level, strategy))
+
+        with Metrics.phase('write'):
+            if binary_keys:
+                KeyFile.write_seeded(keys_path, scheduler.seed, keys, (scheduler.width, scheduler.height))
+            else:
+                KeyFile.write_text(keys_path, xs, ys, keys)
+
+    @staticmethod
+    def __embed__(codes, image_path, output_path, seed, tiled, output_format):
+        """
+        :param codes: array of character codes
+        :param image_path: path to an image to encode the codes
+        :param output_path: path or binary file object to save encoded image to
+        :param seed: seed of PixelScheduler choosing the pixels, random if None
+        :param tiled: whether to patch only target pixels of an uncompressed cover in a copy of it,
+                      possible only if output_path is a path
+        :param output_format: image format or None for PNG, zlib level and strategy passed to Stega.save
+        :return: scheduler which chose the target pixels, their x and y coordinates and keys
+
+        Decodes and encodes the image once whatever the number of codes
+        """
+        image_format, level, strategy = output_format
+        with Metrics.phase('read'), Image.open(image_path) as img:  # the header only, pixels are read below
+            size, cover_format = img.size, img.format
+        with Metrics.phase('transform'):
+            scheduler = PixelScheduler(size, secrets.randbits(63) if seed is None else seed)
+            xs, ys = scheduler.coords(codes.size)
+
+        if tiled and isinstance(output_path, (str, os.PathLike)) and RawRaster.supports(image_path):
+            # the copy of the cover keeps its format, so it must not be given the name or format of another one
+            named = Image.registered_extensions().get(os.path.splitext(output_path)[1].lower())
+            if named != cover_format or (image_format is not None and image_format.upper() != cover_format):
+                raise ValueError('Tiled output keeps the {} format of the cover, got {}'.format(
+                    cover_format, image_format or os.path.basename(output_path)))
+            with Metrics.phase('read'):
+                shutil.copyfile(image_path, output_path)
+            with RawRaster(output_path, writable=True) as raster:
+                with Metrics.phase('read'):
+                    initial = raster.read(xs, ys)
+                with Metrics.phase('transform', codes.size):
+                    encoded = Stega.__xor__(initial, Stega.__masks__(codes.astype(np.int64)))
+                    keys = KeyFile.pack(initial)
+                with Metrics.phase('write'):
+                    raster.write(xs, ys, encoded)
+        else:
+            with Metrics.phase('read'), Image.open(image_path) as img:
+                pixels, mode = Stega.__pixels__(img)
+            with Metrics.phase('transform', codes.size):
+                keys = Stega.embed_array(pixels, codes, xs, ys)
+            with Metrics.phase('write'):
+                Stega.save(pixels, mode, output_path, image_format or 'PNG', level, strategy)
+        return scheduler, xs, ys, keys
+
+    @staticmethod
+    def __suffix__(image_path, tiled, image_format):
+        """
+        :param image_path: path to the cover
+        :param tiled: whether tiled embedding is asked for
+        :param image_format: format of encoded image or None
+        :return: extension of the encoded image: the one of the cover if it is patched in place, of the format otherwise
+        """
+        if tiled and RawRaster.supports(image_path):
+            return os.path.splitext(image_path)[1]
+        return Stega.formats.get((image_format or 'PNG').upper(), '.png')
+
+    @staticmethod
+    def __unique_path__(prefix, suffix):
+        """
+        :param prefix: beginning of the file name
+        :param suffix: extension of the file
+        :return: path to a new empty file in the working directory, no other run gets the same one
+        """
+        handle, path = tempfile.mkstemp(suffix, prefix, os.getcwd())
+        os.close(handle)
+        return path
+
+    @staticmethod
+    def embed_many(messages, image_path, keys_path=None, output_path=None, seed=None, tiled=False, image_format=None,
+                   compress_level=None, strategy=None):
+        """
+        :param messages: dict of message id -> text, or list of texts with ids '0', '1' and so on
+        :param image_path: path to an image to encode the messages
+        :param keys_path: path to save binary keys of all messages to, a new unique file by default
+        :param output_path: path or binary file object to save encoded image to, a new unique file by default
+        :param seed: seed of PixelScheduler choosing the pixels, random by default
+        :param tiled: whether to patch only target pixels of an uncompressed cover in a copy of it,
+                      output then keeps the format of the cover
+        :param image_format: format of encoded image, see Stega.save
+        :param compress_level: zlib level of PNG, see Stega.save
+        :param strategy: zlib strategy of PNG, see Stega.save
+        :return: paths to the keys and to the encoded image, or the file object given as output_path
+
+        Packs all messages into one cover, decoding and encoding the image once. Every message takes its own
+        span of the pixel sequence, the index of spans sorted by id is saved with the keys,
+        so Stega.extract_one reads one message without the others.
+        Raises ValueError if ids repeat or the messages do not fit into the image
+        """
+        if not isinstance(messages, dict):
+            messages = {str(idx): text for idx, text in enumerate(messages)}
+        ids = [str(message_id).encode('utf-8') for message_id in messages]
+        if len(set(ids)) != len(ids) or any(not message_id or b'\0' in message_id for message_id in ids):
+            raise ValueError('Message ids must be distinct, not empty and without null characters')
+
+        codes = np.frombuffer(''.join(messages.values()).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        index = np.empty(len(ids), dtype=KeyFile.index_type(max(map(len, ids), default=1)))
+        index['id'] = ids
+        index['count'] = [len(text) for text in messages.values()]
+        index['start'] = np.cumsum(index['count']) - index['count']
+        index.sort(order='id')
+
+        if codes.size > Stega.capacity(image_path):  # checked before any file is made
+            raise ValueError('Image holds at most {} characters, got {}'.format(Stega.capacity(image_path), codes.size))
+        if output_path is None:
+            output_path = Stega.__unique_path__('encoded-', Stega.__suffix__(image_path, tiled, image_format))
+        keys_path = keys_path or Stega.__unique_path__('coords-', '.keys')
+
+        with Metrics.operation('Stega.embed_many', codes.size):
+            scheduler, _, _, keys = Stega.__embed__(codes, image_path, output_path, seed, tiled,
+                                                    (image_format, compress_level, strategy))
+            with Metrics.phase('write'):
+                KeyFile.write_bundle(keys_path, scheduler.seed, index, keys, (scheduler.width, scheduler.height))
+        return keys_path, output_path
+
+    @staticmethod
+    def ids(keys_path):
+        """
+        :param keys_path: path to keys saved by Stega.embed_many
+        :return: list of message ids, sorted
+        """
+        _, _, index, _ = KeyFile.map_bundle(keys_path)
+        return [message_id.decode('utf-8') for message_id in index['id'].tolist()]
+
+    @staticmethod
+    def extract_one(keys_path, image_path, message_id):
+        """
+        :param keys_path: path to keys saved by Stega.embed_many
+        :param image_path: path to encrypted image or binary file object, e.g. io.BytesIO
+        :param message_id: id of the message
+        :return: decrypted message
+
+        Finds the message by binary search in the index and regenerates coordinates of its pixels only,
+        only its keys are read from the file. Raises ValueError if there is no message with the id
+        """
+        span = Metrics.operation('Stega.extract_one').start()  # arguments are paths, so it is sized by the keys
+        with span.phase('read'):
+            size, seed, index, rgb = KeyFile.map_bundle(keys_path)
+            wanted = str(message_id).encode('utf-8')
+            pos = int(np.searchsorted(index['id'], wanted))
+            if pos == index.size or index['id'][pos] != wanted:
+                raise ValueError('No message {} in {}'.format(message_id, keys_path))
+
+            start, count = int(index['start'][pos]), int(index['count'][pos])
+            xs, ys = PixelScheduler(size, seed).coords(count, start)
+            keys = KeyFile.pack(rgb[start:start + count])
+            pixels = Stega.__read__(image_path, xs, ys)
+
+        span.size = count
+        with span.phase('transform', count):
+            text = Stega.__unxor__(pixels, keys).astype(np.uint32).tobytes().decode('utf-32-le', 'surrogatepass')
+        span.finish()
+        return text
+
+    @staticmethod
+    def extract(keys_path, image_path):
+        """
+        :param keys_path: path to file with steganography keys in text or binary format
+        :param image_path: path to encrypted image or binary file object, e.g. io.BytesIO
+        :return: decrypted string
+
+        Reads only target pixels of uncompressed images, other images are decoded in full
+        """
+        span = Metrics.operation('Stega.extract').start()  # arguments are paths, so it is sized by the keys
+        with span.phase('read'):
+            xs, ys, keys = KeyFile.read(keys_path)
+            rgb = Stega.__read__(image_path, xs, ys)
+
+        span.size = keys.size
+        with span.phase('transform', keys.size):
+            text = Stega.__unxor__(rgb, keys).astype(np.uint32).tobytes().decode('utf-32-le', 'surrogatepass')
+        span.finish()
+        return text
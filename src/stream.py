@@ -0,0 +1,184 @@
+from src.b64 import Base64
+from src.crack import Crack
+from src.decode import Decrypt
+from src.encode import Encrypt
+from src.globals import Globals
+from src.tables import Tables
+from src.vector import Vector
+
+import numpy as np
+
+
+class Stream:
+    """
+    Class with helpers shared by streaming ciphers
+    """
+    chunk_sz = 1 << 16  # characters read from the source file at once
+
+    @staticmethod
+    def chunks(src, chunk_sz, step=1):
+        """
+        :param src: file object opened for reading text
+        :param chunk_sz: number of characters to read at once
+        :param step: every chunk but the last one has length divisible by step
+        :return: generator of text chunks
+
+        Reads the file piece by piece, carrying characters which do not fill a whole step to the next chunk
+        """
+        return Stream.regroup(iter(lambda: src.read(chunk_sz), ''), step)
+
+    @staticmethod
+    def regroup(chunks, step):
+        """
+        :param chunks: iterable of text chunks
+        :param step: every chunk but the last one has length divisible by step
+        :return: generator of text chunks, carrying characters which do not fill a whole step to the next one
+        """
+        rest = ''
+        for chunk in chunks:
+            chunk = rest + chunk
+            cut = len(chunk) - len(chunk) % step
+            rest = chunk[cut:]
+            if cut:
+                yield chunk[:cut]
+
+        if rest:
+            yield rest
+
+
+class EncryptStream:
+    """
+    Class with encryption methods which read a file and write the result chunk by chunk.
+    Output is identical to the one of Encrypt methods for the whole file content
+    """
+
+    @staticmethod
+    def caesar(src, dst, rot, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with text to be encrypted
+        :param dst: file object to write encrypted text into
+        :param rot: rotation of Caesar cipher
+        :param chunk_sz: number of characters to process at once
+        """
+        for chunk in Stream.chunks(src, chunk_sz):
+            dst.write(Tables.caesar(chunk, rot))
+
+    @staticmethod
+    def vigenere(src, dst, key, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with text to be encrypted
+        :param dst: file object to write encrypted text into
+        :param key: key of Vigenere cipher
+        :param chunk_sz: number of characters to process at once
+        """
+        position = 0
+        for chunk in Stream.chunks(src, chunk_sz):
+            encrypted, position = Vector.vigenere_part(chunk, key, position)
+            dst.write(encrypted)
+
+    @staticmethod
+    def vernam(src, dst, key, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with text to be encrypted
+        :param dst: file object to write encrypted text into
+        :param key: key of Vernam cipher
+        :param chunk_sz: number of characters to process at once
+        """
+        position = 0
+        for chunk in Stream.chunks(src, chunk_sz):
+            encrypted, position = Vector.vernam_part(chunk, key, position)
+            dst.write(encrypted)
+
+    @staticmethod
+    def base64(src, dst, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with text to be encrypted
+        :param dst: file object to write encrypted text into
+        :param chunk_sz: number of characters to process at once
+
+        Every chunk but the last one holds whole 3-character groups, so only the last one gets padding
+        """
+        for chunk in Stream.chunks(src, chunk_sz, Encrypt.base64_step):
+            dst.write(Base64.encrypt(chunk))
+
+
+class DecryptStream:
+    """
+    Class with decryption methods which read a file and write the result chunk by chunk.
+    Output is identical to the one of Decrypt methods for the whole file content
+    """
+
+    @staticmethod
+    def caesar(src, dst, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: seekable file object with encoded text
+        :param dst: file object to write decrypted text into
+        :param chunk_sz: number of characters to process at once
+        :return: rotation of Caesar cypher found by frequency analysis and its confidence margin, see Crack.margin
+
+        Reads the file twice: first to count letters, then to decrypt it
+        """
+        start = src.tell()
+        counts = sum((Crack.letter_counts(chunk) for chunk in Stream.chunks(src, chunk_sz)),
+                     np.zeros(Globals.alphabet_len, dtype=np.int64))
+        rot, margin = Crack.margin(counts, Crack.scores(counts))
+        src.seek(start)
+        EncryptStream.caesar(src, dst, -rot, chunk_sz)
+        return rot, margin
+
+    @staticmethod
+    def vigenere(src, dst, key, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with encoded text
+        :param dst: file object to write decrypted text into
+        :param key: key to decrypt the text
+        :param chunk_sz: number of characters to process at once
+        """
+        position = 0
+        for chunk in Stream.chunks(src, chunk_sz):
+            decrypted, position = Vector.vigenere_part(chunk, key, position, decrypt=True)
+            dst.write(decrypted)
+
+    @staticmethod
+    def vernam(src, dst, key, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with encoded text
+        :param dst: file object to write decrypted text into
+        :param key: key to decrypt the text
+        :param chunk_sz: number of characters to process at once
+        """
+        position = 0
+        for chunk in Stream.chunks(src, chunk_sz):
+            decrypted, position = Vector.vernam_part(chunk, key, position, decrypt=True)
+            dst.write(decrypted)
+
+    @staticmethod
+    def base64(src, dst, chunk_sz=Stream.chunk_sz):
+        """
+        :param src: file object with encoded text
+        :param dst: file object to write decrypted text into
+        :param chunk_sz: number of characters to process at once
+
+        Decrypt.base64 drops as many characters from the end as there are '=' in the whole text,
+        so the last characters of output are held back until the count is known
+        """
+        for piece in DecryptStream.base64_chunks(Stream.chunks(src, chunk_sz, Decrypt.base64_step)):
+            dst.write(piece)
+
+    @staticmethod
+    def base64_chunks(chunks):
+        """
+        :param chunks: iterable of encoded text chunks
+        :return: generator of decrypted text chunks, see base64
+        """
+        tail = 0
+        held = ''
+        for chunk in Stream.regroup(chunks, Decrypt.base64_step):
+            if len(chunk) % Decrypt.base64_step:
+                raise ValueError('Length of Base64 text must be divisible by {}'.format(Decrypt.base64_step))
+
+            tail += chunk.count('=')
+            held += Base64.decrypt(chunk.replace('=', 'A'))
+            cut = max(len(held) - tail, 0)
+            yield held[:cut]
+            held = held[cut:]
@@ -0,0 +1,86 @@
+from src.globals import Globals
+
+import sys
+
+
+class Tables:
+    """
+    Class with cached translation tables for substitution ciphers
+    """
+    caesar_ascii = []  # 256-byte tables for bytes.translate, indexed by rotation
+    caesar_unicode = []  # {code point: code point} tables for str.translate, indexed by rotation
+
+    lower_codes = ()  # every code point with str.islower() in the whole unicode range
+    upper_codes = ()  # every code point with str.isupper() in the whole unicode range
+
+    @staticmethod
+    def __shift__(code, rot):
+        """
+        :param code: code point of a cased character
+        :param rot: rotation to apply
+        :return: shifted code point
+
+        Shifts one character exactly the way Encrypt.caesar does, including non-ASCII letters
+        """
+        base = ord('a') if chr(code).islower() else ord('A')
+        return (code - base + rot) % Globals.alphabet_len + base
+
+    @staticmethod
+    def cased_codes():
+        """
+        :return: lowercase and uppercase code points of the whole unicode range
+
+        Scans the unicode range once and caches the result
+        """
+        if not Tables.lower_codes:
+            Tables.lower_codes = tuple(code for code in range(sys.maxunicode + 1) if chr(code).islower())
+            Tables.upper_codes = tuple(code for code in range(sys.maxunicode + 1) if chr(code).isupper())
+
+        return Tables.lower_codes, Tables.upper_codes
+
+    @staticmethod
+    def caesar_bytes_table(rot):
+        """
+        :param rot: rotation of Caesar cipher
+        :return: 256-byte translation table for ASCII text
+
+        Builds all rotations once and returns the cached one
+        """
+        if not Tables.caesar_ascii:
+            cased = [code for code in range(128) if chr(code).isalpha()]
+            for shift in range(Globals.alphabet_len):
+                table = bytearray(range(256))
+                for code in cased:
+                    table[code] = Tables.__shift__(code, shift)
+                Tables.caesar_ascii.append(bytes(table))
+
+        return Tables.caesar_ascii[rot % Globals.alphabet_len]
+
+    @staticmethod
+    def caesar_str_table(rot):
+        """
+        :param rot: rotation of Caesar cipher
+        :return: translation table for str.translate covering every cased unicode character
+
+        Builds all rotations once and returns the cached one
+        """
+        if not Tables.caesar_unicode:
+            lower_codes, upper_codes = Tables.cased_codes()
+            for shift in range(Globals.alphabet_len):
+                Tables.caesar_unicode.append({code: Tables.__shift__(code, shift) for code in lower_codes + upper_codes})
+
+        return Tables.caesar_unicode[rot % Globals.alphabet_len]
+
+    @staticmethod
+    def caesar(text, rot):
+        """
+        :param text: text to be shifted
+        :param rot: rotation of Caesar cipher (negative to decrypt)
+        :return: shifted string
+
+        Applies Caesar rotation in one bulk pass. Output is identical to Encrypt.caesar
+        """
+        if text.isascii():
+            return text.encode('ascii').translate(Tables.caesar_bytes_table(rot)).decode('ascii')
+
+        return text.translate(Tables.caesar_str_table(rot))
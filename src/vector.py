@@ -0,0 +1,294 @@
+from src.globals import Globals
+from src.keycache import KeyCache
+from src.tables import Tables
+
+import numpy as np
+import sys
+
+
+class Vector:
+    """
+    Class with array-backed Vigenere and Vernam engines for large inputs
+    """
+    block_sz = 1 << 20  # characters per numpy pass, bounds the size of temporary arrays
+    short_sz = 1 << 10  # characters of text the key tiled once and kept in KeyCache covers
+    dense_run = 1 << 6  # masked characters between two that do not consume a key letter, below which they are walked
+    walk_sz = 1 << 12  # masked characters walked one by one before the vectorised pass is tried again
+    ascii_sz = 1 << Globals.char_8bit
+    unicode_sz = sys.maxunicode + 1 + 2 * Globals.char_8bit ** 2  # lookup size with room for XOR overflow
+
+    maps = {}  # (is ascii) -> dict of boolean lookup arrays indexed by code point
+    luts = {}  # transform -> (26 * 256 output codes, 26 * 256 key advance flags or None) for 8-bit text
+
+    @staticmethod
+    def __shift__(letters, shifts, maps):
+        """
+        Vigenere transform of cased letters, shifts are already negated for decryption
+        """
+        base = np.where(maps['lower'][letters], ord('a'), ord('A'))
+        return (letters - base + shifts) % Globals.alphabet_len + base, None
+
+    @staticmethod
+    def __xor__(letters, shifts, maps):
+        """
+        Vernam encryption transform of upper-cased letters
+        """
+        return ((letters - ord('A')) ^ shifts) + ord('A'), None
+
+    @staticmethod
+    def __unxor__(letters, shifts, maps):
+        """
+        Vernam decryption transform, also tells which characters really advance the key
+        """
+        alpha = maps['alpha']
+        low = ((letters - ord('a')) ^ shifts) + ord('a')
+        high = ((letters - ord('A')) ^ shifts) + ord('A')
+        is_low = alpha[np.clip(low, 0, alpha.size - 1)]
+        is_high = alpha[np.clip(high, 0, alpha.size - 1)]
+        return np.where(is_low, low, np.where(is_high, high, letters)), is_low | is_high
+
+    @staticmethod
+    def __maps__(is_ascii):
+        """
+        :param is_ascii: whether lookups are needed only for 8-bit codes
+        :return: dict with 'lower', 'cased', 'alpha' and 'vernam' boolean lookup arrays
+
+        'vernam' marks codes on which Decrypt.vernam may advance the key for some key letter
+        """
+        if is_ascii not in Vector.maps:
+            size = Vector.ascii_sz if is_ascii else Vector.unicode_sz
+            lower, upper, alpha = (np.zeros(size, dtype=bool) for _ in range(3))
+
+            if is_ascii:
+                for code in range(size):
+                    lower[code], upper[code], alpha[code] = chr(code).islower(), chr(code).isupper(), chr(code).isalpha()
+            else:
+                lower_codes, upper_codes = Tables.cased_codes()
+                lower[list(lower_codes)] = True
+                upper[list(upper_codes)] = True
+                alpha[[code for code in range(sys.maxunicode + 1) if chr(code).isalpha()]] = True
+
+            codes = np.arange(size, dtype=np.int64)
+            vernam = np.zeros(size, dtype=bool)
+            for shift in range(Globals.alphabet_len):
+                for base in (ord('a'), ord('A')):
+                    vernam |= alpha[np.clip(((codes - base) ^ shift) + base, 0, size - 1)]
+
+            Vector.maps[is_ascii] = {'lower': lower, 'cased': lower | upper, 'alpha': alpha, 'vernam': vernam}
+
+        return Vector.maps[is_ascii]
+
+    @staticmethod
+    def __lut__(transform):
+        """
+        :param transform: one of __shift__, __xor__, __unxor__
+        :return: flat lookup tables of outputs and key advance flags (or None) indexed by shift * 256 + code
+
+        Evaluates the transform for every key letter and every 8-bit code once
+        """
+        if transform not in Vector.luts:
+            shifts, codes = np.divmod(np.arange(Globals.alphabet_len * Vector.ascii_sz, dtype=np.int64),
+                                      Vector.ascii_sz)
+            output, advanced = transform(codes, shifts, Vector.__maps__(True))
+            Vector.luts[transform] = (output.astype(np.uint8), advanced)
+
+        return Vector.luts[transform]
+
+    @staticmethod
+    def __to_array__(text):
+        """
+        :param text: text to convert
+        :return: writable array of code points (uint8 for ASCII text, uint32 otherwise)
+        """
+        if text.isascii():
+            return np.frombuffer(bytearray(text.encode('ascii')), dtype=np.uint8)
+        return np.frombuffer(bytearray(text.encode('utf-32-le', 'surrogatepass')), dtype=np.uint32)
+
+    @staticmethod
+    def __to_text__(array):
+        """
+        :param array: array of code points made by __to_array__
+        :return: string with these code points
+        """
+        if array.dtype == np.uint8:
+            return array.tobytes().decode('latin-1')
+        return array.tobytes().decode('utf-32-le', 'surrogatepass')
+
+    @staticmethod
+    def __key__(codes):
+        """
+        :param codes: tuple of codes of key letters
+        :return: dict with the codes and, for ASCII text (True) and other text (False), the key tiled over
+                 Vector.short_sz characters, premultiplied to index the lookup table for ASCII text
+
+        Raises ValueError if a code is not in range 0-25
+        """
+        if not codes or any(not 0 <= code < Globals.alphabet_len for code in codes):
+            raise ValueError('Key must consist of English letters only')
+
+        key = np.array(codes, dtype=np.int32)
+        repeats = Vector.short_sz // len(codes) + 2
+        return {'codes': codes, True: np.tile(key * Vector.ascii_sz, repeats), False: np.tile(key, repeats)}
+
+    @staticmethod
+    def __vigenere_key__(key, decrypt):
+        """
+        :return: key material of Vigenere key, see __key__
+        """
+        sign = -1 if decrypt else 1
+        return Vector.__key__(tuple(sign * (ord(elem.lower()) - ord('a')) % Globals.alphabet_len for elem in key))
+
+    @staticmethod
+    def __vernam_key__(key):
+        """
+        :return: key material of Vernam key, see __key__
+        """
+        return Vector.__key__(tuple(ord(elem.upper()) - ord('A') for elem in key))
+
+    @staticmethod
+    def __periodic__(text, material, mask_name, transform, position):
+        """
+        :param text: text to transform
+        :param material: key material made by __key__
+        :param position: index of key letter to start with
+        :param mask_name: name of lookup array selecting characters which may consume a key letter
+        :param transform: function(letters, shifts, maps) -> (new letters, whether each one consumed a key letter
+                          or None if all of them did)
+        :return: transformed string and index of key letter to continue with
+
+        Masks the letters of every block, tiles the key over them and scatters the results back.
+        8-bit text goes through a lookup table instead of the arithmetic. Masked characters are assumed
+        to consume a key letter; once the transform reports one that does not, that character is kept as it is
+        and the pass goes on from the next masked one, over a window about twice as long as the run before it.
+        Where such characters come every few letters, e.g. when plain text is decrypted, the next ones are walked,
+        see __walk__
+        """
+        key = material['codes']
+        array = Vector.__to_array__(text)
+        is_ascii = array.dtype == np.uint8
+        maps = Vector.__maps__(is_ascii)
+        # key codes repeated over a whole block (or the shorter text), premultiplied to index the lookup table
+        # for 8-bit text. Short texts take the cached tiling
+        if len(array) <= Vector.short_sz:
+            tiled = material[is_ascii]
+        else:
+            tiled = np.tile(np.array(key, dtype=np.intp) * (Vector.ascii_sz if is_ascii else 1),
+                            min(len(array), Vector.block_sz) // len(key) + 2)
+        position %= len(key)
+
+        for start in range(0, len(array), Vector.block_sz):
+            block = array[start:start + Vector.block_sz]
+            all_indices = np.flatnonzero(np.take(maps[mask_name], block))
+            done, window = 0, all_indices.size
+            while done < all_indices.size:
+                indices = all_indices[done:done + window]
+                letters = np.take(block, indices)
+                shifts = tiled[position:position + indices.size]
+
+                if is_ascii:
+                    output, advances = Vector.__lut__(transform)
+                    lut_indices = shifts + letters
+                    letters = np.take(output, lut_indices)
+                    advanced = None if advances is None else np.take(advances, lut_indices)
+                else:
+                    letters, advanced = transform(letters.astype(np.int64), shifts, maps)
+
+                first = indices.size if advanced is None or advanced.all() else int(np.argmin(advanced))
+                np.put(block, indices[:first], letters[:first])
+                position = (position + first) % len(key)
+                if first == indices.size:
+                    done, window = done + indices.size, 2 * window
+                    continue
+                done, window = done + first + 1, 2 * first + Vector.short_sz  # indices[first] stays as it is
+                if first < Vector.dense_run:
+                    walked = all_indices[done:done + Vector.walk_sz]
+                    position = Vector.__walk__(block, walked, key, position, transform, maps)
+                    done += walked.size
+
+        return Vector.__to_text__(array), position
+
+    @staticmethod
+    def __walk__(block, indices, key, position, transform, maps):
+        """
+        :param block: array of codes, transformed in place
+        :param indices: indices of masked characters of the block to transform
+        :param key: codes of key letters
+        :param position: index of key letter to start with
+        :return: index of key letter to continue with
+
+        Follows the key position over characters of which many do not consume a key letter. Whether the character
+        at idx consumes key letter p is looked up at advances[bases[p] + offsets[idx]], in the lookup table for
+        8-bit text and in the transform evaluated for every distinct key letter otherwise, so the loop does
+        no arithmetic on the characters
+        """
+        letters = np.take(block, indices).astype(np.int64)
+        if block.dtype == np.uint8:
+            outputs, advances = Vector.__lut__(transform)
+            bases, offsets = np.array(key, dtype=np.int64) * Vector.ascii_sz, letters
+        else:
+            shifts = sorted(set(key))
+            outputs, advances = transform(letters[None, :], np.array(shifts, dtype=np.int64)[:, None], maps)
+            outputs, advances = outputs.ravel(), advances.ravel()
+            bases = np.array([shifts.index(shift) for shift in key], dtype=np.int64) * letters.size
+            offsets = np.arange(letters.size)
+
+        flags, base_list, positions = advances.tobytes(), bases.tolist(), []
+        for offset in offsets.tolist():
+            positions.append(position)
+            if flags[base_list[position] + offset]:
+                position += 1
+                if position == len(key):
+                    position = 0
+        np.put(block, indices, np.take(outputs, np.take(bases, positions) + offsets))
+        return position
+
+    @staticmethod
+    def vigenere_part(text, key, position, decrypt=False):
+        """
+        :param text: part of a longer text to be encrypted or decrypted
+        :param key: key of Vigenere cipher
+        :param position: index of key letter the part starts with
+        :param decrypt: whether to decrypt the text
+        :return: transformed string and index of key letter the next part starts with
+        """
+        material = KeyCache.get('vigenere.decrypt' if decrypt else 'vigenere.encrypt', key,
+                                lambda key: Vector.__vigenere_key__(key, decrypt))
+        return Vector.__periodic__(text, material, 'cased', Vector.__shift__, position)
+
+    @staticmethod
+    def vernam_part(text, key, position, decrypt=False):
+        """
+        :param text: part of a longer text to be encrypted or decrypted
+        :param key: key of Vernam cipher
+        :param position: index of key letter the part starts with
+        :param decrypt: whether to decrypt the text
+        :return: transformed string and index of key letter the next part starts with
+        """
+        material = KeyCache.get('vernam', key, Vector.__vernam_key__)
+        if decrypt:
+            return Vector.__periodic__(text, material, 'vernam', Vector.__unxor__, position)
+        return Vector.__periodic__(text.upper(), material, 'alpha', Vector.__xor__, position)
+
+    @staticmethod
+    def vigenere(text, key, decrypt=False):
+        """
+        :param text: text to be encrypted or decrypted
+        :param key: key of Vigenere cipher
+        :param decrypt: whether to decrypt the text
+        :return: transformed string, identical to Encrypt.vigenere or Decrypt.vigenere
+
+        Performs Vigenere cipher upon the whole letter stream at once
+        """
+        return Vector.vigenere_part(text, key, 0, decrypt)[0]
+
+    @staticmethod
+    def vernam(text, key, decrypt=False):
+        """
+        :param text: text to be encrypted or decrypted
+        :param key: key of Vernam cipher
+        :param decrypt: whether to decrypt the text
+        :return: transformed string, identical to Encrypt.vernam or Decrypt.vernam
+
+        Performs Vernam cipher upon the whole letter stream at once
+        """
+        return Vector.vernam_part(text, key, 0, decrypt)[0]
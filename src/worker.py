@@ -0,0 +1,134 @@
+from src.metrics import Metrics
+
+import io
+import os
+import threading
+
+
+class Cancelled(Exception):
+    """
+    Raised inside a job when it is cancelled
+    """
+
+
+class Worker:
+    """
+    Class to run a long job in a background thread. The job reports its progress and
+    checks for cancellation through the worker, results are picked up by polling
+    """
+
+    def __init__(self, job):
+        """ constructor for worker object\n
+            :param job: function taking the worker and returning the result
+        """
+        self.job = job
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self.__run__, daemon=True)
+
+    def __run__(self):
+        """
+        Runs the job, keeping its result or the exception it failed with
+        """
+        try:
+            self.result = Metrics.thread_profile(self.job, self)
+        except Cancelled:
+            pass
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.finished.set()
+
+    def start(self):
+        """
+        Starts the job in background
+        """
+        self.thread.start()
+
+    def cancel(self):
+        """
+        Asks the job to stop at its next check
+        """
+        self.cancelled.set()
+
+    def check(self):
+        """
+        Raises Cancelled if the job was cancelled
+        """
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def report(self, done, total):
+        """
+        :param done: amount of work done
+        :param total: amount of work overall
+
+        Updates progress and stops the job if it was cancelled
+        """
+        self.check()
+        self.progress = done / total if total else 1.0
+
+    def reader(self, text):
+        """
+        :param text: input of the job
+        :return: file-like object with the text, reporting progress on every read
+        """
+        return ProgressReader(text, self)
+
+    def file_reader(self, path, encoding='utf-8'):
+        """
+        :param path: path to input file of the job
+        :param encoding: encoding of the file
+        :return: text file object, reporting progress on every read
+        """
+        return ProgressFile(path, encoding, self)
+
+
+class ProgressReader(io.StringIO):
+    """
+    Class of in-memory text file, which tells the worker how much of it was read
+    """
+
+    def __init__(self, text, worker):
+        """ constructor for reader object\n
+            :param text: content of the file
+            :param worker: worker to report to
+        """
+        super().__init__(text)
+        self.size = len(text)
+        self.worker = worker
+
+    def read(self, size=-1):
+        """
+        :param size: number of characters to read, all of them by default
+        :return: next characters of the text
+        """
+        self.worker.report(self.tell(), self.size)
+        return super().read(size)
+
+
+class ProgressFile(io.TextIOWrapper):
+    """
+    Class of text file, which tells the worker how many bytes of it were read
+    """
+
+    def __init__(self, path, encoding, worker):
+        """ constructor for file object\n
+            :param path: path to the file
+            :param encoding: encoding of the file
+            :param worker: worker to report to
+        """
+        super().__init__(open(path, 'rb'), encoding=encoding, newline='')
+        self.size = os.path.getsize(path)
+        self.worker = worker
+
+    def read(self, size=-1):
+        """
+        :param size: number of characters to read, all of them by default
+        :return: next characters of the file
+        """
+        self.worker.report(self.buffer.tell(), self.size)
+        return super().read(size)